@@ -0,0 +1,202 @@
+"""
+Benchmark how the capcutvoice CLI plans a text file: break_sentence
+(Sentence mode, max_length 190) then split_text into segments.
+
+- previous: the character-by-character break_tts_sentence run on two-line
+  windows, and split_text rebuilding strings per line (both inlined here).
+- current: break_sentence on the whole file at once, as the CLI does now.
+
+The generated file mixes short lines, long paragraphs and runs without any
+sentence end, like real novels. Both breakers are also run on the same
+two-line windows, which must give identical sentences (text and offsets)
+and the same "Skipping last part" messages. split_text must give identical
+segments.
+
+Usage: python benchmarks/bench_capcut_split.py [file size in MB, default 10]
+"""
+
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "capcutvoice"))
+
+from split_text import split_text  # noqa: E402
+from tts_helper import TextToSpeechHelper  # noqa: E402
+
+MAX_LENGTH = 190
+WORDS = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "sẽ", "nói", "về",
+         "lịch", "sử", "Việt", "Nam", "một", "câu", "chuyện", "rất", "dài", "và", "thú", "vị"]
+
+
+def make_text(size: int, seed: int = 0) -> str:
+    """About `size` bytes of UTF-8 text in lines of varied length and punctuation"""
+    rnd = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        words = []
+        end_every = rnd.choice([6, 15, 40, 400])  # 400: a paragraph with no sentence end
+        for _ in range(rnd.choice([3, 20, 80, 250])):
+            word = rnd.choice(WORDS)
+            roll = rnd.random()
+            if roll < 1 / end_every:
+                word += rnd.choice([".", "!", "?", ":", "…"])
+            elif roll < 2 / end_every:
+                word += rnd.choice([",", ";"])
+            words.append(word)
+        line = " ".join(words)
+        if rnd.random() < 0.05:
+            line = rnd.choice(['"', "- ", "  "]) + line
+        lines.append(line)
+        length += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+# ==================== PREVIOUS IMPLEMENTATION ====================
+
+def previous_break_tts_sentence(text, max_length, skip_new_line, skip_end_sentence):
+    is_end_sentence = TextToSpeechHelper.is_end_sentence
+    is_break_char = TextToSpeechHelper.is_break_char
+    is_new_line = TextToSpeechHelper.is_new_line
+    Sentence = TextToSpeechHelper.Sentence
+    sentences = []
+    index = 0
+    length = len(text)
+    start = 0
+    last_dot = -1
+    last_comma = -1
+    last_line = -1
+    while index < length:
+        c = text[index]
+        if not skip_new_line and is_new_line(c):
+            sentences.append(Sentence(text=text[start:index], start=start, end=index))
+            last_line = last_dot = last_comma = -1
+            start = index + 1
+            index += 1
+            continue
+        else:
+            if not skip_end_sentence and is_end_sentence(c) and index > start + 5:
+                sentences.append(Sentence(text=text[start:index + 1], start=start, end=index + 1))
+                last_line = last_dot = last_comma = -1
+                start = index + 1
+                index += 1
+                continue
+            if index - start >= max_length:
+                if skip_new_line and last_line > 0 and last_line - start < max_length and last_line - start > max_length / 3:
+                    index = last_line
+                elif last_dot > 0 and last_dot - start < max_length:
+                    index = last_dot + 1
+                elif last_comma > 0 and last_comma - start < max_length:
+                    index = last_comma + 1
+                else:
+                    cut_point = start + max_length - 1
+                    while cut_point > start and text[cut_point] != ' ':
+                        cut_point -= 1
+                    if cut_point > start:
+                        index = cut_point + 1
+                    else:
+                        index = start + max_length
+                sentences.append(Sentence(text=text[start:index], start=start, end=index))
+                last_line = last_dot = last_comma = -1
+                start = index
+                continue
+        if is_new_line(c):
+            last_line = index
+        if is_end_sentence(c):
+            last_dot = index
+        if is_break_char(c):
+            last_comma = index
+        index += 1
+
+    if start < length:
+        last_part = text[start:length].strip()
+        if len(last_part) <= 5:
+            if not last_part or not re.search(r'[a-zA-Z0-9À-ỹ]', last_part) or last_part in ['"', ' ', '" ', ' "']:
+                print(f"Skipping last part of chunk: Meaningless content detected ('{last_part}')")
+            else:
+                sentences.append(Sentence(text=last_part, start=start, end=length))
+        else:
+            sentences.append(Sentence(text=last_part, start=start, end=length))
+
+    return [sentence for sentence in sentences if sentence.text.strip()]
+
+
+def previous_split_text(arr_input, max_length):
+    arr_lines = []
+    temp_lines = ""
+    text_seg = ""
+    for line in arr_input:
+        text_seg += "\n" + line
+        if (len(line) + len(temp_lines) + (1 if temp_lines else 0)) < max_length:
+            if temp_lines:
+                temp_lines += "\n"
+            temp_lines += line
+        else:
+            arr_lines.append(temp_lines)
+            temp_lines = line
+    if temp_lines:
+        arr_lines.append(temp_lines)
+    return arr_lines
+
+
+def windows(clean_lines):
+    """The two-line windows the CLI used to break one at a time"""
+    return ['\n'.join(clean_lines[i:i + 2]) for i in range(0, len(clean_lines), 2)]
+
+
+def previous_plan(clean_lines):
+    sentences = []
+    for chunk_text in windows(clean_lines):
+        sentences.extend(previous_break_tts_sentence(chunk_text, MAX_LENGTH, False, False))
+    return previous_split_text([sentence.text.strip() for sentence in sentences], MAX_LENGTH)
+
+
+def current_plan(clean_lines):
+    sentences = TextToSpeechHelper.break_sentence('\n'.join(clean_lines), MAX_LENGTH,
+                                                  TextToSpeechHelper.BreakMode.Sentence)
+    return split_text([sentence.text.strip() for sentence in sentences], MAX_LENGTH)
+
+
+def timed(label, func, baseline=None):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # "Skipping last part" messages
+        result = func()
+    elapsed = time.perf_counter() - started
+    speedup = f"  x{baseline / elapsed:.1f}" if baseline else ""
+    print(f"{label:<34} {elapsed:8.3f}s{speedup}")
+    return elapsed, result
+
+
+def same_sentences(chunks):
+    """Both breakers on the same windows: identical sentences and messages"""
+    for breaker in (previous_break_tts_sentence, TextToSpeechHelper.break_tts_sentence):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            yield [[(s.text, s.start, s.end) for s in breaker(chunk, MAX_LENGTH, False, False)]
+                   for chunk in chunks], out.getvalue()
+
+
+def main_():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    input_string = make_text(int(size_mb * 2**20)).strip()
+    clean_lines = [line.strip() for line in input_string.split('\n') if line.strip()]
+    print(f"{len(input_string.encode('utf-8')) / 2**20:.1f} MB, {len(clean_lines)} lines")
+
+    baseline, previous = timed("previous (2-line windows)", lambda: previous_plan(clean_lines))
+    elapsed, current = timed("current (whole file)", lambda: current_plan(clean_lines), baseline)
+    print(f"{len(previous)} -> {len(current)} segments, planned in {'under' if elapsed < 1 else 'over'} a second")
+
+    old, new = same_sentences(windows(clean_lines))
+    assert old == new, "break_tts_sentence output differs"
+    texts = [text.strip() for window in new[0] for text, _, _ in window]
+    assert split_text(texts, MAX_LENGTH) == previous_split_text(texts, MAX_LENGTH), "split_text output differs"
+    print("output identical")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,157 @@
+"""
+Benchmark cue batching on a simulated SRT job: batch_short_cues() packs runs
+of short cues into one request, split_batch_audio() / find_pause_cuts() cut
+the returned audio back into one clip per cue.
+
+- The SRT is dialogue-heavy: SHORT_SHARE of the cues have 1-3 words.
+- Every request costs REQUEST_SECONDS (connect + first byte) plus
+  SECONDS_PER_SYLLABLE per word. WORKERS workers take items in queue order.
+  The cues of a batch that cannot be split go back to the workers one by
+  one, ahead of the queue, like MultiThreadProcessor does.
+- The audio of each batch is generated: syllables are noise bursts of varied
+  loudness, with short gaps between words (some long enough to look like
+  pauses), and a pause of varied length after every cue. The real splitter
+  runs on it, and each cut is checked against the true pause between the cues.
+
+The clock is simulated, so the run takes seconds. Reported: requests per
+cue, simulated wall clock without and with batching, and how the batches
+were split (correctly, fallback, or cut in the wrong place, which must
+never happen).
+
+Usage: python benchmarks/bench_cue_batching.py [cues, default 1000] [SRT files, default 5]
+"""
+
+import heapq
+import os
+import random
+import sys
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+WORKERS = 8
+REQUEST_SECONDS = 1.5  # Connect + first byte
+SECONDS_PER_SYLLABLE = 0.13
+SHORT_SHARE = 0.62
+WORDS = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "sẽ", "nói", "về",
+         "lịch", "sử", "Việt", "Nam", "một", "câu", "chuyện", "rất", "dài", "và", "thú", "vị"]
+SHORT_LINES = ["Vâng.", "Không!", "Sao vậy?", "Đi thôi.", "Được rồi.", "Ừ.", "Thật à?", "Cảm ơn anh.", "Chờ đã!"]
+
+
+def make_srt(count: int, rnd: random.Random) -> list:
+    subtitles = []
+    for index in range(1, count + 1):
+        if rnd.random() < SHORT_SHARE:
+            text = rnd.choice(SHORT_LINES)
+        else:
+            text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 16))) + "."
+        subtitles.append(main.Subtitle(index, "00:00:00,000", "00:00:01,000", text))
+    return subtitles
+
+
+def request_seconds(item) -> float:
+    cues = item.cues if isinstance(item, main.CueBatch) else [item]
+    return REQUEST_SECONDS + SECONDS_PER_SYLLABLE * sum(main.estimate_syllables(sub.text) for sub in cues)
+
+
+def speak(cues: list, rnd: random.Random, rate: int = main.RECEIVE_SAMPLE_RATE) -> tuple:
+    """Synthetic audio of cues read in a row, and the (start, end) sample range of the pause after each cue"""
+    parts = []
+    pauses = []
+    length = 0
+
+    def add(samples):
+        nonlocal length
+        parts.append(samples)
+        length += len(samples)
+
+    def silence(ms):
+        add(rnd_np.normal(0, 30, int(rate * ms / 1000)))
+
+    rnd_np = np.random.default_rng(rnd.randrange(2**32))
+    silence(rnd.uniform(50, 200))
+    for position, sub in enumerate(cues):
+        for word in range(main.estimate_syllables(sub.text)):
+            if word:
+                # Mostly short word gaps, sometimes one the detector sees as a pause
+                silence(rnd.uniform(100, 160) if rnd.random() < 0.1 else rnd.uniform(10, 60))
+            n = int(rate * rnd.uniform(0.15, 0.3))
+            envelope = np.sin(np.linspace(0, np.pi, n)) * rnd.uniform(2000, 9000)
+            add(rnd_np.normal(0, 1, n) * envelope)
+        if position < len(cues) - 1:
+            start = length
+            silence(rnd.uniform(150, 600))
+            pauses.append((start, length))
+    silence(rnd.uniform(50, 200))
+    pcm = np.clip(np.concatenate(parts), -32768, 32767).astype("<i2").tobytes()
+    return pcm, pauses
+
+
+def split_outcome(batch, rnd: random.Random) -> str:
+    pcm, pauses = speak(batch.cues, rnd)
+    pieces = main.split_batch_audio(pcm, batch.cues)
+    if pieces is None:
+        return "fallback"
+    cuts = np.cumsum([len(piece) // main.AUDIO_SAMPLE_WIDTH for piece in pieces[:-1]])
+    if all(start <= cut <= end for cut, (start, end) in zip(cuts, pauses)):
+        return "correct"
+    return "wrong"
+
+
+def simulate(items: list, rnd: random.Random, outcomes: dict) -> tuple:
+    """(requests, wall clock) of WORKERS workers taking the items in order"""
+    queue = deque(items)
+    unbatched = deque()
+    free_at = [0.0] * WORKERS
+    requests = 0
+    finished = 0.0
+    while queue or unbatched:
+        now = heapq.heappop(free_at)
+        item = unbatched.popleft() if unbatched else queue.popleft()
+        done = now + request_seconds(item)
+        requests += 1
+        if isinstance(item, main.CueBatch):
+            outcome = split_outcome(item, rnd)
+            outcomes[outcome] += 1
+            if outcome == "fallback":
+                unbatched.extend(item.cues)
+        finished = max(finished, done)
+        heapq.heappush(free_at, done)
+    return requests, finished
+
+
+def main_():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{count} cues per SRT, {WORKERS} workers, {REQUEST_SECONDS}s per request + "
+          f"{SECONDS_PER_SYLLABLE}s per syllable")
+    print(f"{'srt':>3}  {'short':>5}  {'batches':>7}  {'req/cue':>7}  {'unbatched':>9}  {'batched':>8}")
+    outcomes = {"correct": 0, "fallback": 0, "wrong": 0}
+    totals = [0, 0.0, 0.0]
+    for seed in range(files):
+        rnd = random.Random(seed)
+        subtitles = make_srt(count, rnd)
+        short = sum(main.estimate_syllables(sub.text) <= main.CUE_BATCH_MAX_WORDS for sub in subtitles)
+        items = list(main.batch_short_cues(subtitles))
+        batches = sum(isinstance(item, main.CueBatch) for item in items)
+        _, baseline = simulate(subtitles, rnd, outcomes)
+        requests, elapsed = simulate(items, rnd, outcomes)
+        totals[0] += requests
+        totals[1] += baseline
+        totals[2] += elapsed
+        print(f"{seed:3d}  {short / count:5.0%}  {batches:7d}  {requests / count:7.2f}  "
+              f"{baseline:8.0f}s  {elapsed:7.0f}s  x{baseline / elapsed:.2f}")
+    print(f"avg       {'':>7}  {totals[0] / count / files:7.2f}  {totals[1] / files:8.0f}s  "
+          f"{totals[2] / files:7.0f}s  x{totals[1] / totals[2]:.2f}")
+    splits = sum(outcomes.values())
+    print(f"batch splits: {outcomes['correct'] / splits:.1%} correct, {outcomes['fallback'] / splits:.1%} fallback, "
+          f"{outcomes['wrong']} cut in the wrong place")
+    assert outcomes["wrong"] == 0, "a batch was cut in the wrong place"
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,159 @@
+"""
+Benchmark the Live connection handling against a local stand-in for the
+Gemini Live server:
+
+- LiveSessionPool: throughput of one API key with 1, 2 and 4 persistent
+  sessions (and a pipelined window).
+- WorkerEngine (one session per request): connecting for every request
+  against taking pre-connected sockets from WarmSessionPool.
+
+The stand-in answers the turns of a session one after another, like the real
+server: a fixed first-byte latency, then audio streamed at a fixed rate
+(proportional to the text). Opening a socket (TLS + setup) takes
+CONNECT_SECONDS. Messages take NETWORK_SECONDS each way, which is
+what a window of more than one turn per session hides. Answers carry their
+text, so the benchmark also checks that every caller got its own audio.
+
+Usage: python benchmarks/bench_live_pool.py [requests, default 32]
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+CONNECT_SECONDS = 0.6
+NETWORK_SECONDS = 0.08
+FIRST_BYTE_SECONDS = 0.25
+SECONDS_PER_CHAR = 0.004
+CHUNKS_PER_TURN = 8
+CALLERS = 16  # Workers of the key sending requests at the same time
+
+
+class StandInSession:
+    """One WebSocket: turns are queued and answered in order"""
+
+    def __init__(self):
+        self.turns = asyncio.Queue()
+        self.responses = asyncio.Queue()
+        self.server = asyncio.create_task(self._serve())
+
+    async def send(self, input, end_of_turn=True):
+        asyncio.get_running_loop().call_later(NETWORK_SECONDS, self.turns.put_nowait, input)
+
+    def _respond(self, response):
+        asyncio.get_running_loop().call_later(NETWORK_SECONDS, self.responses.put_nowait, response)
+
+    async def _serve(self):
+        while True:
+            text = await self.turns.get()
+            await asyncio.sleep(FIRST_BYTE_SECONDS)
+            payload = text.encode("utf-8")
+            step = len(text) * SECONDS_PER_CHAR / CHUNKS_PER_TURN
+            for part in range(CHUNKS_PER_TURN):
+                await asyncio.sleep(step)
+                data = payload if part == 0 else b"\0" * 64
+                self._respond(SimpleNamespace(data=data))
+            self._respond(None)  # turn_complete
+
+    async def receive(self):
+        while (response := await self.responses.get()) is not None:
+            yield response
+
+
+class StandInConnection:
+    async def __aenter__(self):
+        await asyncio.sleep(CONNECT_SECONDS)
+        self.session = StandInSession()
+        return self.session
+
+    async def __aexit__(self, *exc):
+        self.session.server.cancel()
+
+
+class StandInClient:
+    def __init__(self, **kwargs):
+        self.aio = SimpleNamespace(live=SimpleNamespace(connect=lambda model, config: StandInConnection()))
+
+
+async def run(count: int, size: int, window: int) -> float:
+    config = main.TTSConfig()
+    pool = main.LiveSessionPool("bench-key", config, log_callback=lambda *args: None,
+                                size=size, window=window)
+    await pool.connect()
+    rnd = random.Random(0)
+    texts = asyncio.Queue()
+    for index in range(count):
+        texts.put_nowait(f"{index:05d} " + "x" * rnd.randint(20, 120))
+
+    async def caller():
+        while not texts.empty():
+            text = texts.get_nowait()
+            audio = await pool.generate_audio(text)
+            assert audio.startswith(text.encode("utf-8")), "audio of another request"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(CALLERS)))
+    elapsed = time.perf_counter() - started
+    await pool.disconnect()
+    return elapsed
+
+
+async def run_per_request(count: int, warm_sessions: int) -> float:
+    config = main.TTSConfig()
+    texts = asyncio.Queue()
+    rnd = random.Random(0)
+    for index in range(count):
+        texts.put_nowait(f"{index:05d} " + "x" * rnd.randint(20, 120))
+
+    async def worker(worker_id: int):
+        engine = main.WorkerEngine(worker_id, "bench-key", config, warm_sessions=warm_sessions)
+        try:
+            while not texts.empty():
+                text = texts.get_nowait()
+                audio = await engine.generate_audio(text)
+                assert audio.startswith(text.encode("utf-8")), "audio of another request"
+        finally:
+            await engine.disconnect()
+
+    workers = 2
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(workers)))
+    return time.perf_counter() - started
+
+
+def main_():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    main.genai = SimpleNamespace(Client=StandInClient)
+    main.TruePersistentSession._build_config = lambda self: None
+    main.WorkerEngine._build_config = lambda self: None
+    main.SYNTHESIS_CACHE_ENABLED = False
+    print(f"{count} requests, {CALLERS} callers on one key")
+    baseline = None
+    for size, window in ((1, 1), (2, 1), (4, 1), (4, 2)):
+        elapsed = asyncio.run(run(count, size, window))
+        baseline = baseline or elapsed
+        print(f"sessions={size} window={window}  {elapsed:6.2f}s  "
+              f"{count / elapsed:6.1f} req/s  x{baseline / elapsed:.1f}")
+
+    print(f"\nWorkerEngine, {count} requests, 2 workers, one session per request")
+    baseline = None
+    for warm_sessions in (0, 2, 4):
+        with contextlib.redirect_stdout(io.StringIO()):  # WorkerEngine prints every request
+            elapsed = asyncio.run(run_per_request(count, warm_sessions))
+        baseline = baseline or elapsed
+        label = "connect per request" if not warm_sessions else f"{warm_sessions} warm sockets"
+        print(f"{label:<22} {elapsed:6.2f}s  {elapsed / count * 2 * 1000:5.0f} ms/request  "
+              f"x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main_()
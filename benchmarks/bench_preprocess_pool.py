@@ -0,0 +1,140 @@
+"""
+Benchmark folder pre-processing: iter_prepared_files() reading and chunking
+a folder of docx and txt files serially (workers=1) and in process pools of
+several sizes, with every start method the platform has (Windows only has
+spawn, where each worker process imports main.py and its GUI and API
+libraries before it prepares its first file).
+
+The corpus is CORPUS_DOCX docx files of chapter-to-novel size (about 20 KB
+to 1 MB of text, many paragraphs) and CORPUS_TXT txt files from a few KB to
+a few hundred KB, plus a few empty files and a few that cannot be read (a
+directory named like a txt file), so the per-file error path is covered
+too. Every pool must yield exactly the serial results: same order, same
+chunks, same error messages.
+
+Reported:
+- start-up: seconds until a fresh pool of N processes has run one task in
+  each, i.e. the fixed cost paid before any file is prepared (and what it
+  would be with a core per process, when the machine has fewer);
+- serial and pool wall clock per prepare function, and the speedup;
+- the serial time per docx / txt file, and how many files of each kind a
+  folder needs before the pool pays for its start-up, assuming a core per
+  process (PREPROCESS_MIN_FILES is set from the spawn docx figure; folders
+  of small txt files rarely reach theirs).
+
+On a machine with a single CPU the pool cannot be faster than serial; the
+table then shows the start-up and IPC overhead, and the spawn start-up is
+paid once per process instead of in parallel.
+
+Usage: python benchmarks/bench_preprocess_pool.py [workers ...] (default 2 4 and the CPU count)
+Needs python-docx.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+CORPUS_DOCX = 60
+CORPUS_TXT = 400
+WORDS = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "sẽ", "nói", "về",
+         "lịch", "sử", "Việt", "Nam", "một", "câu", "chuyện", "rất", "dài", "và", "thú", "vị"]
+
+
+def make_paragraph(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) + rnd.choice(["", "", "", "", ",", "."]) for _ in range(words))
+
+
+def make_corpus(folder: str, seed: int = 0) -> tuple:
+    """(docx paths, txt paths) of a generated folder"""
+    from docx import Document
+
+    rnd = random.Random(seed)
+    docx_paths = []
+    for i in range(CORPUS_DOCX):
+        path = os.path.join(folder, f"chapter_{i:04d}.docx")
+        document = Document()
+        size = int(min(rnd.lognormvariate(11, 0.8), 1_000_000))  # Characters, median ~60 KB
+        while size > 0:
+            paragraph = make_paragraph(rnd, rnd.randint(5, 120))
+            document.add_paragraph(paragraph)
+            size -= len(paragraph)
+        document.save(path)
+        docx_paths.append(path)
+    txt_paths = []
+    for i in range(CORPUS_TXT):
+        path = os.path.join(folder, f"note_{i:04d}.txt")
+        if i % 100 == 7:
+            os.mkdir(path)  # Unreadable: the error must come back for this file only
+        else:
+            words = 0 if i % 50 == 3 else int(rnd.lognormvariate(7, 1))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(make_paragraph(rnd, words))
+        txt_paths.append(path)
+    return docx_paths, txt_paths
+
+
+def run(paths, prepare, workers):
+    started = time.perf_counter()
+    results = list(main.iter_prepared_files(paths, prepare, workers=workers))
+    return time.perf_counter() - started, results
+
+
+def startup_seconds(workers: int, path: str) -> float:
+    """Fresh pool until each process has run one (trivial) main.py task"""
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(main._prepare_file_safely, os.path.getsize, path, ()) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    return time.perf_counter() - started
+
+
+def main_():
+    pool_sizes = [int(arg) for arg in sys.argv[1:]] or sorted({2, 4, os.cpu_count() or 1} - {1})
+    with tempfile.TemporaryDirectory() as tmp:
+        docx_paths, txt_paths = make_corpus(tmp)
+        paths = sorted(docx_paths + txt_paths)
+        size = sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+        print(f"{len(docx_paths)} docx + {len(txt_paths)} txt files, {size / 2**20:.1f} MB on disk, "
+              f"{os.cpu_count()} CPUs, PREPROCESS_MIN_FILES={main.PREPROCESS_MIN_FILES}")
+
+        per_file = {}
+        for kind, kind_paths in (("docx", docx_paths), ("txt", txt_paths)):
+            elapsed, _ = run(kind_paths, main.prepare_capcut_file, 1)
+            per_file[kind] = elapsed / len(kind_paths)
+            print(f"serial capcut {kind:<4} {per_file[kind] * 1000:8.1f} ms/file")
+
+        for method in multiprocessing.get_all_start_methods():
+            if method == "forkserver":
+                continue
+            multiprocessing.set_start_method(method, force=True)
+            print(f"\n-- start method: {method}")
+            for workers in pool_sizes:
+                startup = startup_seconds(workers, paths[0])
+                # With fewer cores than processes they started one after the other; with a core per
+                # process they start side by side, and the pool saves (1 - 1/workers) of the serial time
+                parallel_startup = startup / workers if (os.cpu_count() or 1) < workers else startup
+                needed = {kind: parallel_startup / (t * (1 - 1 / workers)) for kind, t in per_file.items()}
+                print(f"start-up {workers:2d} processes {startup:6.2f}s  (with {workers} cores: ~{parallel_startup:.2f}s, "
+                      f"pays off after ~{needed['docx']:.0f} docx or ~{needed['txt']:.0f} txt files)")
+            for name, prepare in (("edge", main.prepare_edge_file), ("capcut", main.prepare_capcut_file)):
+                baseline, expected = run(paths, prepare, 1)
+                errors = sum(1 for _, _, error in expected if error)
+                print(f"{name:<7} serial      {baseline:7.2f}s  ({errors} files with errors)")
+                for workers in pool_sizes:
+                    elapsed, results = run(paths, prepare, workers)
+                    assert results == expected, f"{name}: {workers} processes ({method}) differ from serial"
+                    print(f"{name:<7} {workers:2d} processes {elapsed:7.2f}s  x{baseline / elapsed:.2f}")
+    print("\nresults identical to serial")
+
+
+if __name__ == "__main__":
+    main_()
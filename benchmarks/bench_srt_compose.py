@@ -0,0 +1,81 @@
+"""
+Benchmark edge.srt_composer: the previous compose path (sort_and_reindex +
+Subtitle.to_srt per cue) against compose(), write_srt() and compose_cues().
+
+Usage: python benchmarks/bench_srt_compose.py [cue count, default 300000]
+(300k cues is about a 10-hour audiobook with WordBoundary subtitles)
+"""
+
+import io
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edge.srt_composer import (  # noqa: E402
+    MillisecondCues,
+    Subtitle,
+    compose,
+    compose_cues,
+    sort_and_reindex,
+    write_srt,
+)
+
+
+def make_word_cues(count: int):
+    """WordBoundary-like cues: consecutive words, 100ns offsets like Edge sends them"""
+    rnd = random.Random(0)
+    words = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "nói", "về", "Việt", "Nam"]
+    subtitles = []
+    offset = 500_000
+    for index in range(1, count + 1):
+        duration = rnd.randint(1_500_000, 6_000_000)
+        subtitles.append(Subtitle(
+            index=index,
+            start=timedelta(microseconds=offset / 10),
+            end=timedelta(microseconds=(offset + duration) / 10),
+            content=rnd.choice(words),
+        ))
+        offset += duration + rnd.randint(0, 800_000)
+    return subtitles
+
+
+def previous_compose(subtitles):
+    return "".join(subtitle.to_srt() for subtitle in sort_and_reindex(subtitles))
+
+
+def timed(label, func, baseline=None):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    speedup = f"  x{baseline / elapsed:.1f}" if baseline else ""
+    print(f"{label:<34} {elapsed:8.3f}s{speedup}")
+    return elapsed, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    subtitles = make_word_cues(count)
+    print(f"{count} cues")
+
+    baseline, expected = timed("previous compose", lambda: previous_compose(subtitles))
+    _, fast = timed("compose (fast path)", lambda: compose(subtitles), baseline)
+    stream = io.StringIO()
+    timed("write_srt -> file object", lambda: write_srt(stream, subtitles), baseline)
+    cues = MillisecondCues.from_subtitles(subtitles)
+    timed("compose_cues (ms arrays)", lambda: compose_cues(cues), baseline)
+
+    shuffled = subtitles[:]
+    random.Random(1).shuffle(shuffled)
+    shuffled_baseline, _ = timed("previous compose (unordered)", lambda: previous_compose(shuffled))
+    timed("compose (unordered)", lambda: compose(shuffled), shuffled_baseline)
+
+    assert fast == expected and stream.getvalue() == expected, "fast path output differs"
+    print("output identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark SubMaker's cue merging (merge_cues) on a long WordBoundary stream
+and on SentenceBoundary events, many of them too long for one subtitle.
+
+Every merged cue must keep the words in order, wrap into max_lines lines of
+max_chars_per_line (a lone over-long word excepted) and last at most
+max_duration_ms. The sentence events are drawn around the duration limit
+(just under, exactly at, just over, and several times it), the boundary
+where split pieces used to come out a few percent too long.
+
+Usage: python benchmarks/bench_subtitle_merge.py [event count, default 300000]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edge.data_classes import SubtitleLimits  # noqa: E402
+from edge.srt_composer import Subtitle  # noqa: E402
+from edge.submaker import merge_cues  # noqa: E402
+
+WORDS = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "nói", "về", "Việt", "Nam",
+         "thế", "giới", "nghiêngnghiêngnghiêng"]
+
+
+def make_word_cues(count: int, rnd: random.Random):
+    """WordBoundary-like cues, a sentence end now and then, gaps of varied length"""
+    subtitles = []
+    offset = 0.5
+    for index in range(1, count + 1):
+        duration = rnd.uniform(0.15, 0.6)
+        text = rnd.choice(WORDS) + ("." if rnd.random() < 0.08 else "")
+        subtitles.append(Subtitle(index, timedelta(seconds=offset), timedelta(seconds=offset + duration), text))
+        offset += duration + rnd.choice([0, 0, 0.05, 1.0])
+    return subtitles
+
+
+def make_sentence_cues(count: int, limits: SubtitleLimits, rnd: random.Random):
+    """SentenceBoundary-like cues lasting around whole multiples of max_duration_ms"""
+    subtitles = []
+    offset = 0.5
+    max_seconds = limits.max_duration_ms / 1000
+    for index in range(1, count + 1):
+        duration = max_seconds * rnd.randint(1, 6) * rnd.choice([0.97, 1.0, 1.0001, 1.03, 1.1])
+        text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 90))) + "."
+        subtitles.append(Subtitle(index, timedelta(seconds=offset), timedelta(seconds=offset + duration), text))
+        offset += duration + rnd.choice([0, 0.3])
+    return subtitles
+
+
+def check(subtitles, merged, limits: SubtitleLimits) -> None:
+    words = [word for subtitle in subtitles for word in subtitle.content.split()]
+    assert [word for cue in merged for word in cue.content.split()] == words, "words lost or reordered"
+    for cue in merged:
+        lines = cue.content.split("\n")
+        assert len(lines) <= limits.max_lines or len(cue.content.split()) == 1, f"too many lines: {cue.content!r}"
+        assert all(len(line) <= limits.max_chars_per_line for line in lines) or len(cue.content.split()) == 1, \
+            f"line too long: {cue.content!r}"
+        duration_ms = (cue.end - cue.start).total_seconds() * 1000
+        assert duration_ms <= limits.max_duration_ms, f"cue lasts {duration_ms:.1f} ms: {cue.content!r}"
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:8.3f}s  {len(result)} cues")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    rnd = random.Random(0)
+    print(f"{count} word events, {count // 20} sentence events per layout")
+    for limits in (SubtitleLimits(), SubtitleLimits(max_chars_per_line=20, max_lines=1, max_duration_ms=3000)):
+        label = f"{limits.max_lines}x{limits.max_chars_per_line}, {limits.max_duration_ms} ms"
+        words = make_word_cues(count, rnd)
+        check(words, timed(f"words     {label}", lambda: list(merge_cues(words, limits))), limits)
+        sentences = make_sentence_cues(count // 20, limits, rnd)
+        check(sentences, timed(f"sentences {label}", lambda: list(merge_cues(sentences, limits))), limits)
+    print("all cues within the limits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark the three text split modes (split_text_into_chunks,
+split_text_smart, split_text_by_punctuation_v2) against their previous
+implementations, which rescanned every chunk window backwards once per
+punctuation mark. The current ones resolve each break with bisect lookups
+on a TextBoundaryIndex: the sorted offsets of each punctuation mark,
+collected by one scan for that mark the first time a splitter asks for it
+(marks a mode never breaks at are not scanned), and a bounded str.rfind
+for the nearest space.
+
+Generated Vietnamese-like text from about 100 KB to 8 MB, with dense
+(a mark every few words) and sparse (long runs without any) punctuation.
+Every size must give the same chunks as the previous implementation, and
+the time per MB should stay flat as the input grows (linear scaling).
+
+Usage: python benchmarks/bench_text_split.py [sizes in KB ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+WORDS = ["xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "sẽ", "nói", "về",
+         "lịch", "sử", "Việt", "Nam", "một", "câu", "chuyện", "rất", "dài", "và", "thú", "vị"]
+MARKS = [".", ",", "!", "?", ";", ":", " -"]
+
+
+def make_text(size: int, words_per_mark: int, seed: int = 0) -> str:
+    """About `size` characters, a punctuation mark every ~words_per_mark words, a newline now and then"""
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rnd.choice(WORDS)
+        if rnd.random() < 1 / words_per_mark:
+            word += rnd.choice(MARKS)
+        if rnd.random() < 0.01:
+            word += "\n"
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)
+
+
+# ==================== PREVIOUS IMPLEMENTATIONS ====================
+
+def previous_split_text_into_chunks(text: str, chunk_size: int = 500) -> list:
+    cleaned_text = ' '.join(text.split())
+    chunks = []
+    current_pos = 0
+    while current_pos < len(cleaned_text):
+        end_pos = min(current_pos + chunk_size, len(cleaned_text))
+        if end_pos < len(cleaned_text):
+            chunk_text = cleaned_text[current_pos:end_pos]
+            best_break = -1
+            for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.8) - 1, -1):
+                if chunk_text[i] in '.!?。！？' and (i + 1 >= len(chunk_text) or chunk_text[i + 1] == ' '):
+                    best_break = i + 1
+                    break
+            if best_break == -1:
+                for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.8) - 1, -1):
+                    if chunk_text[i] in ',，;；':
+                        best_break = i + 1
+                        break
+            if best_break == -1:
+                for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.5) - 1, -1):
+                    if chunk_text[i] == ' ':
+                        best_break = i + 1
+                        break
+            if best_break != -1:
+                end_pos = current_pos + best_break
+        chunk_content = cleaned_text[current_pos:end_pos].strip()
+        if chunk_content:
+            chunks.append(chunk_content)
+        current_pos = end_pos
+    return chunks
+
+
+def previous_split_text_smart(text: str, max_chars: int = 450) -> list:
+    cleaned_text = ' '.join(text.split())
+    chunks = []
+    current_pos = 0
+    punctuation_breaks = ['!', '.', ',', '-', '?', ';', ':']
+    while current_pos < len(cleaned_text):
+        if len(cleaned_text) - current_pos <= max_chars:
+            chunk_content = cleaned_text[current_pos:].strip()
+            if chunk_content:
+                chunks.append(chunk_content)
+            break
+        chunk_text = cleaned_text[current_pos:current_pos + max_chars]
+        best_break = -1
+        for punct in punctuation_breaks:
+            search_start = max(0, len(chunk_text) - main.PUNCTUATION_SEARCH_WINDOW)
+            for i in range(len(chunk_text) - 1, search_start, -1):
+                if chunk_text[i] == punct:
+                    if i + 1 >= len(chunk_text) or chunk_text[i + 1] == ' ':
+                        best_break = i + 1
+                        break
+            if best_break != -1:
+                break
+        if best_break == -1:
+            for i in range(len(chunk_text) - 1, 0, -1):
+                if chunk_text[i] == ' ':
+                    best_break = i
+                    break
+        if best_break == -1 or best_break < max_chars * main.MIN_CHUNK_RATIO:
+            best_break = max_chars
+        chunk_content = cleaned_text[current_pos:current_pos + best_break].strip()
+        if chunk_content:
+            chunks.append(chunk_content)
+        current_pos = current_pos + best_break
+        while current_pos < len(cleaned_text) and cleaned_text[current_pos] == ' ':
+            current_pos += 1
+    return chunks
+
+
+def previous_split_text_by_punctuation_v2(text: str, target_chunk_size: int = 300) -> list:
+    cleaned_text = main.clean_text_for_tts(text)
+    chunks = []
+    current_pos = 0
+    while current_pos < len(cleaned_text):
+        if len(cleaned_text) - current_pos <= target_chunk_size:
+            chunk_content = main.remove_trailing_punctuation(cleaned_text[current_pos:].strip())
+            if chunk_content:
+                chunks.append(chunk_content)
+            break
+        search_end = min(current_pos + target_chunk_size, len(cleaned_text))
+        chunk_text = cleaned_text[current_pos:search_end]
+        best_break = -1
+        for i in range(len(chunk_text) - 1, -1, -1):
+            if chunk_text[i] in ['.', '!', '?', '。', '！', '？']:
+                best_break = i + 1
+                break
+        if best_break == -1:
+            for i in range(len(chunk_text) - 1, -1, -1):
+                if chunk_text[i] in [',', '-', ';', ':', '，', '；', '：']:
+                    best_break = i + 1
+                    break
+        if best_break == -1:
+            extended_search_start = current_pos + target_chunk_size
+            extended_search_end = min(extended_search_start + target_chunk_size, len(cleaned_text))
+            for i, char in enumerate(cleaned_text[extended_search_start:extended_search_end]):
+                if char in main.SENTENCE_BREAK_PUNCTUATION:
+                    best_break = target_chunk_size + i + 1
+                    break
+            if best_break == -1:
+                combined_text = cleaned_text[current_pos:extended_search_end]
+                for i in range(len(combined_text) - 1, target_chunk_size // 2, -1):
+                    if combined_text[i] == ' ':
+                        best_break = i + 1
+                        break
+        if best_break == -1 or best_break < int(target_chunk_size * main.MIN_CHUNK_RATIO_V2):
+            best_break = target_chunk_size
+        chunk_content = main.remove_trailing_punctuation(cleaned_text[current_pos:current_pos + best_break].strip())
+        if chunk_content:
+            chunks.append(chunk_content)
+        current_pos = current_pos + best_break
+        while current_pos < len(cleaned_text) and cleaned_text[current_pos] == ' ':
+            current_pos += 1
+    return chunks
+
+
+MODES = [
+    ("chunks", previous_split_text_into_chunks, lambda text: main.split_text_into_chunks(text, 500)),
+    ("smart", previous_split_text_smart, lambda text: main.split_text_smart(text, 450)),
+    ("v2", previous_split_text_by_punctuation_v2, lambda text: main.split_text_by_punctuation_v2(text, 300)),
+]
+
+
+def timed(func, text):
+    started = time.perf_counter()
+    result = func(text)
+    return time.perf_counter() - started, result
+
+
+def main_():
+    sizes = [int(arg) * 1024 for arg in sys.argv[1:]] or [100 * 1024, 500 * 1024, 2 * 2**20, 8 * 2**20]
+    print(f"{'size':>8}  {'punct':>6}  {'mode':>6}  {'previous':>9}  {'current':>9}  {'current/MB':>10}")
+    for words_per_mark, density in ((4, "dense"), (60, "sparse")):
+        for size in sizes:
+            text = make_text(size, words_per_mark)
+            mb = len(text.encode("utf-8")) / 2**20
+            for name, previous, current in MODES:
+                old_time, expected = timed(previous, text)
+                new_time, chunks = timed(current, text)
+                assert [chunk.text for chunk in chunks] == expected, f"{name} output differs at {size} bytes"
+                print(f"{size / 1024:6.0f}KB  {density:>6}  {name:>6}  {old_time:8.3f}s  {new_time:8.3f}s"
+                      f"  {new_time / mb:9.3f}s  x{old_time / new_time:.1f}")
+    print("output identical")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,111 @@
+"""
+Benchmark the memory of saving one utterance from a local stand-in for the
+Gemini Live server:
+
+- buffered: WorkerEngine.generate_audio() joins the chunks, then
+  save_wave_file() writes them (the old path).
+- streamed: WorkerEngine.stream_audio() writes every chunk to a WavSink as
+  it arrives and patches the WAV header at the end.
+
+The stand-in sends the audio of an utterance of the given length in chunks
+of CHUNK_BYTES, like the real server. Peak memory is measured with
+tracemalloc while one utterance is received and saved; the two WAV files
+are also compared byte for byte.
+
+Usage: python benchmarks/bench_wav_sink.py [seconds of audio ...]
+"""
+
+import asyncio
+import contextlib
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+CHUNK_BYTES = 9600  # 200 ms of 24 kHz 16-bit mono, about what the server sends per message
+
+
+class StandInSession:
+    def __init__(self, seconds: float):
+        self.total = int(seconds * main.RECEIVE_SAMPLE_RATE) * main.AUDIO_SAMPLE_WIDTH
+
+    async def send(self, input, end_of_turn=True):
+        pass
+
+    async def receive(self):
+        sent = 0
+        while sent < self.total:
+            size = min(CHUNK_BYTES, self.total - sent)
+            # A new bytes object per message, as the client decodes each one
+            yield SimpleNamespace(data=bytes([sent // CHUNK_BYTES % 251]) * size)
+            sent += size
+            await asyncio.sleep(0)
+
+
+class StandInConnection:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    async def __aenter__(self):
+        return StandInSession(self.seconds)
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def stand_in_client(seconds: float):
+    def client(**kwargs):
+        connect = lambda model, config: StandInConnection(seconds)  # noqa: E731
+        return SimpleNamespace(aio=SimpleNamespace(live=SimpleNamespace(connect=connect)))
+    return client
+
+
+async def buffered(engine, path: str):
+    audio = await engine.generate_audio("x")
+    main.save_wave_file(path, audio)
+
+
+async def streamed(engine, path: str):
+    with main.WavSink(path) as sink:
+        await engine.stream_audio("x", sink)
+
+
+def measure(seconds: float, save, path: str) -> tuple:
+    main.genai = SimpleNamespace(Client=stand_in_client(seconds))
+    engine = main.WorkerEngine(0, "bench-key", main.TTSConfig(), warm_sessions=0)
+    tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # WorkerEngine prints every request
+        asyncio.run(save(engine, path))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main_():
+    lengths = [float(arg) for arg in sys.argv[1:]] or [10, 60, 300, 900]
+    main.WorkerEngine._build_config = lambda self: None
+    main.SYNTHESIS_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "buffered.wav")
+        new_path = os.path.join(tmp, "streamed.wav")
+        print(f"{'audio':>7}  {'buffered peak':>13}  {'streamed peak':>13}  {'buffered':>8}  {'streamed':>8}")
+        for seconds in lengths:
+            old_peak, old_time = measure(seconds, buffered, old_path)
+            new_peak, new_time = measure(seconds, streamed, new_path)
+            assert filecmp.cmp(old_path, new_path, shallow=False), "streamed WAV differs"
+            print(f"{seconds:6.0f}s  {old_peak / 2**20:10.1f} MB  {new_peak / 2**20:10.2f} MB  "
+                  f"{old_time:7.2f}s  {new_time:7.2f}s")
+
+
+if __name__ == "__main__":
+    main_()
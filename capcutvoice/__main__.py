@@ -128,21 +128,14 @@ if __name__ == "__main__":
             mode = TextToSpeechHelper.BreakMode.Sentence
             clean_lines = [line.strip() for line in input_string.split('\n') if line.strip()]
             
-            chunk_size = 2
-            all_sentences = []
-            
-            for i in range(0, len(clean_lines), chunk_size):
-                chunk = clean_lines[i:i+chunk_size]
-                chunk_text = '\n'.join(chunk)
-                try:
-                    chunk_sentences = TextToSpeechHelper.break_sentence(chunk_text, max_length, mode)
-                    all_sentences.extend(chunk_sentences)
-                    print(f"Processed chunk {i//chunk_size + 1} of {(len(clean_lines)-1)//chunk_size + 1}")
-                except Exception as e:
-                    print(f"Error processing chunk {i//chunk_size + 1}: {str(e)}, skipping...")
-                    continue
+            # Break the whole file at once - newlines still end a sentence in Sentence mode
+            try:
+                sentences = TextToSpeechHelper.break_sentence('\n'.join(clean_lines), max_length, mode)
+            except Exception as e:
+                print(f"Error breaking {txt_file} into sentences: {str(e)}, skipping...")
+                incomplete_files.append(txt_file)
+                continue
             
-            sentences = all_sentences
             texts = [sentence.text.strip() for sentence in sentences]
             arr = split_text(texts, max_length)
             total_segments = len(arr)
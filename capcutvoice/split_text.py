@@ -1,20 +1,22 @@
 def split_text(arr_input, max_length):
     arr_lines = []
-    temp_lines = ""
-    text_seg = ""
+    temp_lines = []  # Lines of the current segment, joined with "\n" when it is full
+    temp_length = 0  # len("\n".join(temp_lines))
 
     for line in arr_input:
-        text_seg += "\n" + line
-        if (len(line) + len(temp_lines) + (1 if temp_lines else 0)) < max_length:
-            if temp_lines:
-                temp_lines += "\n"
-            temp_lines += line
+        if (len(line) + temp_length + (1 if temp_length else 0)) < max_length:
+            if temp_length:
+                temp_lines.append(line)
+                temp_length += 1 + len(line)
+            else:
+                temp_lines = [line]
+                temp_length = len(line)
         else:
-            arr_lines.append(temp_lines)
-            temp_lines = line
+            arr_lines.append("\n".join(temp_lines))
+            temp_lines = [line]
+            temp_length = len(line)
 
-    if temp_lines:
-        arr_lines.append(temp_lines)
+    if temp_length:
+        arr_lines.append("\n".join(temp_lines))
 
     return arr_lines
-
@@ -8,6 +8,8 @@ class TextToSpeechHelper:
         Custom = 2
 
     class Sentence:
+        __slots__ = ('text', 'start', 'end')
+
         def __init__(self, text, start, end):
             self.text = text
             self.start = start
@@ -39,75 +41,59 @@ class TextToSpeechHelper:
 
     @staticmethod
     def break_tts_sentence(text, max_length, skip_new_line, skip_end_sentence):
+        """
+        Chia text thành các câu theo newline / dấu kết câu / max_length.
+
+        Jumps from break to break instead of walking every character: each
+        sentence is found with bounded str.find / regex searches over its
+        own window, so long texts are split in linear time.
+        """
+        if max_length < 1:
+            raise ValueError("max_length must be >= 1")
         sentences = []
-        index = 0
         length = len(text)
+        find_end = TextToSpeechHelper._END_SENTENCE_RE.search
+        last_end = TextToSpeechHelper._LAST_END_SENTENCE_RE.match
+        last_break = TextToSpeechHelper._LAST_BREAK_CHAR_RE.match
         start = 0
-        last_dot = -1
-        last_comma = -1
-        last_line = -1
-        while index < length:
-            c = text[index]
+        while start < length:
+            limit = start + max_length
+            # Newline / sentence end at index == limit still win over the length cut
+            window_end = min(limit + 1, length)
+            line_end = -1 if skip_new_line else text.find('\n', start, window_end)
+            # A sentence end only counts more than 5 chars after the start (and before the newline)
+            sentence_end = None if skip_end_sentence else find_end(
+                text, start + 6, line_end if line_end >= 0 else window_end)
 
-            if not skip_new_line and TextToSpeechHelper.is_new_line(c):
-                sentences.append(TextToSpeechHelper.Sentence(
-                    text=text[start:index],
-                    start=start,
-                    end=index,
-                ))
-                last_line = -1
-                last_dot = -1
-                last_comma = -1
-                start = index + 1
-                index += 1
+            if sentence_end is not None:
+                index = sentence_end.end()
+                sentences.append(TextToSpeechHelper.Sentence(text=text[start:index], start=start, end=index))
+                start = index
                 continue
-            else:
-                if not skip_end_sentence and TextToSpeechHelper.is_end_sentence(c) and index > start + 5:
-                    sentences.append(TextToSpeechHelper.Sentence(
-                        text=text[start:index + 1],
-                        start=start,
-                        end=index + 1,
-                    ))
-                    last_line = -1
-                    last_dot = -1
-                    last_comma = -1
-                    start = index + 1
-                    index += 1
-                    continue
-                if index - start >= max_length:
-                    if skip_new_line and last_line > 0 and last_line - start < max_length and last_line - start > max_length / 3:
-                        index = last_line
-                    elif last_dot > 0 and last_dot - start < max_length:
-                        index = last_dot + 1
-                    elif last_comma > 0 and last_comma - start < max_length:
-                        index = last_comma + 1
-                    else:
-                        # Tìm khoảng trống gần nhất trước max_length
-                        cut_point = start + max_length - 1
-                        while cut_point > start and text[cut_point] != ' ':
-                            cut_point -= 1
-                        if cut_point > start:
-                            index = cut_point + 1
-                        else:
-                            index = start + max_length
-                    sentences.append(TextToSpeechHelper.Sentence(
-                        text=text[start:index],
-                        start=start,
-                        end=index,
-                    ))
-                    last_line = -1
-                    last_dot = -1
-                    last_comma = -1
-                    start = index
-                    continue
+            if line_end >= 0:
+                sentences.append(TextToSpeechHelper.Sentence(text=text[start:line_end], start=start, end=line_end))
+                start = line_end + 1
+                continue
+            if limit >= length:
+                break
 
-            if TextToSpeechHelper.is_new_line(c):
-                last_line = index
-            if TextToSpeechHelper.is_end_sentence(c):
-                last_dot = index
-            if TextToSpeechHelper.is_break_char(c):
-                last_comma = index
-            index += 1
+            # Length cut: prefer newline (Custom), then sentence end, then break char, then space
+            last_line = text.rfind('\n', start, limit) if skip_new_line else -1
+            if last_line > 0 and last_line - start > max_length / 3:
+                index = last_line
+            else:
+                # Greedy match -> the last sentence end / break char before limit
+                last = last_end(text, start, limit)
+                if last is None or last.end() == 1:
+                    last = last_break(text, start, limit)
+                if last is not None and last.end() > 1:
+                    index = last.end()
+                else:
+                    # Tìm khoảng trống gần nhất trước max_length
+                    cut_point = text.rfind(' ', start + 1, limit)
+                    index = cut_point + 1 if cut_point > start else limit
+            sentences.append(TextToSpeechHelper.Sentence(text=text[start:index], start=start, end=index))
+            start = index
 
         # Xử lý phần cuối cùng với kiểm tra bổ sung
         if start < length:
@@ -132,6 +118,9 @@ class TextToSpeechHelper:
 
     END_CHARS = {'.', '!', ':', '?', '…', '。', '？', '！'}
     BREAK_CHARS = {',', ';', '，', '、'}
+    _END_SENTENCE_RE = re.compile('[' + re.escape(''.join(sorted(END_CHARS))) + ']')
+    _LAST_END_SENTENCE_RE = re.compile('.*[' + re.escape(''.join(sorted(END_CHARS))) + ']', re.S)
+    _LAST_BREAK_CHAR_RE = re.compile('.*[' + re.escape(''.join(sorted(BREAK_CHARS))) + ']', re.S)
 
     @staticmethod
     def is_end_sentence(char):
@@ -3,6 +3,7 @@ needing Windows or the Edge browser."""
 
 from . import exceptions
 from .communicate import Communicate
+from .data_classes import SubtitleLimits
 from .submaker import SubMaker
 from .version import __version__, __version_info__
 from .voices import VoicesManager, list_voices
@@ -10,6 +11,7 @@ from .voices import VoicesManager, list_voices
 __all__ = [
     "Communicate",
     "SubMaker",
+    "SubtitleLimits",
     "exceptions",
     "__version__",
     "__version_info__",
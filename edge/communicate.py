@@ -4,6 +4,7 @@ end-users. The other classes and functions are for internal use only."""
 import asyncio
 import concurrent.futures
 import json
+import re
 import ssl
 import time
 import uuid
@@ -62,6 +63,17 @@ def get_headers_and_data(
     return headers, data[header_length + 2 :]
 
 
+# Maximum size of the escaped text of one SSML request, in UTF-8 bytes.
+SSML_TEXT_BYTE_LIMIT = 4096
+
+# Control characters rejected by the service, mapped to spaces.
+_INCOMPATIBLE_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Preferred split points, best first. A split lands right after the separator.
+_SENTENCE_SEPARATORS = (b". ", b"! ", b"? ", "… ".encode("utf-8"))
+_CLAUSE_SEPARATORS = (b"; ", b": ", b", ")
+
+
 def remove_incompatible_characters(string: Union[str, bytes]) -> str:
     """
     The service does not support a couple character ranges.
@@ -80,14 +92,7 @@ def remove_incompatible_characters(string: Union[str, bytes]) -> str:
     if not isinstance(string, str):
         raise TypeError("string must be str or bytes")
 
-    chars: List[str] = list(string)
-
-    for idx, char in enumerate(chars):
-        code: int = ord(char)
-        if (0 <= code <= 8) or (11 <= code <= 12) or (14 <= code <= 31):
-            chars[idx] = " "
-
-    return "".join(chars)
+    return _INCOMPATIBLE_CHARACTERS.sub(" ", string)
 
 
 def connect_id() -> str:
@@ -251,6 +256,98 @@ def split_text_by_byte_length(
         yield remaining_chunk
 
 
+def _rfind_separator(
+    text: bytes, separators: Tuple[bytes, ...], start: int, end: int
+) -> int:
+    """
+    Finds the rightmost split point right after one of `separators` within
+    `text[start:end]`.
+
+    Returns:
+        int: The split index, or -1 if no separator is found.
+    """
+    best = -1
+    for separator in separators:
+        found = text.rfind(separator, start, end)
+        if found >= 0:
+            best = max(best, found + len(separator))
+    return best
+
+
+def plan_text_chunks(
+    text: str, byte_length: int = SSML_TEXT_BYTE_LIMIT
+) -> List[bytes]:
+    """
+    Plans the SSML text chunks for `text` in a single pass.
+
+    The text is cleaned, XML escaped and UTF-8 encoded once, and split points
+    are chosen directly on the escaped bytes, preferring (within the second
+    half of each window) line breaks, then sentence ends, then clause
+    separators, then any space. A hard split never cuts a multi-byte UTF-8
+    character or an XML entity.
+
+    The returned chunks can be passed to Communicate as-is, which then sends
+    them without splitting again.
+
+    Args:
+        text (str): The raw (unescaped) text.
+        byte_length (int): The maximum byte length of every escaped chunk.
+
+    Returns:
+        list of bytes: Escaped, UTF-8 encoded, whitespace-stripped chunks.
+
+    Raises:
+        TypeError: If `text` is not str.
+        ValueError: If `byte_length` is too small to fit a single character or entity.
+    """
+    if not isinstance(text, str):
+        raise TypeError("text must be str")
+    if byte_length <= 0:
+        raise ValueError("byte_length must be greater than 0")
+
+    data = escape(remove_incompatible_characters(text)).encode("utf-8")
+    chunks: List[bytes] = []
+    start, total = 0, len(data)
+
+    while total - start > byte_length:
+        limit = start + byte_length
+        floor = start + byte_length // 2
+
+        split_at = data.rfind(b"\n", floor, limit)
+        if split_at < 0:
+            split_at = _rfind_separator(data, _SENTENCE_SEPARATORS, floor, limit)
+        if split_at < 0:
+            split_at = _rfind_separator(data, _CLAUSE_SEPARATORS, floor, limit)
+        if split_at < 0:
+            split_at = data.rfind(b" ", start, limit)
+        if split_at <= start:
+            # No whitespace at all: back off to the start of a UTF-8 character
+            split_at = limit
+            while split_at > start and data[split_at] & 0xC0 == 0x80:
+                split_at -= 1
+
+        # Never cut inside an XML entity such as '&amp;'
+        ampersand = data.rfind(b"&", max(start, split_at - 8), split_at)
+        if ampersand >= 0 and data.find(b";", ampersand, split_at) < 0:
+            split_at = ampersand
+
+        if split_at <= start:
+            raise ValueError(
+                "Maximum byte length is too small or "
+                "invalid text structure near '&' or invalid UTF-8"
+            )
+
+        chunk = data[start:split_at].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = split_at
+
+    remaining_chunk = data[start:].strip()
+    if remaining_chunk:
+        chunks.append(remaining_chunk)
+    return chunks
+
+
 def mkssml(tc: TTSConfig, escaped_text: Union[str, bytes]) -> str:
     """
     Creates a SSML string from the given parameters.
@@ -317,7 +414,7 @@ class Communicate:
     # pylint: disable=too-many-arguments
     def __init__(
         self,
-        text: str,
+        text: Union[str, List[bytes]],
         voice: str = DEFAULT_VOICE,
         *,
         rate: str = "+0%",
@@ -332,15 +429,18 @@ class Communicate:
         # Validate TTS settings and store the TTSConfig object.
         self.tts_config = TTSConfig(voice, rate, volume, pitch, boundary)
 
-        # Validate the text parameter.
-        if not isinstance(text, str):
-            raise TypeError("text must be str")
-
-        # Split the text into multiple strings and store them.
-        self.texts = split_text_by_byte_length(
-            escape(remove_incompatible_characters(text)),
-            4096,
-        )
+        # Validate the text parameter and plan the SSML chunks. A list is taken
+        # as chunks already planned by plan_text_chunks and is not split again.
+        if isinstance(text, str):
+            self.texts: List[bytes] = plan_text_chunks(text)
+        elif isinstance(text, list) and all(isinstance(t, bytes) for t in text):
+            if any(len(t) > SSML_TEXT_BYTE_LIMIT for t in text):
+                raise ValueError(
+                    f"planned chunks must not exceed {SSML_TEXT_BYTE_LIMIT} bytes"
+                )
+            self.texts = text
+        else:
+            raise TypeError("text must be str or a list of planned bytes chunks")
 
         # Validate the proxy parameter.
         if proxy is not None and not isinstance(proxy, str):
@@ -76,6 +76,33 @@ class TTSConfig:
         self.validate_string_param("pitch", self.pitch, r"^[+-]\d+Hz$")
 
 
+@dataclass
+class SubtitleLimits:
+    """
+    Layout and reading-speed limits used when SubMaker merges boundary events
+    into subtitle cues.
+    """
+
+    max_chars_per_line: int = 42
+    max_lines: int = 2
+    min_duration_ms: int = 1000
+    max_duration_ms: int = 7000
+    max_cps: float = 17.0  # Characters per second a viewer is expected to read
+
+    def __post_init__(self) -> None:
+        """
+        Validates the SubtitleLimits object after initialization.
+        """
+        if self.max_chars_per_line < 1 or self.max_lines < 1:
+            raise ValueError("max_chars_per_line and max_lines must be at least 1")
+        if self.min_duration_ms < 0 or self.max_duration_ms <= 0:
+            raise ValueError("min_duration_ms must be >= 0 and max_duration_ms > 0")
+        if self.min_duration_ms > self.max_duration_ms:
+            raise ValueError("min_duration_ms must not exceed max_duration_ms")
+        if self.max_cps <= 0:
+            raise ValueError("max_cps must be positive")
+
+
 class UtilArgs(argparse.Namespace):
     """CLI arguments."""
 
@@ -88,4 +115,5 @@ class UtilArgs(argparse.Namespace):
     pitch: str
     write_media: str
     write_subtitles: str
+    merge_subtitles: bool
     proxy: str
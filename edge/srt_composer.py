@@ -14,10 +14,13 @@ See the LICENSE-MIT file for details.
 """
 
 import functools
+import itertools
 import logging
+import operator
 import re
+from array import array
 from datetime import timedelta
-from typing import Generator, List, Union
+from typing import Generator, Iterable, List, Optional, TextIO, Union
 
 LOG = logging.getLogger(__name__)
 
@@ -36,6 +39,11 @@ SECONDS_IN_HOUR = 3600
 SECONDS_IN_MINUTE = 60
 HOURS_IN_DAY = 24
 MICROSECONDS_IN_MILLISECOND = 1000
+MILLISECONDS_IN_SECOND = 1000
+ONE_MILLISECOND = timedelta(milliseconds=1)
+
+# SRT blocks joined per write() when composing to a file object
+WRITE_BATCH_SIZE = 4096
 
 
 @functools.total_ordering
@@ -281,13 +289,393 @@ def compose(
     :rtype: str
     """
     if reindex:
-        subtitles = sort_and_reindex(
-            subtitles, start_index=start_index, in_place=in_place
+        return compose_cues(
+            _reindexed_cues(subtitles, start_index, in_place), eol=eol, skip=False
         )
 
     return "".join(subtitle.to_srt(eol=eol) for subtitle in subtitles)
 
 
+def write_srt(
+    stream: TextIO,
+    subtitles: Union[Generator[Subtitle, None, None], List[Subtitle]],
+    reindex: bool = True,
+    start_index: int = 1,
+    eol: Union[str, None] = None,
+    in_place: bool = False,
+) -> int:
+    r"""
+    Like :py:func:`compose`, but write the SRT blocks straight to a text file
+    object in batches instead of building one string.
+
+    :param stream: A writable text file object
+    :returns: The number of SRT blocks written
+    :rtype: int
+    """
+    if reindex:
+        cues = _reindexed_cues(subtitles, start_index, in_place)
+        return compose_cues(cues, eol=eol, skip=False, stream=stream)
+
+    written = 0
+    subtitles = iter(subtitles)
+    while True:
+        batch = list(itertools.islice(subtitles, WRITE_BATCH_SIZE))
+        if not batch:
+            return written
+        stream.write("".join(subtitle.to_srt(eol=eol) for subtitle in batch))
+        written += len(batch)
+
+
+class MillisecondCues:
+    """
+    Subtitle cues as parallel columns: integer millisecond start/end times in
+    arrays plus a list of contents. A few dozen bytes per cue instead of a
+    :py:class:`Subtitle` with two :py:class:`~datetime.timedelta` objects, and
+    :py:func:`compose_cues` formats them without per-cue timedelta arithmetic.
+
+    :param start_index: Index of the first cue (indexes are consecutive)
+    """
+
+    def __init__(self, start_index: int = 1) -> None:
+        self.start_index = start_index
+        self.starts = array("q")
+        self.ends = array("q")
+        self.contents: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def append(self, start_ms: int, end_ms: int, content: str) -> None:
+        """Add one cue (milliseconds from the start of the audio)"""
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.contents.append(content)
+
+    @classmethod
+    def from_subtitles(
+        cls, subtitles: Iterable[Subtitle], start_index: int = 1
+    ) -> "MillisecondCues":
+        """Columns of the given subtitles in their current order (times floored to ms)"""
+        cues = cls(start_index)
+        for subtitle in subtitles:
+            cues.append(
+                subtitle.start // ONE_MILLISECOND,
+                subtitle.end // ONE_MILLISECOND,
+                subtitle.content,
+            )
+        return cues
+
+    def is_ordered(self) -> bool:
+        """Whether the cues are sorted by (start, end)"""
+        starts, ends = self.starts, self.ends
+        return all(
+            a < b or (a == b and ends[i] <= ends[i + 1])
+            for i, (a, b) in enumerate(zip(starts, itertools.islice(starts, 1, None)))
+        )
+
+
+MILLISECONDS_IN_HOUR = SECONDS_IN_HOUR * MILLISECONDS_IN_SECOND
+
+# Lookup tables for the fields of a timestamp: "MM:SS," of every second of an
+# hour and "000" .. "999"
+_MINUTE_SECOND_FIELDS = [
+    f"{mins:02}:{secs:02}," for mins in range(60) for secs in range(SECONDS_IN_MINUTE)
+]
+_MILLISECOND_FIELDS = [f"{msecs:03}" for msecs in range(MILLISECONDS_IN_SECOND)]
+
+
+def _timestamp_fields(values_ms: List[int]) -> tuple:
+    """Iterators over the "HH:", "MM:SS," and "mmm" fields of each timestamp"""
+    hours = list(map(MILLISECONDS_IN_HOUR.__rfloordiv__, values_ms))
+    hour_fields = {hrs: f"{hrs:02}:" for hrs in set(hours)}
+    return (
+        map(hour_fields.__getitem__, hours),
+        map(
+            _MINUTE_SECOND_FIELDS.__getitem__,
+            map(
+                SECONDS_IN_HOUR.__rmod__,
+                map(MILLISECONDS_IN_SECOND.__rfloordiv__, values_ms),
+            ),
+        ),
+        map(
+            _MILLISECOND_FIELDS.__getitem__,
+            map(MILLISECONDS_IN_SECOND.__rmod__, values_ms),
+        ),
+    )
+
+
+# Digit columns of a "HH:MM:SS,mmm" timestamp: (column, divisor, base)
+_TIMESTAMP_DIGITS = (
+    (0, 36_000_000, 10),
+    (1, 3_600_000, 10),
+    (3, 600_000, 6),
+    (4, 60_000, 10),
+    (6, 10_000, 6),
+    (7, 1_000, 10),
+    (9, 100, 10),
+    (10, 10, 10),
+    (11, 1, 10),
+)
+TIMING_LINE_TEMPLATE = b"00:00:00,000 --> 00:00:00,000"
+# Largest offset the fixed-width (two-digit hour) timing line can hold
+MAX_FIXED_WIDTH_MS = 100 * MILLISECONDS_IN_HOUR - 1
+
+
+def timing_lines(
+    starts_ms: List[int], ends_ms: List[int], decimal: str = ","
+) -> List[str]:
+    r"""
+    "start --> end" lines of many cues at once. With numpy available (and all
+    times within 0-99 hours) the digits of every line are computed as array
+    columns into one fixed-width buffer; otherwise the timestamps are built
+    from lookup tables (see :py:func:`format_srt_timestamps`).
+
+    .. doctest::
+
+        >>> timing_lines([1000], [2500])
+        ['00:00:01,000 --> 00:00:02,500']
+        >>> timing_lines([1000], [2500], decimal=".")
+        ['00:00:01.000 --> 00:00:02.500']
+
+    :param decimal: Separator before the milliseconds ("," for SRT, "." for
+                    WebVTT)
+    """
+    count = len(starts_ms)
+    try:
+        import numpy as np  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        np = None
+    if np is None or count == 0:
+        return _joined_timing_lines(starts_ms, ends_ms, decimal)
+
+    starts = np.asarray(starts_ms, dtype=np.int64)
+    ends = np.asarray(ends_ms, dtype=np.int64)
+    lowest = min(starts.min(), ends.min())
+    if lowest < 0 or max(starts.max(), ends.max()) > MAX_FIXED_WIDTH_MS:
+        return _joined_timing_lines(starts_ms, ends_ms, decimal)
+
+    width = len(TIMING_LINE_TEMPLATE)
+    lines = np.empty((count, width), dtype=np.uint8)
+    lines[:] = np.frombuffer(
+        TIMING_LINE_TEMPLATE.replace(b",", decimal.encode("ascii")), dtype=np.uint8
+    )
+    for values, offset in ((starts, 0), (ends, width - 12)):
+        for column, divisor, base in _TIMESTAMP_DIGITS:
+            lines[:, offset + column] += (values // divisor % base).astype(np.uint8)
+    text = lines.tobytes().decode("ascii")
+    return [text[pos : pos + width] for pos in range(0, count * width, width)]
+
+
+def _joined_timing_lines(
+    starts_ms: List[int], ends_ms: List[int], decimal: str = ","
+) -> List[str]:
+    fields = zip(
+        *_timestamp_fields(starts_ms),
+        itertools.repeat(" --> "),
+        *_timestamp_fields(ends_ms),
+    )
+    lines = list(map("".join, fields))
+    if decimal != ",":
+        # Only the decimal separators contain a comma
+        lines = [line.replace(",", decimal) for line in lines]
+    return lines
+
+
+def format_srt_timestamps(values_ms: Iterable[int]) -> List[str]:
+    r"""
+    Convert many millisecond offsets to SRT timestamps at once. Each field
+    comes from a lookup table, so per value there are only a few integer
+    divisions and lookups, all run by map() in C.
+
+    .. doctest::
+
+        >>> format_srt_timestamps([0, 4_984_001])
+        ['00:00:00,000', '01:23:04,001']
+
+    :param values_ms: Offsets in milliseconds
+    :returns: The timestamps in SRT format
+    :rtype: list of str
+    """
+    if not isinstance(values_ms, (list, array)):
+        values_ms = list(values_ms)
+    return list(map("".join, zip(*_timestamp_fields(values_ms))))
+
+
+def compose_cues(
+    cues: MillisecondCues,
+    eol: Union[str, None] = None,
+    skip: bool = True,
+    stream: Optional[TextIO] = None,
+) -> Union[str, int]:
+    r"""
+    Compose :py:class:`MillisecondCues` into SRT blocks. The cues are written
+    in their stored order with consecutive indexes from ``cues.start_index`` -
+    use :py:meth:`MillisecondCues.is_ordered` / :py:func:`compose` when they may
+    need sorting.
+
+    .. doctest::
+
+        >>> cues = MillisecondCues()
+        >>> cues.append(1000, 2500, 'x')
+        >>> compose_cues(cues)
+        '1\n00:00:01,000 --> 00:00:02,500\nx\n\n'
+
+    :param cues: The cues to compose
+    :param str eol: The end of line string to use (default "\\n")
+    :param bool skip: Whether to skip cues considered not useful (see
+                      :py:func:`sort_and_reindex`)
+    :param stream: If given, blocks are written to this text file object in
+                   batches and the number of blocks is returned
+    :returns: The SRT formatted string, or the number of blocks written
+    """
+    if eol is None:
+        eol = "\n"
+    starts, ends, contents = cue_columns(cues, skip)
+
+    rows = zip(
+        itertools.count(cues.start_index),
+        timing_lines(starts, ends),
+        _legal_contents(contents, eol),
+    )
+    template = f"%d{eol}%s{eol}%s{eol}{eol}"
+    if stream is None:
+        return "".join(_format_batches(template, rows))
+
+    written = 0
+    for text, count in _format_batches(template, rows, with_count=True):
+        stream.write(text)
+        written += count
+    return written
+
+
+def cue_columns(cues: MillisecondCues, skip: bool = True) -> tuple:
+    """
+    The (starts, ends, contents) columns of cues, without the cues considered
+    not useful if skip is set (see :py:func:`sort_and_reindex`)
+    """
+    starts, ends, contents = cues.starts, cues.ends, cues.contents
+    if skip and not _all_useful(starts, ends, contents, 0):
+        rows = [
+            row
+            for row in range(len(contents))
+            if contents[row].strip() and 0 <= starts[row] < ends[row]
+        ]
+        LOG.info("Skipped %d subtitles", len(contents) - len(rows))
+        starts = [starts[row] for row in rows]
+        ends = [ends[row] for row in rows]
+        contents = [contents[row] for row in rows]
+    return starts, ends, contents
+
+
+def to_millisecond_cues(
+    subtitles: Union[Generator[Subtitle, None, None], List[Subtitle]],
+    start_index: int = 1,
+    in_place: bool = False,
+) -> MillisecondCues:
+    r"""
+    Sort, filter and number subtitles like :py:func:`compose` does, as
+    :py:class:`MillisecondCues` for the writers of any subtitle format.
+
+    :param int start_index: The index to start from
+    :param bool in_place: Whether to renumber the subtitles themselves too
+    :rtype: :py:class:`MillisecondCues`
+    """
+    return _reindexed_cues(subtitles, start_index, in_place)
+
+
+def _format_batches(template: str, rows: Iterable[tuple], with_count: bool = False):
+    """Format rows WRITE_BATCH_SIZE at a time with one % operation per batch"""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, WRITE_BATCH_SIZE))
+        if not batch:
+            return
+        text = (template * len(batch)) % tuple(itertools.chain.from_iterable(batch))
+        yield (text, len(batch)) if with_count else text
+
+
+def _all_useful(starts, ends, contents: List[str], zero) -> bool:
+    """Bulk check that no cue would be skipped (see SUBTITLE_SKIP_CONDITIONS)"""
+    return (
+        all(map(str.strip, contents))
+        and (not starts or min(starts) >= zero)
+        and all(map(operator.lt, starts, ends))
+    )
+
+
+def _legal_contents(contents: List[str], eol: str) -> List[str]:
+    """make_legal_content plus the eol replacement of Subtitle.to_srt, for all contents"""
+    if "\n" not in "".join(contents):
+        # Single-line contents (the usual case) are legal as they are
+        return contents
+    contents = list(map(make_legal_content, contents))
+    if eol != "\n":
+        contents = [content.replace("\n", eol) for content in contents]
+    return contents
+
+
+def _reindexed_cues(
+    subtitles: Union[Generator[Subtitle, None, None], List[Subtitle]],
+    start_index: int,
+    in_place: bool,
+) -> MillisecondCues:
+    """
+    Same selection and numbering as :py:func:`sort_and_reindex`, but without
+    copying the subtitles and without sorting input that is already ordered
+    (the usual case for subtitles built from a TTS stream). Skip rules are
+    checked on the exact timedeltas before the times are floored to ms.
+    """
+    subtitles = subtitles if isinstance(subtitles, list) else list(subtitles)
+    if not _is_sorted(subtitles):
+        subtitles = sorted(subtitles)
+
+    starts = [subtitle.start for subtitle in subtitles]
+    ends = [subtitle.end for subtitle in subtitles]
+    contents = [subtitle.content for subtitle in subtitles]
+    if not _all_useful(starts, ends, contents, ZERO_TIMEDELTA):
+        kept = []
+        for subtitle in subtitles:
+            try:
+                _should_skip_sub(subtitle)
+            except _ShouldSkipException as thrown_exc:
+                if subtitle.index is None:
+                    LOG.info("Skipped subtitle with no index: %s", thrown_exc)
+                else:
+                    LOG.info(
+                        "Skipped subtitle at index %d: %s", subtitle.index, thrown_exc
+                    )
+                continue
+            kept.append(subtitle)
+        subtitles = kept
+        starts = [subtitle.start for subtitle in subtitles]
+        ends = [subtitle.end for subtitle in subtitles]
+        contents = [subtitle.content for subtitle in subtitles]
+
+    if in_place:
+        for index, subtitle in enumerate(subtitles, start=start_index):
+            subtitle.index = index
+
+    cues = MillisecondCues(start_index)
+    cues.starts = array("q", map(ONE_MILLISECOND.__rfloordiv__, starts))
+    cues.ends = array("q", map(ONE_MILLISECOND.__rfloordiv__, ends))
+    cues.contents = contents
+    return cues
+
+
+def _is_sorted(subtitles: List[Subtitle]) -> bool:
+    """Whether sorted() would keep this order (strictly increasing starts is checked in C)"""
+    starts = [subtitle.start for subtitle in subtitles]
+    if all(map(operator.lt, starts, itertools.islice(starts, 1, None))):
+        return True
+    try:
+        return all(
+            not b < a for a, b in zip(subtitles, itertools.islice(subtitles, 1, None))
+        )
+    except TypeError:
+        # Equal times and a missing index - let sorted() decide (and complain)
+        return False
+
+
 class _ShouldSkipException(Exception):
     """
     Raised when a subtitle should be skipped.
@@ -1,11 +1,20 @@
 """SubMaker module is used to generate subtitles from WordBoundary and SentenceBoundary events."""
 
+import math
 from datetime import timedelta
-from typing import List, Optional
+from typing import Generator, Iterable, List, Optional, TextIO, Tuple
 
-from .srt_composer import Subtitle, compose
+from .data_classes import SubtitleLimits
+from .srt_composer import MillisecondCues, Subtitle, compose, to_millisecond_cues
+from .subtitle_formats import write_cues
 from .typing import TTSChunk
 
+# A cue that ends with one of these closes as soon as it is readable
+SENTENCE_END_CHARS = ".!?…。！？"
+
+# (start, end, words) of one boundary event or of a part of an oversized one
+_Piece = Tuple[timedelta, timedelta, List[str]]
+
 
 class SubMaker:
     """
@@ -47,14 +56,270 @@ class SubMaker:
             )
         )
 
-    def get_srt(self) -> str:
+    def get_srt(self, limits: Optional[SubtitleLimits] = None) -> str:
         """
         Get the SRT formatted subtitles from the SubMaker object.
 
+        Args:
+            limits (SubtitleLimits): If given, consecutive boundaries are merged
+                into cues that respect these limits (see merge_cues).
+
         Returns:
             str: The SRT formatted subtitles.
         """
+        if limits is not None:
+            return compose(merge_cues(self.cues, limits))
         return compose(self.cues)
 
+    def get_cues(self, limits: Optional[SubtitleLimits] = None) -> MillisecondCues:
+        """
+        Get the subtitles as millisecond cues, sorted and numbered like
+        get_srt, for the writers of edge.subtitle_formats.
+
+        Args:
+            limits (SubtitleLimits): If given, boundaries are merged as in get_srt.
+
+        Returns:
+            MillisecondCues: The cues.
+        """
+        if limits is not None:
+            return to_millisecond_cues(merge_cues(self.cues, limits))
+        return to_millisecond_cues(self.cues)
+
+    def write_subtitles(
+        self,
+        stream: TextIO,
+        fmt: str = "srt",
+        limits: Optional[SubtitleLimits] = None,
+    ) -> int:
+        """
+        Write the subtitles to a text file object in batches.
+
+        Args:
+            stream (TextIO): Where to write.
+            fmt (str): "srt", "vtt", "ass", "json" or "ndjson".
+            limits (SubtitleLimits): If given, boundaries are merged as in get_srt.
+
+        Returns:
+            int: The number of cues written.
+        """
+        return write_cues(stream, self.get_cues(limits), fmt)
+
     def __str__(self) -> str:
         return self.get_srt()
+
+
+def merge_cues(
+    cues: Iterable[Subtitle], limits: SubtitleLimits
+) -> Generator[Subtitle, None, None]:
+    """
+    Merge consecutive boundary cues (in time order) into readable subtitles in
+    one pass, linear in the number of words:
+
+    - Words are added to the current cue while it still wraps into
+      max_lines lines of max_chars_per_line and lasts at most max_duration_ms.
+    - A cue ending a sentence is closed early once it lasts min_duration_ms
+      and can be read at max_cps.
+    - A single event too long for one cue is split at word boundaries, with
+      its time shared in proportion to characters.
+    - Each finished cue is extended towards min_duration_ms and the time
+      needed at max_cps, but never past the start of the next cue.
+
+    Args:
+        cues (Iterable[Subtitle]): Boundary cues sorted by start time.
+        limits (SubtitleLimits): Layout and timing limits.
+
+    Yields:
+        Subtitle: The merged cues, indexed from 1.
+    """
+    current = _CueBuilder(limits)
+    held: Optional[Subtitle] = None  # Finished cue, settled once the next start is known
+    index = 0
+    for cue in cues:
+        for piece in _split_oversized(cue, limits):
+            if not current.empty and not current.can_add(piece):
+                index += 1
+                finished = current.take(index)
+                if held is not None:
+                    yield _settle(held, finished.start, limits)
+                held = finished
+            current.add(piece)
+            if current.at_sentence_end() and current.readable():
+                index += 1
+                finished = current.take(index)
+                if held is not None:
+                    yield _settle(held, finished.start, limits)
+                held = finished
+    if not current.empty:
+        index += 1
+        finished = current.take(index)
+        if held is not None:
+            yield _settle(held, finished.start, limits)
+        held = finished
+    if held is not None:
+        yield _settle(held, None, limits)
+
+
+class _CueBuilder:
+    """Words of the cue being built, wrapped into lines as they are added"""
+
+    __slots__ = ("limits", "lines", "words", "chars", "start", "end")
+
+    def __init__(self, limits: SubtitleLimits) -> None:
+        self.limits = limits
+        self.lines: List[str] = []
+        self.words = 0
+        self.chars = 0  # Length of the words joined by single spaces
+        self.start = timedelta(0)
+        self.end = timedelta(0)
+
+    @property
+    def empty(self) -> bool:
+        return self.words == 0
+
+    def can_add(self, piece: _Piece) -> bool:
+        _, end, words = piece
+        if (end - self.start).total_seconds() * 1000 > self.limits.max_duration_ms:
+            return False
+        return _wrapped_line_count(
+            words, self.limits.max_chars_per_line, len(self.lines), len(self.lines[-1])
+        ) <= self.limits.max_lines
+
+    def add(self, piece: _Piece) -> None:
+        start, end, words = piece
+        if self.empty:
+            self.start = start
+        self.end = max(self.end, end)
+        max_chars = self.limits.max_chars_per_line
+        for word in words:
+            if self.lines and len(self.lines[-1]) + 1 + len(word) <= max_chars:
+                self.lines[-1] += " " + word
+            else:
+                self.lines.append(word)
+            self.chars += len(word) + (1 if self.words else 0)
+            self.words += 1
+
+    def at_sentence_end(self) -> bool:
+        return not self.empty and self.lines[-1][-1] in SENTENCE_END_CHARS
+
+    def readable(self) -> bool:
+        seconds = (self.end - self.start).total_seconds()
+        return (
+            seconds * 1000 >= self.limits.min_duration_ms
+            and self.chars <= seconds * self.limits.max_cps
+        )
+
+    def take(self, index: int) -> Subtitle:
+        """Return the built cue and start an empty one"""
+        cue = Subtitle(index, self.start, self.end, "\n".join(self.lines))
+        self.lines = []
+        self.words = 0
+        self.chars = 0
+        self.end = timedelta(0)
+        return cue
+
+
+def _wrapped_line_count(
+    words: List[str], max_chars: int, lines: int = 0, line_length: int = 0
+) -> int:
+    """Lines used after greedily wrapping words onto `lines` lines (the last `line_length` long)"""
+    for word in words:
+        if lines and line_length + 1 + len(word) <= max_chars:
+            line_length += 1 + len(word)
+        else:
+            lines += 1
+            line_length = len(word)
+    return lines
+
+
+def _split_oversized(
+    cue: Subtitle, limits: SubtitleLimits
+) -> Generator[_Piece, None, None]:
+    """
+    The words of a boundary cue as one piece, or as several consecutive pieces
+    if they do not fit one subtitle (layout or max duration). Each part gets a
+    share of the cue's time proportional to its characters. No piece lasts
+    longer than max_duration_ms: a single word whose share is longer is cut
+    short at the limit.
+    """
+    words = cue.content.split()
+    if not words:
+        return
+    duration = cue.end - cue.start
+    duration_ms = duration.total_seconds() * 1000
+    max_chars = limits.max_chars_per_line
+    fits_layout = _wrapped_line_count(words, max_chars) <= limits.max_lines
+    if fits_layout and duration_ms <= limits.max_duration_ms:
+        yield cue.start, cue.end, words
+        return
+
+    total_chars = sum(map(len, words)) + len(words) - 1
+    capacity = limits.max_lines * max_chars
+    parts = max(
+        math.ceil(duration_ms / limits.max_duration_ms),
+        math.ceil(total_chars / capacity),
+        1,
+    )
+    # Each part ends near an even share of the characters still left; the
+    # layout and duration limits are hard
+    max_chars_in_time = limits.max_duration_ms / duration_ms * total_chars
+    group: List[str] = []
+    group_chars = 0
+    lines = line_length = 0
+    done_chars = 0
+    boundary = total_chars / parts
+    for word in words:
+        position = done_chars + group_chars
+        if lines and line_length + 1 + len(word) <= max_chars:
+            next_lines, next_length = lines, line_length + 1 + len(word)
+        else:
+            next_lines, next_length = lines + 1, len(word)
+        past_boundary = position + 1 + len(word) - boundary > boundary - position
+        too_long = group_chars + 1 + len(word) > max_chars_in_time
+        if group and (next_lines > limits.max_lines or past_boundary or too_long):
+            yield _piece_between(cue.start, duration, done_chars, group_chars, total_chars, group, limits)
+            done_chars += group_chars + 1
+            group, group_chars = [], 0
+            next_lines, next_length = 1, len(word)
+            parts = max(parts - 1, 1)
+            boundary = done_chars + (total_chars - done_chars) / parts
+        group_chars += len(word) + (1 if group else 0)
+        group.append(word)
+        lines, line_length = next_lines, next_length
+    yield _piece_between(cue.start, duration, done_chars, group_chars, total_chars, group, limits)
+
+
+def _piece_between(
+    start: timedelta,
+    duration: timedelta,
+    done_chars: int,
+    chars: int,
+    total_chars: int,
+    words: List[str],
+    limits: SubtitleLimits,
+) -> _Piece:
+    """Piece covering characters [done_chars, done_chars + chars) of a cue's text, at most max_duration_ms long"""
+    end_chars = min(done_chars + chars, total_chars)
+    piece_start = start + duration * (done_chars / total_chars)
+    piece_end = start + duration * (end_chars / total_chars)
+    return (
+        piece_start,
+        min(piece_end, piece_start + timedelta(milliseconds=limits.max_duration_ms)),
+        words,
+    )
+
+
+def _settle(
+    cue: Subtitle, next_start: Optional[timedelta], limits: SubtitleLimits
+) -> Subtitle:
+    """Extend a finished cue towards min duration / max_cps without reaching the next cue"""
+    chars = len(cue.content)
+    needed_ms = max(limits.min_duration_ms, chars / limits.max_cps * 1000)
+    target = cue.start + timedelta(
+        milliseconds=min(needed_ms, limits.max_duration_ms)
+    )
+    if next_start is not None:
+        target = min(target, next_start)
+    if target > cue.end:
+        cue.end = target
+    return cue
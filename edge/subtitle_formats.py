@@ -0,0 +1,275 @@
+"""Streaming writers of subtitle formats for millisecond cues.
+
+All writers take :py:class:`~edge.srt_composer.MillisecondCues`, the shared
+cue model with integer millisecond times, so converting between formats
+never goes through (and re-parses) text timestamps. Cues are written in
+their stored order, a batch at a time, to a text file object.
+"""
+
+import itertools
+import json
+import os
+from typing import Callable, Dict, List, TextIO, Union
+
+from .srt_composer import (
+    MILLISECONDS_IN_HOUR,
+    MILLISECONDS_IN_SECOND,
+    SECONDS_IN_HOUR,
+    SECONDS_IN_MINUTE,
+    MillisecondCues,
+    _format_batches,
+    _legal_contents,
+    compose_cues,
+    cue_columns,
+    timing_lines,
+)
+
+# File extension -> format name
+FORMAT_EXTENSIONS = {
+    ".srt": "srt",
+    ".vtt": "vtt",
+    ".ass": "ass",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, \
+BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, \
+BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,16,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,\
+100,100,0,0,1,1,0,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+# "MM:SS." of every second of an hour and "00" .. "99" (ASS times are centiseconds)
+_ASS_MINUTE_SECOND_FIELDS = [
+    f"{mins:02}:{secs:02}." for mins in range(60) for secs in range(SECONDS_IN_MINUTE)
+]
+_CENTISECOND_FIELDS = [f"{centis:02}" for centis in range(100)]
+
+_JSON_STRING = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def format_for_path(path: str, default: str = "srt") -> str:
+    """
+    Subtitle format named by the extension of path.
+
+    .. doctest::
+
+        >>> format_for_path("movie.en.VTT")
+        'vtt'
+        >>> format_for_path("-")
+        'srt'
+    """
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def format_ass_timestamps(values_ms: List[int]) -> List[str]:
+    """
+    ASS timestamps (H:MM:SS.cc, centiseconds rounded down) of many offsets.
+
+    .. doctest::
+
+        >>> format_ass_timestamps([0, 4_984_019])
+        ['0:00:00.00', '1:23:04.01']
+    """
+    hours = list(map(MILLISECONDS_IN_HOUR.__rfloordiv__, values_ms))
+    hour_fields = {hrs: f"{hrs}:" for hrs in set(hours)}
+    fields = zip(
+        map(hour_fields.__getitem__, hours),
+        map(
+            _ASS_MINUTE_SECOND_FIELDS.__getitem__,
+            map(
+                SECONDS_IN_HOUR.__rmod__,
+                map(MILLISECONDS_IN_SECOND.__rfloordiv__, values_ms),
+            ),
+        ),
+        map(
+            _CENTISECOND_FIELDS.__getitem__,
+            map(
+                (MILLISECONDS_IN_SECOND // 100).__rfloordiv__,
+                map(MILLISECONDS_IN_SECOND.__rmod__, values_ms),
+            ),
+        ),
+    )
+    return list(map("".join, fields))
+
+
+def write_srt_cues(
+    stream: TextIO, cues: MillisecondCues, eol: Union[str, None] = None, skip: bool = True
+) -> int:
+    """SRT blocks (see :py:func:`~edge.srt_composer.compose_cues`)"""
+    return compose_cues(cues, eol=eol, skip=skip, stream=stream)
+
+
+def write_vtt_cues(
+    stream: TextIO, cues: MillisecondCues, eol: Union[str, None] = None, skip: bool = True
+) -> int:
+    """
+    WebVTT file: the header, then blocks like SRT with "." before the
+    milliseconds.
+
+    .. doctest::
+
+        >>> import io
+        >>> cues = MillisecondCues()
+        >>> cues.append(1000, 2500, 'x')
+        >>> out = io.StringIO()
+        >>> write_vtt_cues(out, cues)
+        1
+        >>> out.getvalue()
+        'WEBVTT\\n\\n1\\n00:00:01.000 --> 00:00:02.500\\nx\\n\\n'
+    """
+    if eol is None:
+        eol = "\n"
+    starts, ends, contents = cue_columns(cues, skip)
+    stream.write(f"WEBVTT{eol}{eol}")
+    rows = zip(
+        itertools.count(cues.start_index),
+        timing_lines(starts, ends, decimal="."),
+        _legal_contents(contents, eol),
+    )
+    return _write_batches(stream, f"%d{eol}%s{eol}%s{eol}{eol}", rows)
+
+
+def write_ass_cues(
+    stream: TextIO, cues: MillisecondCues, eol: Union[str, None] = None, skip: bool = True
+) -> int:
+    r"""
+    Advanced SubStation Alpha file with one Default style and a Dialogue line
+    per cue (line breaks become \N).
+
+    .. doctest::
+
+        >>> import io
+        >>> cues = MillisecondCues()
+        >>> cues.append(1000, 2500, 'a\nb')
+        >>> out = io.StringIO()
+        >>> write_ass_cues(out, cues)
+        1
+        >>> out.getvalue().splitlines()[-1]
+        'Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,a\\Nb'
+    """
+    if eol is None:
+        eol = "\n"
+    starts, ends, contents = cue_columns(cues, skip)
+    header = ASS_HEADER if eol == "\n" else ASS_HEADER.replace("\n", eol)
+    stream.write(header)
+    rows = zip(
+        format_ass_timestamps(starts),
+        format_ass_timestamps(ends),
+        map(_ass_text, contents),
+    )
+    return _write_batches(stream, f"Dialogue: 0,%s,%s,Default,,0,0,0,,%s{eol}", rows)
+
+
+def write_json_cues(
+    stream: TextIO, cues: MillisecondCues, eol: Union[str, None] = None, skip: bool = True
+) -> int:
+    """
+    Compact JSON timings: an array of {"index", "start", "end", "text"}
+    objects with times in milliseconds.
+
+    .. doctest::
+
+        >>> import io
+        >>> cues = MillisecondCues()
+        >>> cues.append(1000, 2500, 'x')
+        >>> out = io.StringIO()
+        >>> write_json_cues(out, cues)
+        1
+        >>> json.loads(out.getvalue())
+        [{'index': 1, 'start': 1000, 'end': 2500, 'text': 'x'}]
+    """
+    if eol is None:
+        eol = "\n"
+    starts, ends, contents = cue_columns(cues, skip)
+    rows = zip(
+        itertools.count(cues.start_index), starts, ends, map(_JSON_STRING, contents)
+    )
+    template = f',{eol}{{"index":%d,"start":%d,"end":%d,"text":%s}}'
+    written = 0
+    for text, count in _format_batches(template, rows, with_count=True):
+        # Every object follows a comma except the first one
+        stream.write(text if written else f"[{eol}" + text[1 + len(eol):])
+        written += count
+    stream.write(f"{eol}]{eol}" if written else f"[]{eol}")
+    return written
+
+
+def write_ndjson_cues(
+    stream: TextIO, cues: MillisecondCues, eol: Union[str, None] = None, skip: bool = True
+) -> int:
+    """
+    Newline-delimited JSON timings: one {"index", "start", "end", "text"}
+    object per line, times in milliseconds. Readers can stream it line by
+    line.
+    """
+    if eol is None:
+        eol = "\n"
+    starts, ends, contents = cue_columns(cues, skip)
+    rows = zip(
+        itertools.count(cues.start_index), starts, ends, map(_JSON_STRING, contents)
+    )
+    return _write_batches(
+        stream, f'{{"index":%d,"start":%d,"end":%d,"text":%s}}{eol}', rows
+    )
+
+
+WRITERS: Dict[str, Callable[..., int]] = {
+    "srt": write_srt_cues,
+    "vtt": write_vtt_cues,
+    "ass": write_ass_cues,
+    "json": write_json_cues,
+    "ndjson": write_ndjson_cues,
+}
+
+
+def write_cues(
+    stream: TextIO,
+    cues: MillisecondCues,
+    fmt: str = "srt",
+    eol: Union[str, None] = None,
+    skip: bool = True,
+) -> int:
+    """
+    Write cues to a text file object in one of the formats of WRITERS.
+
+    :param fmt: "srt", "vtt", "ass", "json" or "ndjson" (see
+                :py:func:`format_for_path`)
+    :param bool skip: Whether to leave out cues considered not useful (no
+                      content, negative start, start >= end)
+    :returns: The number of cues written
+    :rtype: int
+    """
+    try:
+        writer = WRITERS[fmt]
+    except KeyError:
+        raise ValueError(
+            f"Unknown subtitle format {fmt!r}, expected one of {', '.join(WRITERS)}"
+        ) from None
+    return writer(stream, cues, eol=eol, skip=skip)
+
+
+def _ass_text(content: str) -> str:
+    """Cue text on one Dialogue line: blank lines dropped, line breaks as \\N"""
+    return r"\N".join(line.strip() for line in content.splitlines() if line.strip())
+
+
+def _write_batches(stream: TextIO, template: str, rows) -> int:
+    written = 0
+    for text, count in _format_batches(template, rows, with_count=True):
+        stream.write(text)
+        written += count
+    return written
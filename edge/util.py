@@ -9,7 +9,8 @@ from tabulate import tabulate
 
 from . import Communicate, SubMaker, list_voices
 from .constants import DEFAULT_VOICE
-from .data_classes import UtilArgs
+from .data_classes import SubtitleLimits, UtilArgs
+from .subtitle_formats import format_for_path
 from .version import __version__
 
 
@@ -77,7 +78,10 @@ async def _run_tts(args: UtilArgs) -> None:
                 submaker.feed(chunk)
 
         if sub_file is not None:
-            sub_file.write(submaker.get_srt())
+            limits = SubtitleLimits() if args.merge_subtitles else None
+            submaker.write_subtitles(
+                sub_file, format_for_path(args.write_subtitles), limits
+            )
     finally:
         if audio_file is not sys.stdout.buffer:
             audio_file.close()
@@ -113,7 +117,13 @@ async def amain() -> None:
     )
     parser.add_argument(
         "--write-subtitles",
-        help="send subtitle output to provided file instead of stderr",
+        help="send subtitle output to provided file instead of stderr "
+        "(format from the extension: .srt, .vtt, .ass, .json or .ndjson)",
+    )
+    parser.add_argument(
+        "--merge-subtitles",
+        help="merge boundaries into cues of at most 2 lines x 42 chars, 1-7s, 17 chars/s",
+        action="store_true",
     )
     parser.add_argument("--proxy", help="use a proxy for TTS and voice list.")
     parser.add_argument(
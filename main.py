@@ -8,18 +8,28 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk 
 from pathlib import Path
+from array import array
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Iterable, Iterator
 from queue import Queue, Empty
 import time
 import subprocess
 import glob
 import random
+import bisect
+import heapq
+import itertools
+import math
 import requests
 import base64
+import hashlib
+import io
 import shutil
+import struct
 import sys
 import concurrent.futures
+import multiprocessing
 from urllib.parse import quote
 
 def resource_path(relative_path):
@@ -367,6 +377,13 @@ VIENEU_DEFAULT_DEVICE = "Auto"  # Auto, CPU, CUDA
 VIENEU_SAMPLE_RATE = 24000
 VIENEU_NO_TOKEN_ERR = "No valid speech tokens"
 
+# VN TTS token budget (prompt + generated speech tokens share one context window)
+VIENEU_MAX_CONTEXT = 2048  # Backbone context window (max_context in vieneu_tts)
+VIENEU_PROMPT_TEMPLATE_TOKENS = 24  # Chat template + special tokens around the prompt
+VIENEU_PHONEME_CHARS_PER_TOKEN = 2.0  # Phoneme chars per token when no tokenizer is available
+VIENEU_SPEECH_TOKENS_PER_SYLLABLE = 12.0  # Default speaking rate (50 codec frames/s, ~4 syllables/s)
+VIENEU_SPEECH_TOKEN_MARGIN = 1.2  # Head-room on the speech token estimate (slow/emphatic reading)
+
 # Enhanced Retry settings
 MAX_RETRIES = 5  # Tăng số lần retry
 RECOVERY_EXTRA_RETRIES = 1  # Extra retries for recovery mode (missing chunk retry)
@@ -378,12 +395,57 @@ CAPCUT_RATE_LIMIT_DELAY = 0.5  # Delay giữa các requests để tránh rate li
 # Text chunking settings
 CAPCUT_MAX_CHUNK_SIZE = 400  # Capcut max chars per API call (reduced from 450 for safety)
 CAPCUT_LONG_TEXT_THRESHOLD = 400  # Threshold to trigger chunking for Capcut
-EDGE_MAX_CHUNK_SIZE = 1000  # Edge TTS max chars per chunk
-EDGE_LONG_TEXT_THRESHOLD = 1000  # Threshold to trigger chunking for Edge TTS
+EDGE_SSML_MAX_BYTES = 4096  # Edge TTS max escaped UTF-8 bytes per chunk (one SSML request)
 GEMINI_DEFAULT_CHUNK_SIZE = 300  # Default chunk size for Gemini TTS file processing
 MIN_CHUNK_RATIO = 0.5  # Minimum chunk size ratio before force breaking
 PUNCTUATION_SEARCH_WINDOW = 100  # Characters to search backwards for punctuation
 MIN_CHUNK_RATIO_V2 = 0.25  # For v2 mode: minimum chunk ratio before forcing break
+CHUNK_STREAM_BUFFER_CHARS = 65536  # Normalized text kept in memory by streaming chunkers
+CHUNK_QUEUE_AHEAD_PER_WORKER = 8  # Chunks queued ahead of each worker in streaming mode (longest-first window)
+SUBTITLE_READ_BATCH = 256  # Cues parsed per read when a subtitle file is streamed into the workers
+
+# Chunk scheduling (longest-first dispatch + tail splitting)
+GEMINI_REQUEST_OVERHEAD_SECONDS = 1.5  # Initial estimate of connect + first-byte latency per request
+GEMINI_SECONDS_PER_SYLLABLE = 0.12  # Initial estimate of synthesis time per syllable
+LATENCY_EWMA_ALPHA = 0.3  # Weight of the newest latency sample in the running estimates
+TAIL_SPLIT_MIN_SYLLABLES = 20  # Tail chunks are only split if both halves get at least this many
+
+# Cue batching (opt-in): adjacent short SRT cues share one Gemini request, the audio is split at pauses
+CUE_BATCH_MAX_WORDS = 3  # Cues of at most this many words are batched
+CUE_BATCH_MAX_CUES = 6  # Cues per request (more cues = fewer requests but harder to split)
+CUE_BATCH_FRAME_MS = 10  # Energy frame of the pause detector
+CUE_BATCH_SILENCE_DB = 35  # Frames this far below the loud (95th percentile) frames count as silence
+CUE_BATCH_MIN_PAUSE_MS = 80  # Shorter silences are not split candidates
+CUE_BATCH_LONG_PAUSE_MS = 300  # Pauses this long get the full bonus when choosing cut points
+CUE_BATCH_MAX_DEVIATION = 0.6  # A cut may be this many average cue lengths from where it was expected
+
+# Live Session Mode (persistent WebSockets shared by all workers of one API key)
+LIVE_SESSIONS_PER_KEY = 2  # Concurrent Live sessions per key - each request goes to the least-loaded one
+LIVE_SESSION_WINDOW = 1  # Turns in flight per session (>1 sends the next text before the audio is back; turns are answered in order)
+WARM_SESSIONS_PER_KEY = 2  # Per-request mode: pre-connected sockets kept ready per key (0 = connect per request; they count as open sessions of the key)
+WARM_SESSION_MAX_AGE_SECONDS = 480  # Warm sockets are replaced after this (the server closes connections at ~10 min)
+
+# Adaptive rate control per API key (AIMD): concurrency and request rate grow while a key is healthy, are cut on 429 / RESOURCE_EXHAUSTED
+KEY_MAX_CONCURRENCY = 8  # Multi-worker mode: workers started per key; workers_per_key is how many may send at first
+KEY_INITIAL_RPS = 2.0  # Token bucket refill rate of a key at the start (requests per second)
+KEY_MIN_RPS = 0.1
+KEY_MAX_RPS = 20.0
+KEY_RPS_INCREASE = 0.05  # Added to the rate per healthy request (concurrency grows by 1 per full window of them)
+KEY_DECREASE_FACTOR = 0.5  # Rate and concurrency are multiplied by this on a rate-limit error (once per window)
+KEY_SLOW_FACTOR = 2.0  # A request slower than this × its estimated time does not grow the limits
+KEY_COOLDOWN_SECONDS = 5  # A rate-limited key gets no requests for this long (doubles while it stays limited, up to MAX_RETRY_DELAY)
+KEY_ERROR_STREAK = 3  # Failed requests in a row (any error) that cool the key down like a rate limit
+KEY_RPS_WINDOW_SECONDS = 10  # Window of the measured req/s
+KEY_STATS_LOG_SECONDS = 30  # Period of the per-key req/s + concurrency log line
+
+# Key health: items go to the best-scored key that can send now, failing keys are taken out of the rotation
+KEY_HEALTH_WINDOW = 20  # Latest requests of a key its success rate and p50/p95 latency are measured on
+KEY_HEALTH_MIN_SAMPLES = 6  # Requests in the window before a low success rate quarantines the key
+KEY_MIN_SUCCESS_RATE = 0.5  # A key below this success rate is quarantined (while another key can take its work)
+KEY_DAILY_QUOTA = 0  # Requests per key per day (0 = unknown: only a daily-quota error marks a key exhausted)
+KEY_QUOTA_LOW = 50  # Keys with fewer requests left today are scored down (used when the others are busy)
+KEY_PROBE_SECONDS = 30  # A quarantined key gets one item as a probe after this (doubles while probes fail)
+KEY_PROBE_MAX_SECONDS = 600
 
 # Punctuation marks for "Ngắt dòng v2" mode - used to find break points
 # Note: Dash '-' is included for breaking but NOT removed (keeps compound words readable)
@@ -393,6 +455,29 @@ SENTENCE_BREAK_PUNCTUATION = ['.', '!', '?', ',', '-', ';', ':', '。', '！', '
 PUNCTUATION_TO_REMOVE = ['.', '!', '?', ',', ';', ':', '。', '！', '？', '，', '；', '：']
 FFMPEG_TIMEOUT_SECONDS = 300  # FFmpeg merge timeout
 
+# Rate-limit error patterns - the key is throttled (handled by its KeyRateController)
+RATE_LIMIT_ERROR_PATTERNS = [
+    "429",
+    "resource_exhausted",
+    "resource exhausted",
+    "rate limit",
+    "quota",
+    "too many requests",
+]
+
+# Dead-key error patterns - the key is quarantined (probed again later) and its items go to other keys
+INVALID_KEY_ERROR_PATTERNS = [
+    "api key not valid",
+    "api_key_invalid",
+    "permission_denied",
+    "permission denied",
+    "unauthenticated",
+]
+DAILY_QUOTA_ERROR_PATTERNS = [
+    "perday",  # e.g. GenerateRequestsPerDayPerProjectPerModel
+    "per day",
+]
+
 # Connection error patterns - lỗi cần retry nhiều hơn
 CONNECTION_ERROR_PATTERNS = [
     "no audio",
@@ -411,9 +496,45 @@ CONNECTION_ERROR_PATTERNS = [
     "429",
 ]
 
+# Folder pre-processing (read + clean + chunk files in a process pool)
+PREPROCESS_MIN_FILES = 64  # Smaller folders are read serially (a spawned worker first imports this module: ~1.5 s, ~50 docx reads)
+PREPROCESS_MIN_FILES = 64  # Smaller folders are read serially: a spawned worker imports this module (~1 s) first, the time of ~40-60 docx reads
+PREPROCESS_AHEAD_PER_WORKER = 4  # Files prepared ahead of synthesis per worker process (bounds memory)
+
+# Timeline dubbing (SRT cues -> one continuous track)
+DUB_MAX_SPEEDUP = 1.6  # Clips are sped up at most this much to fit their cue (beyond it speech gets hard to follow)
+DUB_WSOLA_FRAME_MS = 30  # WSOLA analysis frame (windows overlap by half)
+DUB_WSOLA_TOLERANCE_MS = 8  # How far WSOLA may shift a frame to keep the waveform continuous
+DUB_CROSSFADE_MS = 0  # Crossfade where a clip runs into the next cue's clip (0 = mix both)
+DUB_MEMMAP_MIN_SECONDS = 1800  # Longer tracks are rendered into the output file (np.memmap) instead of RAM
+DUB_PARTIAL_MAX_FRACTION = 0.5  # Re-render only the changed spans of a dub track while they cover less than this
+DUB_TIMING_EXPORT = "json"  # Where each clip really plays in the dub track (after speed-up): "srt", "vtt", "ass", "json", "ndjson" or "" (none)
+
+# Pre-flight timing check of SRT/VTT input (runs before any API request)
+SPEAKING_RATE_SYLLABLES_PER_SECOND = 5.5  # Typical Gemini voice at speed 1.0 (Vietnamese: one syllable per word)
+SUBTITLE_GAP_WARN_MS = 10000  # Silences between cues longer than this are reported
+SUBTITLE_CHECK_MAX_LOGGED = 20  # Issues listed one by one in the log (all of them are counted)
+SUBTITLE_TIMING_MODES = {  # GUI label -> mode
+    "Timing: tự sửa": "fix",  # Trim overlaps, swap reversed times, stretch cues too short for their text into the gap
+    "Timing: chỉ cảnh báo": "warn",
+    "Timing: dừng nếu lỗi": "reject",  # Overlapping / reversed cues stop the job
+}
+
+# Forced-timing subtitles (SRT/VTT next to merged long-text audio, timed from chunk lengths)
+FORCED_SUBTITLE_MAX_CHARS = 84  # Chunk text is split into cues of at most this many chars (0 = one cue per chunk)
+FORCED_SUBTITLE_FORMAT = "srt"  # "srt", "vtt", "ass", "json" or "ndjson" (JSON = integer ms timings for other tools)
+
 # Audio file validation
 MIN_AUDIO_FILE_SIZE = 100  # Minimum bytes for a valid audio file
 
+# Synthesis cache (content-addressed audio shared by all engines)
+SYNTHESIS_CACHE_ENABLED = True
+SYNTHESIS_CACHE_DIR_NAME = "tts_cache"  # Created inside the app directory
+SYNTHESIS_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # LRU eviction above 2 GB
+
+# Re-dubbing edited SRT files: per-cue manifest kept next to the clips
+CLIP_MANIFEST_NAME = "_clips_manifest.json"  # CapCut / Edge SRT clips (<index>.mp3); Gemini uses _<prefix>_manifest.json
+
 # Error message display
 ERROR_MSG_MAX_LENGTH = 50  # Maximum characters to display in error messages
 
@@ -463,7 +584,7 @@ def get_default_ffmpeg_path() -> str:
 # DATA STRUCTURES
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class Subtitle:
     index: int
     start_time: str
@@ -488,6 +609,8 @@ class TTSConfig:
     live_session_enabled: bool = False
     # Keep voice beta mode - wrap text in {content} for Gemini to maintain consistent voice
     keep_voice_beta: bool = False
+    # Cue batching - adjacent short SRT cues share one request, the audio is split at pauses
+    cue_batching: bool = False
 
 
 @dataclass 
@@ -498,110 +621,354 @@ class GeneratedAudio:
     duration_ms: float
 
 
-@dataclass
+@dataclass(slots=True)
 class TextChunk:
     """Chunk of text for long text TTS"""
     index: int
     text: str
     original_length: int
+    # Tail splitting: part number (1-based) and number of parts of chunk `index`
+    part: int = 0
+    parts: int = 1
+
+
+# =============================================================================
+# CHUNK TABLE
+# =============================================================================
+
+class StringColumn:
+    """Append-only column of strings stored as one UTF-8 buffer plus an offset array"""
+    
+    __slots__ = ('_data', '_offsets')
+    
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, row: int) -> str:
+        return self._data[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+    
+    def append(self, value: str):
+        self._data += value.encode('utf-8')
+        self._offsets.append(len(self._data))
+    
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+
+class ChunkTable:
+    """
+    Columnar storage of the chunks/subtitles of one job.
+    
+    Text lives in one UTF-8 buffer with offsets, index/length/status/attempt/samples
+    are array.array columns and output paths come from path_for(index) (only paths
+    that differ from it are stored). TextChunk / Subtitle objects are created on
+    demand as views of one row, so a 500k-line job costs tens of bytes per row
+    plus its text instead of a dataclass + dict entries per chunk.
+    
+    With text_for(index), the table keeps no text at all: it is read back
+    through text_for when a row is viewed (e.g. from a file written as the
+    rows were produced), so memory does not grow with the input text.
+    """
+    
+    PENDING = 0
+    DONE = 1
+    FAILED = 2
+    
+    def __init__(self, path_for: Optional[Callable[[int], str]] = None, with_times: bool = False,
+                 text_for: Optional[Callable[[int], str]] = None):
+        self.path_for = path_for or (lambda index: "")  # index -> default output path
+        self.text_for = text_for  # index -> text, for tables that do not keep it
+        self.index = array('q')
+        self.texts = StringColumn() if text_for is None else None
+        self.original_length = array('I')
+        self.status = bytearray()
+        self.attempts = bytearray()
+        self.samples = array('Q')  # Audio length of finished rows (0 = unknown, read from the file)
+        self.start_times = StringColumn() if with_times else None
+        self.end_times = StringColumn() if with_times else None
+        self._paths: Dict[int, str] = {}  # row -> path not following the template
+        self._row_map: Optional[Dict[int, int]] = None
+    
+    @classmethod
+    def from_subtitles(cls, subtitles: Iterable[Subtitle],
+                       path_for: Optional[Callable[[int], str]] = None) -> 'ChunkTable':
+        table = cls(path_for, with_times=True)
+        for sub in subtitles:
+            table.append(sub.index, sub.text, start_time=sub.start_time, end_time=sub.end_time)
+        return table
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def append(self, index: int, text: str, original_length: Optional[int] = None,
+               start_time: str = "", end_time: str = "") -> int:
+        """Add one row and return its row number"""
+        row = len(self.index)
+        self.index.append(index)
+        if self.texts is not None:
+            self.texts.append(text)
+        self.original_length.append(len(text) if original_length is None else original_length)
+        self.status.append(self.PENDING)
+        self.attempts.append(0)
+        self.samples.append(0)
+        if self.start_times is not None:
+            self.start_times.append(start_time)
+            self.end_times.append(end_time)
+        if self._row_map is not None:
+            self._row_map.setdefault(index, row)
+        return row
+    
+    def row_of(self, index: int) -> int:
+        """Row number of a chunk index (O(1) for consecutive indices)"""
+        if self.index:
+            row = index - self.index[0]
+            if 0 <= row < len(self.index) and self.index[row] == index:
+                return row
+        if self._row_map is None:
+            self._row_map = {}
+            for row, idx in enumerate(self.index):
+                self._row_map.setdefault(idx, row)
+        return self._row_map[index]
+    
+    def _text(self, row: int, index: int) -> str:
+        return self.texts[row] if self.texts is not None else self.text_for(index)
+    
+    def text(self, index: int) -> str:
+        return self._text(self.row_of(index), index)
+    
+    def chunk(self, index: int) -> TextChunk:
+        row = self.row_of(index)
+        return TextChunk(index=index, text=self._text(row, index), original_length=self.original_length[row])
+    
+    def subtitle(self, index: int) -> Subtitle:
+        row = self.row_of(index)
+        return Subtitle(index, self.start_times[row], self.end_times[row], self._text(row, index))
+    
+    def path(self, index: int) -> str:
+        row = self.row_of(index)
+        return self._paths.get(row) or self.path_for(index)
+    
+    def mark_done(self, index: int, attempts: int = 1, path: Optional[str] = None, samples: int = 0):
+        row = self.row_of(index)
+        self.status[row] = self.DONE
+        self.attempts[row] = min(attempts, 255)
+        self.samples[row] = samples
+        if path and path != self.path_for(index):
+            self._paths[row] = path
+    
+    def mark_failed(self, index: int, attempts: int = 1):
+        row = self.row_of(index)
+        self.status[row] = self.FAILED
+        self.attempts[row] = min(attempts, 255)
+    
+    def count(self, status: int) -> int:
+        return self.status.count(status)
+    
+    def _indices_where(self, status_mask: bytes) -> List[int]:
+        """Sorted indices of rows whose status maps to a non-zero byte in status_mask"""
+        # translate + compress run over the whole column in C, no per-row Python code
+        return sorted(itertools.compress(self.index, self.status.translate(status_mask)))
+    
+    def missing(self) -> List[int]:
+        """Sorted indices of chunks without audio (pending or failed)"""
+        return self._indices_where(_NOT_DONE_MASK)
+    
+    def done_paths(self) -> List[str]:
+        """Output paths of all finished chunks, in index order"""
+        return [self.path(idx) for idx in self._indices_where(_DONE_MASK)]
+    
+    def done_rows(self) -> Iterator[tuple]:
+        """(text, path, samples) of all finished chunks, in index order"""
+        for index in self._indices_where(_DONE_MASK):
+            row = self.row_of(index)
+            yield self._text(row, index), self._paths.get(row) or self.path_for(index), self.samples[row]
+    
+    def timed_rows(self) -> Iterator[tuple]:
+        """(start_time, end_time, path or None if not done) of every row (needs with_times)"""
+        for row, index in enumerate(self.index):
+            done = self.status[row] == self.DONE
+            path = (self._paths.get(row) or self.path_for(index)) if done else None
+            yield self.start_times[row], self.end_times[row], path
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the table"""
+        total = len(self.status) + len(self.attempts) + self.samples.itemsize * len(self.samples)
+        if self.texts is not None:
+            total += self.texts.nbytes
+        total += self.index.itemsize * len(self.index) + self.original_length.itemsize * len(self.original_length)
+        if self.start_times is not None:
+            total += self.start_times.nbytes + self.end_times.nbytes
+        return total
+
+
+# bytes.translate tables: status byte -> 1 if selected else 0
+_DONE_MASK = bytes(int(status == ChunkTable.DONE) for status in range(256))
+_NOT_DONE_MASK = bytes(int(status != ChunkTable.DONE) for status in range(256))
 
 
 # =============================================================================
 # PARSERS & UTILS
 # =============================================================================
 
-def parse_srt(content: str) -> List[Subtitle]:
-    subtitles = []
-    blocks = re.split(r'\n\s*\n', content.strip())
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if len(lines) >= 3:
-            try:
-                index = int(lines[0].strip())
-                time_match = re.match(
-                    r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})',
-                    lines[1].strip()
-                )
-                if time_match:
-                    text = '\n'.join(lines[2:]).strip()
-                    text = re.sub(r'<[^>]+>', '', text)
-                    if text:
-                        subtitles.append(Subtitle(index, time_match.group(1), time_match.group(2), text))
-            except:
-                continue
-    return subtitles
+_CUE_TIMING_RE = re.compile(
+    r'((?:\d+:)?\d{1,2}:\d{1,2}[.,]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{1,2}[.,]\d{1,3})'
+)
+_MARKUP_TAG_RE = re.compile(r'<[^>]+>')
 
 
-def parse_txt(content: str) -> List[Subtitle]:
-    return [Subtitle(i, "", "", line.strip()) 
-            for i, line in enumerate(content.strip().split('\n'), 1) if line.strip()]
+def _normalize_cue_time(timestamp: str) -> str:
+    """SRT/VTT timestamp (hours optional, . or ,) -> HH:MM:SS,mmm"""
+    if len(timestamp) == 12 and timestamp[8] == ',':
+        return timestamp
+    clock, fraction = re.split(r'[.,]', timestamp)
+    parts = [int(p) for p in clock.split(':')]
+    hours = parts[0] if len(parts) == 3 else 0
+    return f"{hours:02d}:{parts[-2]:02d}:{parts[-1]:02d},{fraction.ljust(3, '0')}"
 
 
-def parse_vtt(content: str) -> List[Subtitle]:
-    """Parse VTT (WebVTT) subtitle format"""
-    subtitles = []
+def cue_time_to_ms(timestamp: str) -> int:
+    """HH:MM:SS,mmm (normalized cue time) -> integer milliseconds"""
+    if len(timestamp) == 12:
+        return (int(timestamp[0:2]) * 3600000 + int(timestamp[3:5]) * 60000
+                + int(timestamp[6:8]) * 1000 + int(timestamp[9:12]))
+    hours, minutes, rest = timestamp.split(':')
+    seconds, millis = rest.split(',')
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def ms_to_cue_time(ms: int) -> str:
+    """Integer milliseconds -> HH:MM:SS,mmm"""
+    seconds, millis = divmod(max(0, ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def _iter_cues(lines: Iterable[str], numbered: bool) -> Iterator[Subtitle]:
+    """
+    Line-driven cue parser shared by SRT and VTT (one pass, constant memory).
     
-    # Remove WEBVTT header and metadata
-    lines = content.strip().split('\n')
+    A cue is an optional identifier line, a timing line and text lines up to the
+    next blank line. Blocks without a timing line (WEBVTT header, NOTE/STYLE,
+    garbage) are skipped. A timing line inside the text of a cue starts a new
+    cue (missing blank line); a number just before it becomes its identifier.
+    numbered: keep the SRT cue numbers, otherwise cues are numbered 1, 2, 3...
+    """
+    identifier = None  # First line of the current block, before any timing line
+    timing = None  # (start, end) of the current cue
+    text_lines: List[str] = []
+    skipping = False  # Inside a block that is not a cue
+    last_index = 0
     
-    # Find start of cues (skip header)
-    start_idx = 0
-    for i, line in enumerate(lines):
-        if line.strip() == 'WEBVTT' or line.startswith('NOTE') or line.startswith('STYLE'):
-            continue
-        if '-->' in line:
-            start_idx = i - 1 if i > 0 and lines[i-1].strip().isdigit() else i
-            break
-        if line.strip() == '':
-            start_idx = i + 1
-    
-    # Parse cues
-    content_from_cues = '\n'.join(lines[start_idx:])
-    blocks = re.split(r'\n\s*\n', content_from_cues.strip())
-    
-    index = 1
-    for block in blocks:
-        block_lines = block.strip().split('\n')
-        if not block_lines:
+    def make_cue() -> Optional[Subtitle]:
+        nonlocal last_index
+        text = _MARKUP_TAG_RE.sub('', '\n'.join(text_lines).strip())
+        if not text:
+            return None
+        if numbered and identifier is not None and identifier.isdigit():
+            last_index = int(identifier)
+        else:
+            last_index += 1
+        return Subtitle(last_index, timing[0], timing[1], text)
+    
+    for line_no, line in enumerate(lines):
+        line = line.rstrip('\r\n')
+        if line_no == 0:
+            line = line.lstrip('\ufeff')
+        stripped = line.strip()
+        
+        if not stripped:
+            if timing is not None:
+                cue = make_cue()
+                if cue:
+                    yield cue
+            identifier, timing, text_lines, skipping = None, None, [], False
             continue
         
-        # Check if first line is index number
-        time_line_idx = 0
-        if block_lines[0].strip().isdigit():
-            time_line_idx = 1
-        
-        if len(block_lines) > time_line_idx:
-            # VTT uses . for milliseconds, SRT uses ,
-            time_match = re.match(
-                r'(\d{2}:\d{2}:\d{2}[.,]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[.,]\d{3})',
-                block_lines[time_line_idx].strip()
-            )
-            if time_match:
-                start_time = time_match.group(1).replace('.', ',')
-                end_time = time_match.group(2).replace('.', ',')
-                text = '\n'.join(block_lines[time_line_idx + 1:]).strip()
-                # Remove VTT tags like <c>, </c>, <v Speaker>, etc.
-                text = re.sub(r'<[^>]+>', '', text)
-                if text:
-                    subtitles.append(Subtitle(index, start_time, end_time, text))
-                    index += 1
+        match = _CUE_TIMING_RE.match(stripped) if '-->' in stripped else None
+        if match:
+            if timing is not None:
+                # Blank line missing between two cues
+                next_identifier = text_lines.pop().strip() if text_lines and text_lines[-1].strip().isdigit() else None
+                cue = make_cue()
+                if cue:
+                    yield cue
+                identifier = next_identifier
+            timing = (_normalize_cue_time(match.group(1)), _normalize_cue_time(match.group(2)))
+            text_lines = []
+            skipping = False
+        elif timing is not None:
+            text_lines.append(line)
+        elif identifier is None and not skipping:
+            identifier = stripped
+        else:
+            skipping = True
+            identifier = None
     
-    return subtitles
+    if timing is not None:
+        cue = make_cue()
+        if cue:
+            yield cue
+
+
+def iter_srt(lines: Iterable[str]) -> Iterator[Subtitle]:
+    """Stream SRT cues from lines (e.g. an open file) - tolerates CRLF, BOM and malformed blocks"""
+    return _iter_cues(lines, numbered=True)
+
+
+def iter_vtt(lines: Iterable[str]) -> Iterator[Subtitle]:
+    """Stream WebVTT cues from lines, numbered from 1 (cue identifiers are ignored)"""
+    return _iter_cues(lines, numbered=False)
+
+
+def iter_txt(lines: Iterable[str]) -> Iterator[Subtitle]:
+    """One subtitle per non-empty line, numbered by line from the first non-empty one"""
+    first_line = None
+    for line_no, line in enumerate(lines):
+        text = line.strip().lstrip('\ufeff') if line_no == 0 else line.strip()
+        if text:
+            if first_line is None:
+                first_line = line_no
+            yield Subtitle(line_no - first_line + 1, "", "", text)
+
+
+def parse_srt(content: str) -> List[Subtitle]:
+    return list(iter_srt(content.split('\n')))
+
+
+def parse_txt(content: str) -> List[Subtitle]:
+    return list(iter_txt(content.split('\n')))
+
+
+def parse_vtt(content: str) -> List[Subtitle]:
+    """Parse VTT (WebVTT) subtitle format"""
+    return list(iter_vtt(content.split('\n')))
+
+
+def iter_subtitle_file(file_path: str) -> Iterator[Subtitle]:
+    """
+    Stream subtitles from a file (SRT, VTT, or TXT) without reading it whole.
+    utf-8-sig drops a BOM and text mode turns CRLF/CR line ends into LF.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        if ext == '.vtt':
+            yield from iter_vtt(f)
+        elif ext == '.srt':
+            yield from iter_srt(f)
+        else:
+            yield from iter_txt(f)
 
 
 def parse_subtitle_file(file_path: str) -> List[Subtitle]:
     """Parse subtitle file (SRT, VTT, or TXT) and return list of subtitles"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    ext = os.path.splitext(file_path)[1].lower()
-    
-    if ext == '.vtt':
-        return parse_vtt(content)
-    elif ext == '.srt':
-        return parse_srt(content)
-    else:
-        return parse_txt(content)
+    return list(iter_subtitle_file(file_path))
 
 
 def save_wave_file(filename: str, pcm_data: bytes, rate: int = RECEIVE_SAMPLE_RATE):
@@ -612,157 +979,344 @@ def save_wave_file(filename: str, pcm_data: bytes, rate: int = RECEIVE_SAMPLE_RA
         wf.writeframes(pcm_data)
 
 
-def split_text_into_chunks(text: str, chunk_size: int = 500) -> List[TextChunk]:
+class WavSink:
     """
-    Split text into chunks of approximately chunk_size characters.
-    Tries to split at sentence boundaries when possible.
-    Removes extra whitespace and newlines.
+    16-bit mono WAV written while the audio streams in, so an utterance is
+    never held in memory whole: a placeholder header, the PCM chunks as they
+    arrive, then the RIFF sizes patched by close(). The file is written as
+    <path>.part and renamed by close(), so a stream cut off half way never
+    leaves a truncated clip under the final name.
+    
+    As a context manager: closed on success, aborted (file removed) on an
+    exception.
     """
-    # Clean text: remove extra whitespace and newlines
-    cleaned_text = ' '.join(text.split())
     
-    if not cleaned_text:
-        return []
+    def __init__(self, path: str, rate: int = RECEIVE_SAMPLE_RATE):
+        self.path = path
+        self.part_path = path + ".part"
+        self.rate = rate
+        self.data_bytes = 0
+        self._file = open(self.part_path, "wb")
+        self._file.write(wav_header(0, rate))
+    
+    @property
+    def duration_ms(self) -> float:
+        """Duration of the audio written so far"""
+        return self.data_bytes / (self.rate * AUDIO_SAMPLE_WIDTH) * 1000
+    
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.data_bytes += len(data)
+    
+    def flush(self):
+        self._file.flush()
+    
+    def reset(self):
+        """Drop the audio written so far"""
+        self._file.seek(WAV_HEADER_SIZE)
+        self._file.truncate()
+        self.data_bytes = 0
+    
+    def close(self) -> str:
+        """Patch the header, move the file to its final name and return that"""
+        samples = self.data_bytes // AUDIO_SAMPLE_WIDTH
+        self._file.truncate(WAV_HEADER_SIZE + samples * AUDIO_SAMPLE_WIDTH)  # A trailing half sample is dropped
+        self._file.seek(0)
+        self._file.write(wav_header(samples, self.rate))
+        self._file.close()
+        os.replace(self.part_path, self.path)
+        return self.path
+    
+    def abort(self):
+        """Drop the partial file"""
+        self._file.close()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+    
+    def __enter__(self) -> "WavSink":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def check_audio_size(data_bytes: int):
+    """Raise if a response has no audio, or too little to be complete"""
+    if not data_bytes:
+        raise ValueError("Received 0 bytes (No Audio) - Connection issue likely")
+    if data_bytes < MIN_AUDIO_FILE_SIZE:
+        raise ValueError(f"Audio too short ({data_bytes} bytes) - May be incomplete")
+
+
+def concat_wav_files(input_files: List[str], output_file: str):
+    """Concatenate WAV files of identical format into one file (no re-encoding)"""
+    with wave.open(output_file, "wb") as out:
+        for i, path in enumerate(input_files):
+            with wave.open(path, "rb") as wf:
+                if i == 0:
+                    out.setparams(wf.getparams())
+                out.writeframes(wf.readframes(wf.getnframes()))
+
+
+class TextBoundaryIndex:
+    """
+    Precomputed break-point offsets for a whitespace-normalized text.
+    
+    The offsets of each punctuation mark are collected into a sorted list
+    (by one regex scan, the first time a splitter asks for that mark), so
+    each splitter only needs a couple of bisect lookups per chunk instead of
+    rescanning every candidate window backwards once per mark.
+    Spaces are too dense to be worth storing (one per word); the nearest
+    space is found with a bounded str.rfind, which only touches the last
+    word of the window.
+    """
+    
+    # All punctuation any splitter may break at
+    BOUNDARY_CHARS = '.!?,-;:。！？，；：'
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        # (chars, spaced) -> sorted offsets; single chars are filled on first use
+        self._cache: Dict[tuple, List[int]] = {}
+    
+    def _char_positions(self, char: str, spaced: bool) -> List[int]:
+        """Sorted offsets of one char (optionally only where directly followed by a space)"""
+        key = (char, spaced)
+        cached = self._cache.get(key)
+        if cached is None:
+            if char not in self.text:
+                cached = []
+            else:
+                # A list comprehension over one literal pattern: far cheaper per
+                # match than dispatching every mark of a class pattern in Python
+                pattern = re.escape(char) + (' ' if spaced else '')
+                cached = [match.start() for match in re.finditer(pattern, self.text)]
+            self._cache[key] = cached
+        return cached
+    
+    def positions(self, chars: str, spaced: bool = False) -> List[int]:
+        """Sorted offsets of any char in `chars` (optionally only those followed by a space)"""
+        key = (chars, spaced)
+        cached = self._cache.get(key)
+        if cached is None:
+            lists = [self._char_positions(c, spaced) for c in dict.fromkeys(chars)]
+            if len(lists) == 1:
+                cached = lists[0]
+            else:
+                # Concatenated sorted runs - Timsort merges them in linear time
+                cached = sorted(p for lst in lists for p in lst)
+            self._cache[key] = cached
+        return cached
+    
+    @staticmethod
+    def last_in(positions: List[int], lo: int, hi: int) -> int:
+        """Largest offset p with lo <= p <= hi, or -1"""
+        if lo > hi:
+            return -1
+        i = bisect.bisect_right(positions, hi) - 1
+        if i >= 0 and positions[i] >= lo:
+            return positions[i]
+        return -1
     
+    @staticmethod
+    def first_in(positions: List[int], lo: int, hi: int) -> int:
+        """Smallest offset p with lo <= p <= hi, or -1"""
+        if lo > hi:
+            return -1
+        i = bisect.bisect_left(positions, lo)
+        if i < len(positions) and positions[i] <= hi:
+            return positions[i]
+        return -1
+    
+    def last_break_after(self, char: str, lo: int, window_end: int) -> int:
+        """
+        Last offset p in [lo, window_end] where `char` is followed by a space
+        or sits at the very end of the window. Returns -1 if none.
+        """
+        if lo > window_end:
+            return -1
+        if self.text[window_end] == char:
+            return window_end
+        return self.last_in(self._char_positions(char, True), lo, window_end - 1)
+    
+    def last_space(self, lo: int, hi: int) -> int:
+        """Largest offset p with lo <= p <= hi holding a space, or -1"""
+        if lo > hi:
+            return -1
+        return self.text.rfind(' ', lo, hi + 1)
+
+
+def _collect_chunks(breaks: Iterator[tuple]) -> List[TextChunk]:
+    """Turn (next_pos, chunk_content) pairs from a break iterator into numbered TextChunks"""
     chunks = []
+    for _, chunk_content in breaks:
+        if chunk_content:
+            chunks.append(TextChunk(
+                index=len(chunks) + 1,
+                text=chunk_content,
+                original_length=len(chunk_content)
+            ))
+    return chunks
+
+
+def _iter_sentence_breaks(cleaned_text: str, chunk_size: int, stop_margin: int = 0) -> Iterator[tuple]:
+    """
+    Core of split_text_into_chunks over already-normalized text.
+    
+    Yields (next_pos, chunk_content) for every chunk (content may be empty).
+    With stop_margin > 0 it stops as soon as fewer than stop_margin characters
+    remain, so a streaming caller can append more text and resume at next_pos.
+    """
+    index = TextBoundaryIndex(cleaned_text)
+    sentence_enders = '.!?。！？'
+    sentence_breaks = index.positions(sentence_enders, spaced=True)
+    clause_breaks = index.positions(',，;；')
+    text_length = len(cleaned_text)
+    
     current_pos = 0
-    chunk_index = 1
     
-    while current_pos < len(cleaned_text):
+    while current_pos < text_length:
+        if stop_margin and text_length - current_pos < stop_margin:
+            return
+        
         # Get the next chunk_size characters
-        end_pos = min(current_pos + chunk_size, len(cleaned_text))
+        end_pos = min(current_pos + chunk_size, text_length)
         
         # If not at the end, try to find a good breaking point
-        if end_pos < len(cleaned_text):
+        if end_pos < text_length:
+            window_len = end_pos - current_pos
+            last = end_pos - 1
             # Look for sentence endings (. ! ?) within the last 20% of the chunk
-            search_start = current_pos + int(chunk_size * 0.8)
-            chunk_text = cleaned_text[current_pos:end_pos]
+            search_start = current_pos + int(window_len * 0.8)
             
-            # Find the last sentence ending
+            # Find the last sentence ending (followed by a space or at the window end)
             best_break = -1
-            for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.8) - 1, -1):
-                if chunk_text[i] in '.!?。！？' and (i + 1 >= len(chunk_text) or chunk_text[i + 1] == ' '):
-                    best_break = i + 1
-                    break
+            if search_start <= last and cleaned_text[last] in sentence_enders:
+                best_break = window_len
+            else:
+                pos = index.last_in(sentence_breaks, search_start, last - 1)
+                if pos != -1:
+                    best_break = pos - current_pos + 1
             
             # If no sentence break found, try comma or space
             if best_break == -1:
-                for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.8) - 1, -1):
-                    if chunk_text[i] in ',，;；':
-                        best_break = i + 1
-                        break
+                pos = index.last_in(clause_breaks, search_start, last)
+                if pos != -1:
+                    best_break = pos - current_pos + 1
             
             # If still no break found, use space
             if best_break == -1:
-                for i in range(len(chunk_text) - 1, int(len(chunk_text) * 0.5) - 1, -1):
-                    if chunk_text[i] == ' ':
-                        best_break = i + 1
-                        break
+                pos = index.last_space(current_pos + int(window_len * 0.5), last)
+                if pos != -1:
+                    best_break = pos - current_pos + 1
             
             if best_break != -1:
                 end_pos = current_pos + best_break
         
         chunk_content = cleaned_text[current_pos:end_pos].strip()
-        if chunk_content:
-            chunks.append(TextChunk(
-                index=chunk_index,
-                text=chunk_content,
-                original_length=len(chunk_content)
-            ))
-            chunk_index += 1
-        
         current_pos = end_pos
-    
-    return chunks
+        yield current_pos, chunk_content
 
 
-def split_text_smart(text: str, max_chars: int = 450, include_spaces: bool = True) -> List[TextChunk]:
+def split_text_into_chunks(text: str, chunk_size: int = 500) -> List[TextChunk]:
     """
-    Smart text splitting for Capcut/Edge TTS.
-    
-    Logic:
-    - Split at safe points: ! , . - or complete words
-    - Does not cut in the middle of words
-    - max_chars includes spaces if include_spaces=True
-    
-    Args:
-        text: Input text
-        max_chars: Maximum characters per chunk (default 450 for Capcut)
-        include_spaces: Count spaces in character count
-    
-    Returns:
-        List of TextChunk objects
+    Split text into chunks of approximately chunk_size characters.
+    Tries to split at sentence boundaries when possible.
+    Removes extra whitespace and newlines.
     """
-    # Clean text: normalize whitespace
+    # Clean text: remove extra whitespace and newlines
     cleaned_text = ' '.join(text.split())
     
     if not cleaned_text:
         return []
     
-    chunks = []
+    return _collect_chunks(_iter_sentence_breaks(cleaned_text, chunk_size))
+
+
+def _iter_smart_breaks(cleaned_text: str, max_chars: int, stop_margin: int = 0) -> Iterator[tuple]:
+    """Core of split_text_smart; same contract as _iter_sentence_breaks"""
+    index = TextBoundaryIndex(cleaned_text)
+    text_length = len(cleaned_text)
+    
     current_pos = 0
-    chunk_index = 1
     
     # Safe break characters (priority order)
     punctuation_breaks = ['!', '.', ',', '-', '?', ';', ':']
     
-    while current_pos < len(cleaned_text):
-        remaining = len(cleaned_text) - current_pos
+    while current_pos < text_length:
+        if stop_margin and text_length - current_pos < stop_margin:
+            return
+        
+        remaining = text_length - current_pos
         
         if remaining <= max_chars:
             # Last chunk
-            chunk_content = cleaned_text[current_pos:].strip()
-            if chunk_content:
-                chunks.append(TextChunk(
-                    index=chunk_index,
-                    text=chunk_content,
-                    original_length=len(chunk_content)
-                ))
-            break
+            yield text_length, cleaned_text[current_pos:].strip()
+            return
         
         # Find the best break point within max_chars
-        chunk_text = cleaned_text[current_pos:current_pos + max_chars]
+        last = current_pos + max_chars - 1
         best_break = -1
         
-        # Priority 1: Find punctuation break (! . , -)
+        # Priority 1: Find punctuation break (! . , -) within the search window
+        search_start = current_pos + max(0, max_chars - PUNCTUATION_SEARCH_WINDOW) + 1
         for punct in punctuation_breaks:
-            # Search from end backwards within the search window
-            search_start = max(0, len(chunk_text) - PUNCTUATION_SEARCH_WINDOW)
-            for i in range(len(chunk_text) - 1, search_start, -1):
-                if chunk_text[i] == punct:
-                    # Check if next char is space or end
-                    if i + 1 >= len(chunk_text) or chunk_text[i + 1] == ' ':
-                        best_break = i + 1
-                        break
-            if best_break != -1:
+            pos = index.last_break_after(punct, search_start, last)
+            if pos != -1:
+                best_break = pos - current_pos + 1
                 break
         
         # Priority 2: If no punctuation found, find last space (complete word)
         if best_break == -1:
-            for i in range(len(chunk_text) - 1, 0, -1):
-                if chunk_text[i] == ' ':
-                    best_break = i
-                    break
+            pos = index.last_space(current_pos + 1, last)
+            if pos != -1:
+                best_break = pos - current_pos
         
         # Priority 3: Force break at max_chars (should rarely happen)
         if best_break == -1 or best_break < max_chars * MIN_CHUNK_RATIO:
             best_break = max_chars
         
         chunk_content = cleaned_text[current_pos:current_pos + best_break].strip()
-        if chunk_content:
-            chunks.append(TextChunk(
-                index=chunk_index,
-                text=chunk_content,
-                original_length=len(chunk_content)
-            ))
-            chunk_index += 1
         
         current_pos = current_pos + best_break
         # Skip leading spaces
-        while current_pos < len(cleaned_text) and cleaned_text[current_pos] == ' ':
+        while current_pos < text_length and cleaned_text[current_pos] == ' ':
             current_pos += 1
+        
+        yield current_pos, chunk_content
+
+
+def split_text_smart(text: str, max_chars: int = 450, include_spaces: bool = True) -> List[TextChunk]:
+    """
+    Smart text splitting for Capcut/Edge TTS.
     
-    return chunks
+    Logic:
+    - Split at safe points: ! , . - or complete words
+    - Does not cut in the middle of words
+    - max_chars includes spaces if include_spaces=True
+    
+    Args:
+        text: Input text
+        max_chars: Maximum characters per chunk (default 450 for Capcut)
+        include_spaces: Count spaces in character count
+    
+    Returns:
+        List of TextChunk objects
+    """
+    # Clean text: normalize whitespace
+    cleaned_text = ' '.join(text.split())
+    
+    if not cleaned_text:
+        return []
+    
+    return _collect_chunks(_iter_smart_breaks(cleaned_text, max_chars))
 
 
 def clean_text_for_tts(text: str) -> str:
@@ -788,91 +1342,57 @@ def remove_trailing_punctuation(text: str) -> str:
     return text
 
 
-def split_text_by_punctuation_v2(text: str, target_chunk_size: int = 300, remove_punct: bool = True) -> List[TextChunk]:
-    """
-    Split text by punctuation marks (Ngắt dòng v2).
-    
-    This mode prioritizes breaking at punctuation marks (., !, ?, ,, -, etc.)
-    within the target chunk size range. If no punctuation is found within range,
-    it will allow chunk size violations to preserve sentence integrity.
+def _iter_punctuation_v2_breaks(cleaned_text: str, target_chunk_size: int, remove_punct: bool = True,
+                                stop_margin: int = 0) -> Iterator[tuple]:
+    """Core of split_text_by_punctuation_v2; same contract as _iter_sentence_breaks"""
+    index = TextBoundaryIndex(cleaned_text)
+    sentence_breaks = index.positions('.!?。！？')
+    secondary_breaks = index.positions(',-;:，；：')
+    any_breaks = index.positions(''.join(SENTENCE_BREAK_PUNCTUATION))
+    text_length = len(cleaned_text)
     
-    Args:
-        text: Input text
-        target_chunk_size: Target maximum characters per chunk (default 300)
-        remove_punct: If True, removes trailing punctuation from each chunk
+    current_pos = 0
     
-    Returns:
-        List of TextChunk objects
-    """
-    # Clean text: normalize whitespace
-    cleaned_text = clean_text_for_tts(text)
-    
-    if not cleaned_text:
-        return []
-    
-    chunks = []
-    current_pos = 0
-    chunk_index = 1
-    
-    while current_pos < len(cleaned_text):
-        remaining = len(cleaned_text) - current_pos
+    while current_pos < text_length:
+        if stop_margin and text_length - current_pos < stop_margin:
+            return
+        
+        remaining = text_length - current_pos
         
         if remaining <= target_chunk_size:
             # Last chunk - take everything remaining
             chunk_content = cleaned_text[current_pos:].strip()
             if remove_punct:
                 chunk_content = remove_trailing_punctuation(chunk_content)
-            if chunk_content:
-                chunks.append(TextChunk(
-                    index=chunk_index,
-                    text=chunk_content,
-                    original_length=len(chunk_content)
-                ))
-            break
+            yield text_length, chunk_content
+            return
         
         # Look for punctuation within target range
-        search_end = min(current_pos + target_chunk_size, len(cleaned_text))
-        chunk_text = cleaned_text[current_pos:search_end]
-        
-        best_break = -1
+        last = current_pos + target_chunk_size - 1
         
         # Priority 1: Find sentence-ending punctuation (. ! ?) within target range
-        sentence_enders = ['.', '!', '?', '。', '！', '？']
-        for i in range(len(chunk_text) - 1, -1, -1):
-            if chunk_text[i] in sentence_enders:
-                best_break = i + 1
-                break
+        pos = index.last_in(sentence_breaks, current_pos, last)
         
         # Priority 2: If no sentence ender found, look for comma or dash
-        if best_break == -1:
-            secondary_breaks = [',', '-', ';', ':', '，', '；', '：']
-            for i in range(len(chunk_text) - 1, -1, -1):
-                if chunk_text[i] in secondary_breaks:
-                    best_break = i + 1
-                    break
+        if pos == -1:
+            pos = index.last_in(secondary_breaks, current_pos, last)
         
         # Priority 3: If no punctuation found in target range, extend search beyond target
         # to find the next punctuation mark. This allows chunk size to exceed target (up to 2x)
         # to preserve sentence integrity. This is intentional for v2 mode.
-        if best_break == -1:
+        if pos == -1:
             # Search forward from target position - may result in chunks up to 2x target size
             extended_search_start = current_pos + target_chunk_size
-            extended_search_end = min(extended_search_start + target_chunk_size, len(cleaned_text))
-            extended_text = cleaned_text[extended_search_start:extended_search_end]
-            
-            for i, char in enumerate(extended_text):
-                if char in SENTENCE_BREAK_PUNCTUATION:
-                    best_break = target_chunk_size + i + 1
-                    break
+            extended_search_end = min(extended_search_start + target_chunk_size, text_length)
+            pos = index.first_in(any_breaks, extended_search_start, extended_search_end - 1)
             
             # If still no punctuation found, use space as fallback
-            if best_break == -1:
+            if pos == -1:
                 # Look for last space within reasonable range
-                combined_text = cleaned_text[current_pos:extended_search_end]
-                for i in range(len(combined_text) - 1, target_chunk_size // 2, -1):
-                    if combined_text[i] == ' ':
-                        best_break = i + 1
-                        break
+                pos = index.last_space(current_pos + target_chunk_size // 2 + 1,
+                                       extended_search_end - 1)
+        
+        best_break = pos - current_pos + 1 if pos != -1 else -1
         
         # Priority 4: Force break at target size if nothing else works
         # Use MIN_CHUNK_RATIO_V2 (25%) as minimum - very short chunks usually indicate
@@ -884,18 +1404,224 @@ def split_text_by_punctuation_v2(text: str, target_chunk_size: int = 300, remove
         if remove_punct:
             chunk_content = remove_trailing_punctuation(chunk_content)
         
-        if chunk_content:
+        current_pos = current_pos + best_break
+        # Skip leading spaces
+        while current_pos < text_length and cleaned_text[current_pos] == ' ':
+            current_pos += 1
+        
+        yield current_pos, chunk_content
+
+
+def split_text_by_punctuation_v2(text: str, target_chunk_size: int = 300, remove_punct: bool = True) -> List[TextChunk]:
+    """
+    Split text by punctuation marks (Ngắt dòng v2).
+    
+    This mode prioritizes breaking at punctuation marks (., !, ?, ,, -, etc.)
+    within the target chunk size range. If no punctuation is found within range,
+    it will allow chunk size violations to preserve sentence integrity.
+    
+    Args:
+        text: Input text
+        target_chunk_size: Target maximum characters per chunk (default 300)
+        remove_punct: If True, removes trailing punctuation from each chunk
+    
+    Returns:
+        List of TextChunk objects
+    """
+    # Clean text: normalize whitespace
+    cleaned_text = clean_text_for_tts(text)
+    
+    if not cleaned_text:
+        return []
+    
+    return _collect_chunks(_iter_punctuation_v2_breaks(cleaned_text, target_chunk_size, remove_punct))
+
+
+def iter_normalized_text(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Whitespace-normalize a stream of text pieces (lines, paragraphs, ...).
+    
+    Yields blocks of single-space separated words; joining the blocks with
+    ' ' gives exactly ' '.join(''.join(pieces).split()). A word cut across
+    two pieces is held back until the next piece arrives.
+    """
+    pending = ''
+    for piece in pieces:
+        raw = pending + piece
+        words = raw.split()
+        pending = ''
+        if words and not raw[-1].isspace():
+            pending = words.pop()
+        if words:
+            yield ' '.join(words)
+    if pending:
+        yield pending
+
+
+def iter_text_chunks(pieces: Iterable[str], chunk_size: int, mode: str = "sentence",
+                     remove_punct: bool = True) -> Iterator[TextChunk]:
+    """
+    Lazily chunk a stream of text pieces.
+    
+    Produces exactly the same chunks as the list-based splitters on the whole
+    text, but only keeps about CHUNK_STREAM_BUFFER_CHARS of normalized text in
+    memory, so the first chunk is available before the input is fully read.
+    
+    Args:
+        pieces: Iterable of raw text pieces (e.g. iter_document_file())
+        chunk_size: Target chunk size in characters
+        mode: "sentence" (split_text_into_chunks), "smart" (split_text_smart)
+              or "v2" (split_text_by_punctuation_v2)
+        remove_punct: v2 mode only - remove trailing punctuation of each chunk
+    """
+    if mode == "sentence":
+        def breaks(text, stop_margin=0):
+            return _iter_sentence_breaks(text, chunk_size, stop_margin)
+    elif mode == "smart":
+        def breaks(text, stop_margin=0):
+            return _iter_smart_breaks(text, chunk_size, stop_margin)
+    elif mode == "v2":
+        def breaks(text, stop_margin=0):
+            return _iter_punctuation_v2_breaks(text, chunk_size, remove_punct, stop_margin)
+    else:
+        raise ValueError(f"Unknown chunking mode: {mode}")
+    
+    # A break decision looks at most 2x chunk_size ahead (v2 extended search),
+    # so chunks starting further than this from the buffer end are final
+    stop_margin = 2 * chunk_size + 2
+    chunk_index = 1
+    buffer = ''
+    
+    for block in iter_normalized_text(pieces):
+        buffer = f"{buffer} {block}" if buffer else block
+        if len(buffer) < CHUNK_STREAM_BUFFER_CHARS + stop_margin:
+            continue
+        
+        consumed = 0
+        for consumed, chunk_content in breaks(buffer, stop_margin):
+            if chunk_content:
+                yield TextChunk(index=chunk_index, text=chunk_content, original_length=len(chunk_content))
+                chunk_index += 1
+        buffer = buffer[consumed:]
+    
+    if buffer:
+        for _, chunk_content in breaks(buffer):
+            if chunk_content:
+                yield TextChunk(index=chunk_index, text=chunk_content, original_length=len(chunk_content))
+                chunk_index += 1
+
+
+class VieNeuTokenBudget:
+    """
+    Estimate backbone token usage of VieNeu chunks for one reference voice.
+    
+    The prompt is template + phonemized ref_text + phonemized chunk + reference
+    codes, and the speech tokens generated for the chunk must fit in the same
+    max_context window. Speech tokens are estimated from the syllable count and
+    the reference voice's own rate (reference codes per reference syllable).
+    
+    Args:
+        ref_codes: Encoded reference audio (1-D codes)
+        ref_text: Transcript of the reference audio
+        phonemize: Text -> phoneme string function (e.g. phonemize_with_dict);
+                   raw text is used when None
+        count_tokens: Phoneme string -> token count (backbone tokenizer);
+                      estimated from length when None
+    """
+    
+    def __init__(self, ref_codes, ref_text: str, phonemize=None, count_tokens=None,
+                 max_context: int = VIENEU_MAX_CONTEXT):
+        self.phonemize = phonemize
+        self.count_tokens = count_tokens
+        self.max_context = max_context
+        self.ref_code_tokens = len(ref_codes)
+        
+        ref_phonemes = self._phonemes(ref_text)
+        self.ref_text_tokens = self._tokens(ref_phonemes)
+        ref_syllables = len(ref_phonemes.split())
+        if ref_syllables and self.ref_code_tokens:
+            # Clamp to 2-8 syllables/s in case the transcript doesn't match the audio
+            self.speech_tokens_per_syllable = min(max(self.ref_code_tokens / ref_syllables, 6.0), 25.0)
+        else:
+            self.speech_tokens_per_syllable = VIENEU_SPEECH_TOKENS_PER_SYLLABLE
+        
+        # Tokens left for one chunk (its phonemes + the speech generated for it)
+        self.budget = (max_context - VIENEU_PROMPT_TEMPLATE_TOKENS
+                       - self.ref_code_tokens - self.ref_text_tokens - 1)
+    
+    def _phonemes(self, text: str) -> str:
+        return self.phonemize(text) if self.phonemize else text
+    
+    def _tokens(self, phonemes: str) -> int:
+        if self.count_tokens:
+            return self.count_tokens(phonemes)
+        return int(math.ceil(len(phonemes) / VIENEU_PHONEME_CHARS_PER_TOKEN))
+    
+    def cost(self, text: str) -> int:
+        """Estimated prompt + generated tokens needed to synthesize `text`"""
+        phonemes = self._phonemes(text)
+        speech = len(phonemes.split()) * self.speech_tokens_per_syllable * VIENEU_SPEECH_TOKEN_MARGIN
+        return self._tokens(phonemes) + int(math.ceil(speech))
+
+
+_SENTENCE_UNIT_RE = re.compile(r'(?<=[.!?…。！？])\s+')
+_CLAUSE_UNIT_RE = re.compile(r'(?<=[,;:，；：])\s+')
+
+
+def split_text_by_token_budget(text: str, budget: VieNeuTokenBudget) -> List[TextChunk]:
+    """
+    Split text for VieNeu so every chunk fits the backbone context budget.
+    
+    Text is cut into sentences (then clauses, then words for sentences that
+    are too long on their own), each unit is costed once, and consecutive
+    units are packed greedily up to budget.budget - which for an in-order
+    split gives the fewest chunks, i.e. the fewest backbone calls.
+    
+    If the reference voice alone nearly fills the context, every sentence
+    becomes its own chunk.
+    """
+    cleaned_text = clean_text_for_tts(text)
+    if not cleaned_text:
+        return []
+    
+    limit = budget.budget
+    
+    # (text, cost) units, none larger than the budget unless it is a single word
+    units = []
+    for sentence in _SENTENCE_UNIT_RE.split(cleaned_text):
+        cost = budget.cost(sentence)
+        if cost <= limit or limit <= 0:
+            units.append((sentence, cost))
+            continue
+        for clause in _CLAUSE_UNIT_RE.split(sentence):
+            cost = budget.cost(clause)
+            if cost <= limit:
+                units.append((clause, cost))
+                continue
+            for word in clause.split():
+                units.append((word, budget.cost(word)))
+    
+    chunks = []
+    current_parts = []
+    current_cost = 0
+    
+    def flush():
+        if current_parts:
+            chunk_content = ' '.join(current_parts)
             chunks.append(TextChunk(
-                index=chunk_index,
+                index=len(chunks) + 1,
                 text=chunk_content,
                 original_length=len(chunk_content)
             ))
-            chunk_index += 1
-        
-        current_pos = current_pos + best_break
-        # Skip leading spaces
-        while current_pos < len(cleaned_text) and cleaned_text[current_pos] == ' ':
-            current_pos += 1
+    
+    for unit_text, unit_cost in units:
+        if current_parts and (limit <= 0 or current_cost + unit_cost > limit):
+            flush()
+            current_parts = []
+            current_cost = 0
+        current_parts.append(unit_text)
+        current_cost += unit_cost
+    flush()
     
     return chunks
 
@@ -992,6 +1718,32 @@ def read_document_file(file_path: str) -> str:
         raise ValueError(f"Unsupported file format: {ext}")
 
 
+def iter_document_file(file_path: str) -> Iterator[str]:
+    """
+    Incrementally read content from txt, doc, or docx files.
+    Yields lines (txt) or paragraphs (docx) instead of the whole text,
+    so callers can start chunking before the file is fully read.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == '.txt':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from f
+    elif ext in ['.doc', '.docx']:
+        try:
+            from docx import Document
+        except ImportError:
+            raise ImportError("python-docx library is required to read .docx files. Install with: pip install python-docx")
+        try:
+            doc = Document(file_path)
+        except Exception as e:
+            raise Exception(f"Error reading docx file: {e}")
+        for para in doc.paragraphs:
+            yield para.text + '\n'
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+
 def merge_wav_files_ffmpeg(input_files: List[str], output_file: str, ffmpeg_path: str = "ffmpeg.exe") -> bool:
     """
     Merge multiple WAV files into one using ffmpeg.
@@ -1069,6 +1821,36 @@ def is_connection_error(error_str: str) -> bool:
     return any(pattern in error_lower for pattern in CONNECTION_ERROR_PATTERNS)
 
 
+def is_rate_limit_error(error_str: str) -> bool:
+    """Check if error means the API key is throttled (429 / RESOURCE_EXHAUSTED / quota)"""
+    error_lower = error_str.lower()
+    return any(pattern in error_lower for pattern in RATE_LIMIT_ERROR_PATTERNS)
+
+
+def is_daily_quota_error(error_str: str) -> bool:
+    """Check if error means the key has used up its quota for today"""
+    error_lower = error_str.lower()
+    return any(pattern in error_lower for pattern in DAILY_QUOTA_ERROR_PATTERNS)
+
+
+def is_dead_key_error(error_str: str) -> bool:
+    """Check if error means the key cannot be used for now (invalid, no permission, daily quota used up)"""
+    error_lower = error_str.lower()
+    return (is_daily_quota_error(error_str)
+            or any(pattern in error_lower for pattern in INVALID_KEY_ERROR_PATTERNS))
+
+
+def quota_day() -> str:
+    """Date the daily API quotas count on (they reset at midnight Pacific time)"""
+    from datetime import datetime, timedelta, timezone
+    try:
+        from zoneinfo import ZoneInfo
+        now = datetime.now(ZoneInfo("America/Los_Angeles"))
+    except Exception:  # No tz database (Windows without tzdata)
+        now = datetime.now(timezone.utc) - timedelta(hours=8)
+    return now.strftime("%Y-%m-%d")
+
+
 def cleanup_event_loop(loop: asyncio.AbstractEventLoop) -> None:
     """
     Properly cleanup an asyncio event loop to prevent CPU/memory leaks.
@@ -1101,6 +1883,372 @@ def cleanup_event_loop(loop: asyncio.AbstractEventLoop) -> None:
         asyncio.set_event_loop(None)
 
 
+# =============================================================================
+# SYNTHESIS CACHE
+# =============================================================================
+
+class SynthesisCache:
+    """
+    Cache audio đã tổng hợp trên đĩa, địa chỉ hóa theo nội dung.
+    
+    Key = sha256(engine, voice, tham số giọng, text đã chuẩn hóa khoảng trắng), nên
+    các câu lặp lại (intro, outro, "Cảm ơn các bạn đã theo dõi"...) và các job chạy lại
+    sau khi crash không phải gọi API / model lần nữa.
+    
+    - File lưu tại <cache_dir>/<2 ký tự đầu key>/<key><ext>
+    - Giới hạn dung lượng bằng LRU (mtime được cập nhật mỗi lần hit)
+    - Materialize vào thư mục output bằng hardlink, fallback sang copy
+    
+    Lưu ý: file materialize bằng hardlink dùng chung inode với cache, vì vậy trước khi
+    ghi đè một file output cần gọi detach() để không ghi xuyên vào cache.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = SYNTHESIS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict] = None  # path -> size, cũ nhất trước
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(engine: str, voice: str, text: str, **params) -> str:
+        """Content key of one synthesis request"""
+        payload = json.dumps(
+            {"engine": engine, "voice": voice, "text": " ".join(text.split()), "params": params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def detach(path: str) -> None:
+        """Remove an output file before rewriting it (it may be a hardlink into the cache)"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ext)
+    
+    def _ensure_index(self) -> None:
+        """Scan the cache directory once, oldest entries first (caller holds the lock)"""
+        if self._entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for sub in os.scandir(self.cache_dir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith('.tmp') or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    found.append((st.st_mtime, entry.path, st.st_size))
+        found.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in found)
+        self._total_bytes = sum(size for _, _, size in found)
+    
+    def _touch(self, path: str) -> None:
+        self._entries.move_to_end(path)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+    
+    def _register(self, path: str, size: int) -> None:
+        """Add an entry and evict least recently used ones above the size limit (caller holds the lock)"""
+        self._total_bytes -= self._entries.pop(path, 0)
+        self._entries[path] = size
+        self._total_bytes += size
+        self.stores += 1
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            old_path, old_size = self._entries.popitem(last=False)
+            self._total_bytes -= old_size
+            self.evictions += 1
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    
+    def lookup(self, key: str, ext: str) -> Optional[str]:
+        """Path of the cached audio, or None on a miss"""
+        path = self._path(key, ext)
+        with self._lock:
+            self._ensure_index()
+            if path in self._entries and os.path.exists(path):
+                self._touch(path)
+                self.hits += 1
+                return path
+            self._total_bytes -= self._entries.pop(path, 0)
+            self.misses += 1
+            return None
+    
+    def discard(self, key: str, ext: str) -> None:
+        """Drop an entry that turned out to be unusable"""
+        path = self._path(key, ext)
+        with self._lock:
+            self._ensure_index()
+            self._total_bytes -= self._entries.pop(path, 0)
+        self.detach(path)
+    
+    def materialize(self, key: str, ext: str, output_file: str) -> bool:
+        """Hardlink (or copy) a cached entry to output_file. Returns False on a miss."""
+        path = self.lookup(key, ext)
+        if path is None:
+            return False
+        try:
+            output_dir = os.path.dirname(output_file)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            self.detach(output_file)
+            try:
+                os.link(path, output_file)
+            except OSError:
+                # Khác ổ đĩa / FS không hỗ trợ hardlink
+                shutil.copy2(path, output_file)
+            return True
+        except OSError:
+            return False
+    
+    def get_bytes(self, key: str, ext: str) -> Optional[bytes]:
+        """Cached payload, or None on a miss"""
+        path = self.lookup(key, ext)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < MIN_AUDIO_FILE_SIZE:  # Truncated response stored by an older version
+            self.discard(key, ext)
+            return None
+        return data
+    
+    def read_into(self, key: str, ext: str, write, block_size: int = 64 * 1024) -> int:
+        """
+        Pass a cached payload to write() block by block; returns its size (0 on a miss).
+        Raises OSError if the entry cannot be read - write() may then have got part of it.
+        """
+        path = self.lookup(key, ext)
+        if path is None:
+            return 0
+        try:
+            if os.path.getsize(path) < MIN_AUDIO_FILE_SIZE:  # Truncated response stored by an older version
+                self.discard(key, ext)
+                return 0
+        except OSError:
+            return 0
+        size = 0
+        with open(path, 'rb') as f:
+            while block := f.read(block_size):
+                write(block)
+                size += len(block)
+        return size
+    
+    def _write_atomic(self, key: str, ext: str, write, log: Callable = print) -> None:
+        path = self._path(key, ext)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log(f"⚠️ Synthesis cache write failed: {e}", "WARNING")
+            self.detach(tmp_path)
+            return
+        with self._lock:
+            self._ensure_index()
+            self._register(path, size)
+    
+    def put_bytes(self, key: str, ext: str, data: bytes, log: Callable = print) -> None:
+        """Store a payload (e.g. raw PCM) under key; a failed write is reported through log"""
+        if len(data) < MIN_AUDIO_FILE_SIZE:  # Same guard as store_file: never cache a truncated response
+            return
+        
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        
+        self._write_atomic(key, ext, write, log)
+    
+    def put_file(self, key: str, ext: str, src_file: str, offset: int = 0, log: Callable = print) -> None:
+        """Store the bytes of src_file from offset on (e.g. the PCM of a WAV) without reading it into memory"""
+        if not os.path.exists(src_file) or os.path.getsize(src_file) - offset < MIN_AUDIO_FILE_SIZE:
+            return
+        
+        def write(tmp_path):
+            with open(src_file, 'rb') as src, open(tmp_path, 'wb') as dst:
+                src.seek(offset)
+                shutil.copyfileobj(src, dst)
+        
+        self._write_atomic(key, ext, write, log)
+    
+    def store_file(self, key: str, ext: str, src_file: str, log: Callable = print) -> None:
+        """Copy a freshly synthesized file into the cache"""
+        if not os.path.exists(src_file) or os.path.getsize(src_file) <= MIN_AUDIO_FILE_SIZE:
+            return
+        self._write_atomic(key, ext, lambda tmp_path: shutil.copyfile(src_file, tmp_path), log)
+    
+    def snapshot(self) -> tuple:
+        """Counters to diff against in summary(since=...) for per-job statistics"""
+        return (self.hits, self.misses)
+    
+    def summary(self, since: Optional[tuple] = None) -> str:
+        hits, misses = self.hits, self.misses
+        if since is not None:
+            hits -= since[0]
+            misses -= since[1]
+        total = hits + misses
+        rate = (hits * 100.0 / total) if total else 0.0
+        return (f"💾 Cache: {hits} hit / {misses} miss ({rate:.0f}%), "
+                f"{self._total_bytes / (1024 * 1024):.1f} MB")
+
+
+def gemini_cache_key(cache: SynthesisCache, config: TTSConfig, text: str) -> str:
+    """Cache key of a Gemini request (speed is applied when saving, so it is not part of the key)"""
+    return cache.make_key(
+        "gemini", config.voice, text,
+        model=MODEL,
+        system_instruction=config.system_instruction,
+        keep_voice_beta=config.keep_voice_beta,
+        thinking_mode=config.thinking_mode,
+        thinking_budget=config.thinking_budget if config.thinking_mode else 0,
+        affective_dialog=config.affective_dialog,
+        proactive_audio=config.proactive_audio,
+    )
+
+
+def read_gemini_cache(config: TTSConfig, text: str) -> Optional[bytes]:
+    """Cached PCM of a Gemini request, or None on a miss (or with caching disabled)"""
+    cache = get_synthesis_cache()
+    if not cache:
+        return None
+    return cache.get_bytes(gemini_cache_key(cache, config, text), ".pcm")
+
+
+def stream_gemini_cache(config: TTSConfig, text: str, sink: "WavSink", log: Callable = print) -> int:
+    """Like read_gemini_cache, but the PCM goes to sink; returns the bytes written (0 on a miss)"""
+    cache = get_synthesis_cache()
+    if not cache:
+        return 0
+    try:
+        return cache.read_into(gemini_cache_key(cache, config, text), ".pcm", sink.write)
+    except OSError as e:
+        log(f"⚠️ Synthesis cache read failed: {e} - tổng hợp lại", "WARNING")
+        sink.reset()  # Drop the part of the entry already written, then synthesize it again
+        return 0
+
+
+_synthesis_cache: Optional[SynthesisCache] = None
+_synthesis_cache_lock = threading.Lock()
+
+
+def get_synthesis_cache() -> Optional[SynthesisCache]:
+    """Shared synthesis cache, or None when caching is disabled"""
+    global _synthesis_cache
+    if not SYNTHESIS_CACHE_ENABLED:
+        return None
+    with _synthesis_cache_lock:
+        if _synthesis_cache is None:
+            _synthesis_cache = SynthesisCache(os.path.join(get_app_dir(), SYNTHESIS_CACHE_DIR_NAME))
+        return _synthesis_cache
+
+
+# =============================================================================
+# CLIP MANIFEST
+# =============================================================================
+
+class ClipManifest:
+    """
+    Manifest of the per-cue clips of an SRT job, saved as JSON next to the clips.
+    
+    Maps cue index -> hash of (voice settings, cue text) plus the clip file and
+    its size. When an edited SRT is dubbed again into the same folder, cues whose
+    hash matches and whose clip is still there are skipped; only changed and new
+    cues are synthesized, and clips of cues that no longer exist are deleted.
+    Only files recorded in the manifest are ever deleted. Thread-safe.
+    """
+    
+    def __init__(self, path: str, voice_key: Any):
+        self.path = path
+        self.voice_key = voice_key  # JSON-able settings that change the audio of a clip
+        self.entries: Dict[int, dict] = {}  # index -> {"hash", "file", "size"}
+        self.extra: Dict[str, Any] = {}  # Other state of the job (e.g. the dub track layout)
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = {int(index): entry for index, entry in data.get("clips", {}).items()}
+            self.extra = data.get("extra", {})
+        except (OSError, ValueError, AttributeError):
+            self.entries, self.extra = {}, {}  # Missing or damaged: every cue counts as new
+    
+    def cue_hash(self, text: str) -> str:
+        payload = json.dumps([self.voice_key, " ".join(text.split())], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    def is_current(self, index: int, text: str, path: str) -> bool:
+        """True if the clip at path was made from this text with the same voice settings"""
+        with self._lock:
+            entry = self.entries.get(index)
+        if not entry or entry.get("file") != os.path.basename(path) or entry.get("hash") != self.cue_hash(text):
+            return False
+        try:
+            return os.path.getsize(path) == entry.get("size")
+        except OSError:
+            return False
+    
+    def record(self, index: int, text: str, path: str) -> None:
+        """Remember the freshly written clip of a cue"""
+        entry = {"hash": self.cue_hash(text), "file": os.path.basename(path), "size": os.path.getsize(path)}
+        with self._lock:
+            self.entries[index] = entry
+    
+    def discard(self, index: int) -> None:
+        """Forget a cue and delete its (now outdated) clip, e.g. after its new text failed"""
+        with self._lock:
+            entry = self.entries.pop(index, None)
+        if entry:
+            self._remove_clip(entry)
+    
+    def prune(self, indices: Iterable[int]) -> int:
+        """Delete the clips of cues not in indices (removed from the SRT). Returns how many."""
+        keep = set(indices)
+        with self._lock:
+            orphans = [self.entries.pop(index) for index in list(self.entries) if index not in keep]
+        for entry in orphans:
+            self._remove_clip(entry)
+        return len(orphans)
+    
+    def _remove_clip(self, entry: dict) -> None:
+        try:
+            os.remove(os.path.join(os.path.dirname(self.path), entry["file"]))
+        except (OSError, KeyError):
+            pass
+    
+    def save(self, log: Callable = print) -> None:
+        """Write the manifest atomically; a failed write is reported through log"""
+        with self._lock:
+            data = {"voice_key": self.voice_key, "extra": self.extra,
+                    "clips": {str(index): entry for index, entry in sorted(self.entries.items())}}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log(f"⚠️ Không ghi được manifest clip: {e}", "WARNING")
+
+
 # =============================================================================
 # CAPCUT VOICE TTS FUNCTIONS
 # =============================================================================
@@ -1152,6 +2300,13 @@ def capcut_create_tts(text: str, voice_id: str, session_id: str, output_file: st
             print(f"[DEBUG Capcut TTS] ERROR: Text is empty or invalid: '{stripped_text[:50]}'")
         return (False, {"error": "Text trống hoặc không hợp lệ"})
     
+    cache = get_synthesis_cache()
+    cache_key = cache.make_key("capcut", voice_id, stripped_text) if cache else None
+    if cache and cache.materialize(cache_key, ".mp3", output_file):
+        if debug:
+            print(f"[DEBUG Capcut TTS] Cache hit: {output_file}")
+        return (True, None)
+    
     req_text = capcut_prepare_text(text)
     url = f'{CAPCUT_TTS_URL}/?text_speaker={voice_id}&req_text={req_text}&speaker_map_type=0&aid=1233'
     headers = {
@@ -1215,8 +2370,11 @@ def capcut_create_tts(text: str, voice_id: str, session_id: str, output_file: st
                     if output_dir:
                         os.makedirs(output_dir, exist_ok=True)
                     
+                    SynthesisCache.detach(output_file)
                     with open(output_file, 'wb') as f:
                         f.write(base64.b64decode(encoded_voice))
+                    if cache:
+                        cache.store_file(cache_key, ".mp3", output_file)
                     
                     if debug:
                         file_size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
@@ -1293,13 +2451,706 @@ def calculate_retry_delay(attempt: int, is_conn_error: bool = False) -> float:
     return delay + jitter
 
 
+def plan_edge_chunks(text: str) -> List[TextChunk]:
+    """
+    Split text for Edge TTS in one byte-aware pass.
+    Every chunk fits one SSML request (EDGE_SSML_MAX_BYTES after XML escaping),
+    so Communicate sends it without splitting again (edge_save_cached(..., planned=True)).
+    """
+    from xml.sax.saxutils import unescape
+    from edge.communicate import plan_text_chunks
+    
+    chunks = []
+    for i, planned in enumerate(plan_text_chunks(text, EDGE_SSML_MAX_BYTES), 1):
+        chunk_text = unescape(planned.decode('utf-8'))
+        chunks.append(TextChunk(index=i, text=chunk_text, original_length=len(chunk_text)))
+    return chunks
+
+
+async def edge_save_cached(text: str, voice: str, output_file: str,
+                           rate: str = "+0%", volume: str = "+0%", pitch: str = "+0Hz",
+                           planned: bool = False) -> None:
+    """
+    Communicate.save backed by the synthesis cache.
+    planned=True: text is a chunk from plan_edge_chunks and is sent as one SSML request.
+    """
+    from xml.sax.saxutils import escape
+    from edge.communicate import Communicate
+    
+    cache = get_synthesis_cache()
+    cache_key = None
+    if cache:
+        cache_key = cache.make_key("edge", voice, text, rate=rate, volume=volume, pitch=pitch)
+        if cache.materialize(cache_key, ".mp3", output_file):
+            return
+        SynthesisCache.detach(output_file)
+    
+    ssml_text = [escape(text).encode('utf-8')] if planned else text
+    communicate = Communicate(ssml_text, voice, rate=rate, volume=volume, pitch=pitch)
+    await communicate.save(output_file)
+    if cache:
+        cache.store_file(cache_key, ".mp3", output_file)
+
+
 # =============================================================================
-# AUDIO PLAYER
+# FOLDER PRE-PROCESSING
 # =============================================================================
+# Reading docx and chunking is CPU-bound and holds the GIL, so folder jobs run it
+# in worker processes while the synthesis stage consumes files in order.
+# The prepare_* functions run in the child processes - they must stay top-level
+# (picklable) and must not touch the GUI.
 
-class AudioPlayer:
-    """Audio player for WAV and MP3 files"""
-    
+def prepare_edge_file(file_path: str) -> List[TextChunk]:
+    """Read a txt/docx file and plan its Edge SSML chunks ([] if empty)"""
+    content = read_document_file(file_path)
+    return plan_edge_chunks(content) if content.strip() else []
+
+
+def prepare_capcut_file(file_path: str) -> List[TextChunk]:
+    """Read a txt/docx file and split it into Capcut chunks ([] if empty)"""
+    content = read_document_file(file_path)
+    return split_text_smart(content, max_chars=CAPCUT_MAX_CHUNK_SIZE) if content.strip() else []
+
+
+def prepare_script_file(file_path: str, line_mode: bool) -> List[str]:
+    """Read a script file into cleaned lines (one line = one voice file), [] if empty"""
+    content = read_document_file(file_path)
+    if not content.strip():
+        return []
+    if line_mode:
+        return [clean_text_for_tts(l) for l in content.split('\n') if l.strip()]
+    return [clean_text_for_tts(content)]
+
+
+def prepare_vieneu_file(file_path: str) -> tuple:
+    """
+    Read a txt/srt file for VN TTS.
+    Returns ("srt", [subtitle texts]) or ("text", cleaned text) - the token budget
+    split needs the loaded tokenizer and stays on the worker thread.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if os.path.splitext(file_path)[1].lower() == '.srt':
+        return "srt", [sub.text for sub in parse_srt(content)]
+    return "text", clean_text_for_tts(content)
+
+
+def _prepare_file_safely(prepare: Callable, file_path: str, args: tuple) -> tuple:
+    """Run prepare(file_path, *args) -> (result, error message) - exceptions may not pickle"""
+    try:
+        return prepare(file_path, *args), None
+    except Exception as e:
+        return None, str(e)
+
+
+def preprocess_worker_count(file_count: int, workers: Optional[int] = None) -> int:
+    """Number of pre-processing processes for a folder (1 = serial)"""
+    if workers is None:
+        workers = PREPROCESS_WORKERS
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 1) - 1)
+    if file_count < PREPROCESS_MIN_FILES:
+        return 1
+    return min(workers, file_count)
+
+
+def iter_prepared_files(file_paths: List[str], prepare: Callable, *args,
+                        workers: Optional[int] = None) -> Iterator[tuple]:
+    """
+    Prepare files in a process pool and yield (file_path, result, error) in input order.
+    
+    At most PREPROCESS_AHEAD_PER_WORKER files per process are prepared ahead of the
+    consumer, so synthesis of one file overlaps with reading the next ones. Closing
+    the generator (e.g. user pressed stop) cancels the pending files. If the pool
+    cannot start or breaks, the remaining files are prepared serially.
+    """
+    workers = preprocess_worker_count(len(file_paths), workers)
+    position = 0
+    if workers > 1:
+        executor = None
+        try:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            ahead = workers * PREPROCESS_AHEAD_PER_WORKER
+            pending = deque()
+            while position < len(file_paths):
+                while len(pending) < ahead and position + len(pending) < len(file_paths):
+                    path = file_paths[position + len(pending)]
+                    pending.append(executor.submit(_prepare_file_safely, prepare, path, args))
+                result, error = pending.popleft().result()
+                yield file_paths[position], result, error
+                position += 1
+        except (OSError, concurrent.futures.process.BrokenProcessPool):
+            pass  # Fall back to serial for whatever is left
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+    for file_path in file_paths[position:]:
+        result, error = _prepare_file_safely(prepare, file_path, args)
+        yield file_path, result, error
+
+
+# =============================================================================
+# DUBBING TIMELINE
+# =============================================================================
+# SRT dubbing: every cue clip is placed at its start time in one track. Clips
+# longer than their cue are sped up with WSOLA (pitch is kept, unlike playing
+# the PCM at a higher sample rate). numpy is imported lazily like in VN TTS.
+
+def time_stretch(samples, rate: float, sample_rate: int = RECEIVE_SAMPLE_RATE):
+    """
+    Pitch-preserving time stretch (WSOLA) of 16-bit mono samples.
+    rate > 1 shortens the clip; the result has round(len(samples) / rate) samples.
+    
+    Output frames are laid at a fixed hop; each one is read from the input near
+    k * hop * rate, shifted (within DUB_WSOLA_TOLERANCE_MS) to where it best
+    continues the previous frame (cross-correlation). Only the frame search is
+    a Python loop - the correlation and the overlap-add are numpy.
+    """
+    import numpy as np
+    x = np.asarray(samples, dtype=np.float32)
+    out_len = int(round(len(x) / rate))
+    if len(x) == 0 or abs(rate - 1.0) < 1e-3:
+        # Too close to 1 to stretch: trim or pad with silence to the promised length
+        clip = np.asarray(samples, dtype=np.int16)[:out_len]
+        return np.concatenate([clip, np.zeros(out_len - len(clip), dtype=np.int16)])
+    
+    frame = max(4, int(sample_rate * DUB_WSOLA_FRAME_MS / 1000) // 2 * 2)
+    hop = frame // 2  # Periodic Hann windows at 50% overlap sum to 1
+    tolerance = max(1, int(sample_rate * DUB_WSOLA_TOLERANCE_MS / 1000))
+    n_frames = out_len // hop + 2
+    
+    # Frame k covers output [(k - 1) * hop, (k + 1) * hop) - zero padding keeps every read in range
+    pad = frame + tolerance
+    tail = int((n_frames + 1) * hop * rate) + frame + 2 * tolerance
+    padded = np.concatenate([np.zeros(pad, np.float32), x, np.zeros(max(0, tail - len(x)) + pad, np.float32)])
+    
+    positions = np.empty(n_frames, dtype=np.int64)
+    positions[0] = pad - hop
+    for k in range(1, n_frames):
+        natural = positions[k - 1] + hop  # Where the previous frame's waveform continues
+        lowest = pad - hop + int(round(k * hop * rate)) - tolerance
+        template = padded[natural:natural + frame]
+        region = padded[lowest:lowest + frame + 2 * tolerance]
+        positions[k] = lowest + int(np.argmax(np.correlate(region, template, 'valid')))
+    
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+    frames = padded[positions[:, None] + np.arange(frame)] * window
+    blocks = np.zeros((n_frames + 1, hop), dtype=np.float32)
+    blocks[:-1] += frames[:, :hop]
+    blocks[1:] += frames[:, hop:]
+    out = blocks.ravel()[hop:hop + out_len]
+    return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+@dataclass
+class DubReport:
+    """Summary of one rendered dubbing track"""
+    cues: int = 0
+    stretched: int = 0  # Clips sped up to fit their cue
+    overflowed: int = 0  # Clips still running into the next cue at DUB_MAX_SPEEDUP
+    missing: int = 0  # Cues without a clip (failed) - silent in the track
+    duration_ms: int = 0
+    rerendered_ms: int = 0  # Part of the track actually rendered (all of it unless incremental)
+    layout: Optional[dict] = field(default=None, repr=False)  # Pass back as previous_layout next time
+
+
+def read_wav_samples(path: str):
+    """16-bit mono WAV -> (numpy int16 samples, sample rate)"""
+    import numpy as np
+    with wave.open(path, "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16), wf.getframerate()
+
+
+def wav_header(num_samples: int, sample_rate: int = RECEIVE_SAMPLE_RATE) -> bytes:
+    """44-byte RIFF header of a 16-bit mono PCM WAV holding num_samples samples"""
+    data_size = num_samples * AUDIO_CHANNELS * AUDIO_SAMPLE_WIDTH
+    block_align = AUDIO_CHANNELS * AUDIO_SAMPLE_WIDTH
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1,
+                       AUDIO_CHANNELS, sample_rate, sample_rate * block_align, block_align,
+                       AUDIO_SAMPLE_WIDTH * 8, b'data', data_size)
+
+
+WAV_HEADER_SIZE = len(wav_header(0))
+
+
+def _mix_clip(track, clip, start: int, written_end: int, fade_len: int, lo: int = 0, hi: Optional[int] = None):
+    """
+    Write a fitted clip into the track at start. The track already holds audio up
+    to written_end: the clip is mixed with it, or crossfaded into it over fade_len.
+    Only samples in [lo, hi) are written - each gets the same value as when the
+    whole clip is written, so spans of a track can be rendered again on their own.
+    """
+    import numpy as np
+    end = start + len(clip)
+    lo, hi = max(lo, start), end if hi is None else min(hi, end)
+    if lo >= hi:
+        return
+    overlap = min(written_end, end) - start
+    # [start, start + head) combines with what is in the track, the rest is just the clip
+    head = max(0, min(overlap, fade_len) if fade_len else overlap)
+    mix_hi = min(hi, start + head)
+    if lo < mix_hi:
+        if fade_len:
+            # Fade from the earlier clip into this one; the rest of the earlier tail is dropped
+            ramp = np.linspace(0.0, 1.0, head, endpoint=False, dtype=np.float32)[lo - start:mix_hi - start]
+            track[lo:mix_hi] = np.rint(track[lo:mix_hi] * (1 - ramp) + clip[lo - start:mix_hi - start] * ramp)
+        else:
+            mixed = track[lo:mix_hi].astype(np.int32) + clip[lo - start:mix_hi - start]
+            track[lo:mix_hi] = np.clip(mixed, -32768, 32767)
+    lo = max(lo, start + head)
+    if lo < hi:
+        track[lo:hi] = clip[lo - start:hi - start]
+
+
+def _changed_spans(old_clips: List[list], new_clips: List[list]) -> List[tuple]:
+    """Merged, sorted sample spans covered by clips placed in only one of two layouts"""
+    old_set = {tuple(clip) for clip in old_clips}
+    new_set = {tuple(clip) for clip in new_clips}
+    spans = sorted((clip[0], clip[1]) for clip in old_set ^ new_set)
+    merged = []
+    for lo, hi in spans:
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def render_dub_track(cues: Iterable[tuple], output_file: str, speed: float = 1.0,
+                     sample_rate: int = RECEIVE_SAMPLE_RATE, crossfade_ms: int = DUB_CROSSFADE_MS,
+                     use_memmap: Optional[bool] = None, previous_layout: Optional[dict] = None) -> DubReport:
+    """
+    Place clips on their cue times and write one continuous WAV.
+    
+    cues: (start_ms, end_ms, clip path or None). Each clip is played at `speed`
+    (pitch-preserving); if it is still longer than its cue it is sped up to fit,
+    up to DUB_MAX_SPEEDUP. Gaps stay silent. A clip that still runs into the next
+    one is mixed with it, or crossfaded into it over crossfade_ms.
+    
+    The WAV headers give every fitted clip length up front, so the track is one
+    preallocated int16 buffer and each clip is stretched straight into its slot.
+    Tracks of DUB_MEMMAP_MIN_SECONDS or more (or use_memmap=True) use an
+    np.memmap over the output file itself; otherwise the buffer is written to
+    the file in one sequential write.
+    
+    previous_layout: report.layout of the render that wrote output_file. Clips
+    are identified by placement, path, size and mtime; if the track length is
+    unchanged, only the spans where clips were added, removed, replaced or moved
+    are cleared and mixed again in place (the result is the same as a full render).
+    """
+    import numpy as np
+    cues = sorted(cues, key=lambda cue: cue[0])
+    report = DubReport(cues=len(cues))
+    if not cues:
+        return report
+    
+    def to_samples(ms: int) -> int:
+        return ms * sample_rate // 1000
+    
+    # Pass 1: fitted length of every clip from its header (no audio decoded yet)
+    plan = []  # (start sample, end sample, stretch rate, clip path)
+    placed = []  # [start, end, path, size, mtime_ns] - what the layout compares between renders
+    total = to_samples(max(end for _, end, _ in cues))
+    for position, (start_ms, end_ms, path) in enumerate(cues):
+        if not path:
+            report.missing += 1
+            continue
+        with wave.open(path, "rb") as wf:
+            frames, clip_rate = wf.getnframes(), wf.getframerate()
+        if clip_rate != sample_rate:
+            raise ValueError(f"{os.path.basename(path)}: {clip_rate} Hz, expected {sample_rate} Hz")
+        
+        slot = max(1, to_samples(end_ms) - to_samples(start_ms))
+        rate = speed
+        if frames / rate > slot:
+            rate = max(speed, min(frames / slot, DUB_MAX_SPEEDUP))
+            if rate > speed:
+                report.stretched += 1
+        start = to_samples(start_ms)
+        end = start + int(round(frames / rate))  # Same rounding as time_stretch
+        if position + 1 < len(cues) and end > to_samples(cues[position + 1][0]):
+            report.overflowed += 1
+        total = max(total, end)
+        plan.append((start, end, rate, path))
+        st = os.stat(path)
+        placed.append([start, end, os.path.abspath(path), st.st_size, st.st_mtime_ns])
+    
+    layout = {"sample_rate": sample_rate, "speed": speed, "crossfade_ms": crossfade_ms,
+              "total": total, "clips": placed}
+    report.layout = layout
+    report.duration_ms = total * 1000 // sample_rate
+    
+    spans = None  # Sample spans to render again, None = the whole track
+    if previous_layout and all(previous_layout.get(key) == layout[key]
+                               for key in ("sample_rate", "speed", "crossfade_ms", "total")):
+        try:
+            intact = os.path.getsize(output_file) == WAV_HEADER_SIZE + total * AUDIO_SAMPLE_WIDTH
+            if intact:
+                with open(output_file, "rb") as f:
+                    intact = f.read(WAV_HEADER_SIZE) == wav_header(total, sample_rate)
+        except OSError:
+            intact = False
+        if intact:
+            spans = _changed_spans(previous_layout.get("clips", []), placed)
+            if sum(hi - lo for lo, hi in spans) > total * DUB_PARTIAL_MAX_FRACTION:
+                spans = None
+    
+    fade_len = to_samples(crossfade_ms)
+    if spans is not None:
+        # Pass 2 (incremental): clear the changed spans and mix again every clip touching them
+        report.rerendered_ms = sum(hi - lo for lo, hi in spans) * 1000 // sample_rate
+        if not spans:
+            return report
+        track = np.memmap(output_file, dtype='<i2', mode='r+', offset=WAV_HEADER_SIZE, shape=(total,))
+        for lo, hi in spans:
+            track[lo:hi] = 0
+        span_starts = [lo for lo, _ in spans]
+        written_end = 0
+        for start, end, rate, path in plan:
+            first = max(0, bisect.bisect_right(span_starts, start) - 1)
+            hits = [(lo, hi) for lo, hi in itertools.takewhile(lambda span: span[0] < end, spans[first:])
+                    if hi > start]
+            if hits:
+                clip = time_stretch(read_wav_samples(path)[0], rate, sample_rate)
+                for lo, hi in hits:
+                    _mix_clip(track, clip, start, written_end, fade_len, lo, hi)
+            written_end = max(written_end, end)
+        track.flush()
+        del track
+        return report
+    
+    # Pass 2: decode + stretch each clip into its slot of the preallocated track
+    report.rerendered_ms = report.duration_ms
+    if use_memmap is None:
+        use_memmap = total >= DUB_MEMMAP_MIN_SECONDS * sample_rate
+    if use_memmap:
+        with open(output_file, "wb") as f:
+            f.write(wav_header(total, sample_rate))
+            f.truncate(WAV_HEADER_SIZE + total * AUDIO_SAMPLE_WIDTH)  # Sparse zeros = silence
+        track = np.memmap(output_file, dtype='<i2', mode='r+', offset=WAV_HEADER_SIZE, shape=(total,))
+    else:
+        track = np.zeros(total, dtype='<i2')
+    
+    written_end = 0  # Track holds audio up to here
+    for start, end, rate, path in plan:
+        clip = time_stretch(read_wav_samples(path)[0], rate, sample_rate)
+        _mix_clip(track, clip, start, written_end, fade_len)
+        written_end = max(written_end, end)
+    
+    if use_memmap:
+        track.flush()
+        del track
+    else:
+        with open(output_file, "wb") as f:
+            f.write(wav_header(total, sample_rate))
+            f.write(memoryview(track))
+    return report
+
+
+def write_dub_timings(layout: dict, texts: Dict[str, str], output_file: str, fmt: str = "json") -> int:
+    """
+    Write where each clip of a rendered dub track really plays (report.layout:
+    sample positions after speed-up, converted to integer ms) with the text of
+    its cue from texts ({clip abspath: text}). Returns the number of cues.
+    """
+    from edge.srt_composer import MillisecondCues
+    from edge.subtitle_formats import write_cues
+    
+    sample_rate = layout["sample_rate"]
+    cues = MillisecondCues()
+    for start, end, path, *_ in layout["clips"]:
+        cues.append(start * 1000 // sample_rate, end * 1000 // sample_rate, texts.get(path, ""))
+    with open(output_file, "w", encoding="utf-8") as f:
+        return write_cues(f, cues, fmt)
+
+
+# =============================================================================
+# SUBTITLE PRE-FLIGHT CHECK
+# =============================================================================
+# Bad cue timing (overlaps, reversed cues, text too long for its cue) used to
+# show up only in the finished dub track. The check runs over the cue times
+# alone - sorted by start, one sweep - so a file is fixed or rejected before
+# any quota is spent.
+
+@dataclass
+class CueIssue:
+    kind: str  # "reversed", "overlap", "gap" or "too_long"
+    index: int  # Cue number
+    detail: str
+
+
+@dataclass
+class SubtitleCheck:
+    """Result of check_subtitle_timing"""
+    cues: int = 0
+    reversed: int = 0  # End before (or at) start
+    overlaps: int = 0  # Starts before an earlier cue has ended
+    gaps: int = 0  # Silence of SUBTITLE_GAP_WARN_MS or more before the cue
+    too_long: int = 0  # Text cannot be spoken within the cue even at DUB_MAX_SPEEDUP
+    issues: List[CueIssue] = field(default_factory=list)  # The first SUBTITLE_CHECK_MAX_LOGGED
+    fixes: Dict[int, tuple] = field(default_factory=dict)  # Cue position in the file -> (start_ms, end_ms)
+    
+    @property
+    def has_errors(self) -> bool:
+        return bool(self.reversed or self.overlaps)
+    
+    def summary(self) -> str:
+        return (f"🔎 Kiểm tra timing {self.cues} cue: {self.overlaps} chồng lấn, {self.reversed} ngược/0ms, "
+                f"{self.too_long} quá dài cho cue, {self.gaps} khoảng lặng > {SUBTITLE_GAP_WARN_MS // 1000}s")
+
+
+def cue_times_to_ms(timestamps: List[str]):
+    """Normalized cue times -> numpy int64 milliseconds (one vectorized pass when all are HH:MM:SS,mmm)"""
+    import numpy as np
+    raw = "".join(timestamps).encode('ascii', 'replace')
+    if timestamps and len(raw) == 12 * len(timestamps):
+        digits = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 12)
+        if (digits[:, 2] == ord(':')).all() and (digits[:, 5] == ord(':')).all() and (digits[:, 8] == ord(',')).all():
+            d = digits.astype(np.int64) - ord('0')
+            return ((d[:, 0] * 10 + d[:, 1]) * 3600000 + (d[:, 3] * 10 + d[:, 4]) * 60000
+                    + (d[:, 6] * 10 + d[:, 7]) * 1000 + d[:, 9] * 100 + d[:, 10] * 10 + d[:, 11])
+    return np.fromiter(map(cue_time_to_ms, timestamps), dtype=np.int64, count=len(timestamps))
+
+
+def check_subtitle_timing(subtitles: Iterable[Subtitle], speed: float = 1.0,
+                          syllables_per_second: float = SPEAKING_RATE_SYLLABLES_PER_SECOND) -> SubtitleCheck:
+    """
+    Validate cue times in O(n log n) and plan fixes, without keeping the text.
+    
+    Cues are sorted by start; the running maximum of the ends (one sweep) tells
+    every cue that starts before an earlier one has ended. A cue is too long
+    when its text, spoken at syllables_per_second * speed and sped up to
+    DUB_MAX_SPEEDUP, still does not fit its duration. All of it is numpy over
+    the time columns; only the logged issues are formatted in Python.
+    
+    Fixes (by position in the input): reversed times are swapped, a cue running
+    into the next start is trimmed to it, and a cue too long for its text is
+    extended into the silence after it (never past the next start).
+    """
+    import numpy as np
+    start_times, end_times, syllables, indices = [], [], array('I'), array('q')
+    for sub in subtitles:
+        start_times.append(sub.start_time)
+        end_times.append(sub.end_time)
+        syllables.append(estimate_syllables(sub.text))
+        indices.append(sub.index)
+    check = SubtitleCheck(cues=len(indices))
+    if not indices:
+        return check
+    starts, ends = cue_times_to_ms(start_times), cue_times_to_ms(end_times)
+    del start_times, end_times
+    
+    reversed_rows = np.flatnonzero(ends <= starts)
+    check.reversed = len(reversed_rows)
+    for row in reversed_rows[:SUBTITLE_CHECK_MAX_LOGGED]:
+        check.issues.append(CueIssue("reversed", indices[row],
+                                     f"{ms_to_cue_time(int(starts[row]))} --> {ms_to_cue_time(int(ends[row]))}"))
+    swapped = ends < starts
+    starts, ends = np.where(swapped, ends, starts), np.where(swapped, starts, ends)
+    
+    # Sweep in start order: a cue overlaps if it starts before the latest end so far
+    order = np.argsort(starts, kind='stable')
+    start, end = starts[order], ends[order]
+    positions = np.arange(len(order))
+    latest_end = np.maximum.accumulate(end)
+    previous_end = np.concatenate(([np.iinfo(np.int64).min], latest_end[:-1]))
+    overlap = start < previous_end
+    gap = ~overlap & (positions > 0) & (start - previous_end >= SUBTITLE_GAP_WARN_MS)
+    
+    # Next later start (cues starting together cannot be separated by trimming)
+    following = np.searchsorted(start, start, side='right')
+    has_next = following < len(start)
+    next_start = np.where(has_next, start[np.minimum(following, len(start) - 1)], np.iinfo(np.int64).max)
+    
+    natural_ms = (np.frombuffer(syllables, dtype=np.uint32)[order] / syllables_per_second * 1000).astype(np.int64)
+    shortest_ms = natural_ms / max(speed, DUB_MAX_SPEEDUP)
+    too_long = shortest_ms > end - start
+    fitted_end = np.minimum(end, next_start)
+    # Give a cue that cannot fit the time it needs at the normal speed, as far as the silence allows
+    wanted = start + (natural_ms / speed).astype(np.int64)
+    fitted_end = np.where(shortest_ms > fitted_end - start,
+                          np.maximum(fitted_end, np.minimum(wanted, next_start)), fitted_end)
+    
+    check.overlaps, check.gaps, check.too_long = int(overlap.sum()), int(gap.sum()), int(too_long.sum())
+    changed = np.flatnonzero((fitted_end != end) | swapped[order])
+    check.fixes = dict(zip(order[changed].tolist(), zip(start[changed].tolist(), fitted_end[changed].tolist())))
+    
+    # Details of the first issues in start order; latest = position holding the latest end before each cue
+    latest = np.maximum.accumulate(np.where(end > previous_end, positions, 0))
+    logged = np.flatnonzero(overlap | gap | too_long)[:max(0, SUBTITLE_CHECK_MAX_LOGGED - len(check.issues))]
+    for position in logged.tolist():
+        row = int(order[position])
+        if overlap[position]:
+            holder = int(order[latest[position - 1]])
+            check.issues.append(CueIssue("overlap", indices[row], f"bắt đầu {int(previous_end[position] - start[position])}ms "
+                                                                  f"trước khi cue {indices[holder]} kết thúc"))
+        elif gap[position]:
+            check.issues.append(CueIssue("gap", indices[row],
+                                         f"im lặng {(start[position] - previous_end[position]) / 1000:.1f}s trước cue"))
+        if too_long[position]:
+            check.issues.append(CueIssue("too_long", indices[row],
+                                         f"{syllables[row]} âm tiết cần ~{natural_ms[position] / speed / 1000:.1f}s, "
+                                         f"cue dài {(end[position] - start[position]) / 1000:.1f}s"))
+    return check
+
+
+def apply_timing_fixes(subtitles: Iterable[Subtitle], fixes: Dict[int, tuple]) -> Iterator[Subtitle]:
+    """Yield the same cues (same order, e.g. streamed again from the file) with fixed times"""
+    for position, sub in enumerate(subtitles):
+        fix = fixes.get(position)
+        if fix is not None:
+            sub = Subtitle(sub.index, ms_to_cue_time(fix[0]), ms_to_cue_time(fix[1]), sub.text)
+        yield sub
+
+
+# =============================================================================
+# FORCED SUBTITLES
+# =============================================================================
+
+# MPEG audio frame header tables, indexed by the header's version bits (3 = MPEG-1,
+# 2 = MPEG-2, 0 = MPEG-2.5) and layer bits (3 = Layer I, 2 = Layer II, 1 = Layer III)
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP3_BITRATES_V1 = {
+    3: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+}
+_MP3_BITRATES_V2 = {
+    3: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    1: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def mp3_sample_count(path: str) -> tuple:
+    """
+    (samples, sample rate) of an MP3 file, counted by walking its frame headers -
+    exact without decoding. ID3 tags and a leading Xing/Info frame (which decoders
+    and ffmpeg's concat demuxer drop) are not counted.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        pos = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+        if data[5] & 0x10:
+            pos += 10  # Footer
+    samples = 0
+    sample_rate = 0
+    first = True
+    end = len(data)
+    while pos + 4 <= end:
+        b1, b2 = data[pos + 1], data[pos + 2]
+        version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if (data[pos] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or layer == 0
+                or bitrate_index in (0, 15) or rate_index == 3):
+            # Not a frame header (tag, junk): resync on the next 0xFF byte
+            pos = data.find(b"\xff", pos + 1)
+            if pos < 0:
+                break
+            continue
+        rate = _MP3_SAMPLE_RATES[version][rate_index]
+        bitrate = (_MP3_BITRATES_V1 if version == 3 else _MP3_BITRATES_V2)[layer][bitrate_index] * 1000
+        padding = (b2 >> 1) & 1
+        if layer == 3:
+            frame_samples = 384
+            frame_size = (12 * bitrate // rate + padding) * 4
+        else:
+            frame_samples = 1152 if layer == 2 or version == 3 else 576
+            frame_size = frame_samples // 8 * bitrate // rate + padding
+        if not (first and (b"Xing" in data[pos:pos + 64] or b"Info" in data[pos:pos + 64])):
+            samples += frame_samples
+            sample_rate = rate
+        first = False
+        pos += frame_size
+    return samples, sample_rate
+
+
+def audio_sample_count(path: str) -> tuple:
+    """(samples, sample rate) of a WAV or MP3 chunk"""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            return wf.getnframes(), wf.getframerate()
+    return mp3_sample_count(path)
+
+
+def split_cue_text(text: str, max_chars: int = FORCED_SUBTITLE_MAX_CHARS) -> List[str]:
+    """
+    Split the text of one chunk into subtitle lines of at most max_chars (a single
+    longer word stays whole). A line is closed early after punctuation once it is
+    half full, so cues tend to end at phrase boundaries.
+    """
+    words = text.split()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [" ".join(words)] if words else []
+    lines = []
+    current = []
+    length = 0
+    for word in words:
+        if current and length + 1 + len(word) > max_chars:
+            lines.append(" ".join(current))
+            current = []
+            length = 0
+        length += len(word) + (1 if current else 0)
+        current.append(word)
+        if length >= max_chars // 2 and word[-1] in ".!?,;:。！？，；：":
+            lines.append(" ".join(current))
+            current = []
+            length = 0
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def forced_subtitle_cues(segments: Iterable[tuple], max_chars: int = FORCED_SUBTITLE_MAX_CHARS):
+    """
+    edge MillisecondCues for merged audio from (text, samples, sample_rate) of
+    each chunk in playback order. Chunk boundaries are exact (cumulative sample
+    counts, floored to whole milliseconds); lines within a chunk share its
+    duration in proportion to syllables.
+    """
+    from fractions import Fraction
+    from edge.srt_composer import MillisecondCues
+    
+    cues = MillisecondCues()
+    elapsed = Fraction(0)  # Seconds - exact even if chunks have different sample rates
+    for text, samples, sample_rate in segments:
+        start = elapsed
+        duration = Fraction(samples, sample_rate) if sample_rate else Fraction(0)
+        elapsed += duration
+        lines = split_cue_text(text, max_chars)
+        weights = [max(estimate_syllables(line), 1) for line in lines]
+        total = sum(weights)
+        done = 0
+        for line, weight in zip(lines, weights):
+            line_start = start + duration * done / total
+            done += weight
+            cues.append(int(line_start * 1000), int((start + duration * done / total) * 1000), line)
+    return cues
+
+
+def write_forced_subtitles(segments: Iterable[tuple], output_file: str,
+                           max_chars: int = FORCED_SUBTITLE_MAX_CHARS) -> int:
+    """
+    Write subtitles for merged audio whose chunks are given as (text, samples,
+    sample_rate), in the format of output_file's extension (.srt, .vtt, .ass,
+    .json, .ndjson). Returns the number of cues.
+    """
+    from edge.subtitle_formats import format_for_path, write_cues
+    
+    cues = forced_subtitle_cues(segments, max_chars)
+    with open(output_file, "w", encoding="utf-8") as f:
+        return write_cues(f, cues, format_for_path(output_file))
+
+
+# =============================================================================
+# AUDIO PLAYER
+# =============================================================================
+
+class AudioPlayer:
+    """Audio player for WAV and MP3 files"""
+    
     def __init__(self):
         self.is_playing = False
         self.should_stop = False
@@ -1459,13 +3310,18 @@ class TruePersistentSession:
     2. generate_audio(text) - Gửi text và đợi nhận audio (qua CÙNG session)
     3. disconnect() - Đóng session khi hoàn tất
     
+    Sending and receiving run as two tasks: up to `window` turns are sent
+    ahead, and each completed turn resolves the oldest request in flight.
     Session sẽ tự động reconnect nếu bị timeout (~10 phút).
     """
     
-    def __init__(self, api_key: str, config: TTSConfig, log_callback=None):
+    def __init__(self, api_key: str, config: TTSConfig, log_callback=None,
+                 window: int = LIVE_SESSION_WINDOW, name: str = ""):
         self.api_key = api_key
         self.config = config
         self.log = log_callback or print
+        self.window = max(1, window)
+        self.name = name  # Shown in the logs when a key has several sessions
         
         # Client và session
         self.client = None
@@ -1475,10 +3331,13 @@ class TruePersistentSession:
         # State
         self.is_connected = False
         self._running = False
+        self.pending = 0  # Requests waiting for or holding a slot of the window (pool load)
         
         # Queues for communication with session task
         self._request_queue = None
-        self._request_lock = None
+        self._window_slots = None  # Semaphore(window): requests queued + in flight
+        self._in_flight = deque()  # (future, write) of sent turns, oldest first (turns complete in order)
+        self._turn_sent = None  # Set while a sent turn still waits for its audio
         self._session_task = None
         
     def _setup_client(self, api_version: str = "v1beta"):
@@ -1537,9 +3396,10 @@ class TruePersistentSession:
             self._live_config = self._build_config()
             
             self._request_queue = asyncio.Queue()
-            self._request_lock = asyncio.Lock()
+            self._window_slots = asyncio.Semaphore(self.window)
+            self._turn_sent = asyncio.Event()
             
-            self.log(f"🔗 Đang kết nối Persistent Session...", "INFO")
+            self.log(f"🔗 Đang kết nối Persistent Session{self.name}...", "INFO")
             self.log(f"🎭 Voice: {self.config.voice}", "INFO")
             
             self._running = True
@@ -1561,12 +3421,12 @@ class TruePersistentSession:
             return False
     
     async def _session_manager(self):
-        """Background task giữ session mở và xử lý requests"""
+        """Background task giữ session mở: gửi requests và nhận audio song song"""
         reconnect_delay = 1.0
         
         while self._running:
             try:
-                self.log(f"📡 Mở WebSocket connection...", "INFO")
+                self.log(f"📡 Mở WebSocket connection{self.name}...", "INFO")
                 
                 async with self.client.aio.live.connect(
                     model=MODEL,
@@ -1576,79 +3436,133 @@ class TruePersistentSession:
                     self.is_connected = True
                     reconnect_delay = 1.0  # Reset on success
                     
-                    self.log(f"✅ WebSocket đã kết nối, sẵn sàng nhận requests", "SUCCESS")
+                    self.log(f"✅ WebSocket{self.name} đã kết nối, sẵn sàng nhận requests", "SUCCESS")
                     
-                    # Process requests while connected
-                    while self._running and self.is_connected:
+                    receiver = asyncio.create_task(self._receive_turns(session))
+                    try:
+                        await self._send_requests(session, receiver)
+                    finally:
+                        receiver.cancel()
                         try:
-                            # Wait for request with timeout
-                            request = await asyncio.wait_for(
-                                self._request_queue.get(),
-                                timeout=60.0
-                            )
-                            
-                            if request is None:  # Shutdown signal
-                                self.log(f"🔌 Nhận tín hiệu đóng session", "INFO")
-                                break
-                            
-                            text, response_future = request
-                            
-                            try:
-                                audio_data = await self._send_and_receive(session, text)
-                                response_future.set_result(audio_data)
-                            except Exception as e:
-                                response_future.set_exception(e)
-                                
-                        except asyncio.TimeoutError:
-                            # No requests - just continue waiting
-                            continue
-                        except Exception as e:
-                            self.log(f"⚠️ Lỗi xử lý request: {str(e)}", "WARNING")
+                            await receiver
+                        except (asyncio.CancelledError, Exception):
+                            pass
                 
                 self.is_connected = False
                 self.session = None
+                self._fail_in_flight(ConnectionError("Live session closed"))
                 
             except Exception as e:
                 self.is_connected = False
                 self.session = None
+                # Audio of turns sent on the old socket never arrives - let their callers retry
+                self._fail_in_flight(e)
                 
                 if self._running:
-                    self.log(f"⚠️ Session bị ngắt: {str(e)}", "WARNING")
+                    self.log(f"⚠️ Session{self.name} bị ngắt: {str(e)}", "WARNING")
                     self.log(f"🔄 Reconnect sau {reconnect_delay}s...", "INFO")
                     await asyncio.sleep(reconnect_delay)
                     reconnect_delay = min(reconnect_delay * 2, 30.0)
         
-        self.log(f"🔌 Session manager đã dừng", "INFO")
+        self.log(f"🔌 Session manager{self.name} đã dừng", "INFO")
     
-    async def _send_and_receive(self, session, text: str) -> bytes:
-        """Gửi text và nhận audio response qua persistent session"""
-        input_text = text
-        if self.config.keep_voice_beta:
-            input_text = "{" + text + "}"
-        
-        preview = input_text[:50] + "..." if len(input_text) > 50 else input_text
-        self.log(f"📝 Gửi: {preview}", "INFO")
-        
-        audio_chunks = []
-        
-        # Sử dụng session.send() giống như WorkerEngine gốc - KHÔNG dùng send_client_content
-        await session.send(input=input_text, end_of_turn=True)
-        
-        # Nhận audio - chỉ dùng response.data giống như code gốc
-        async for response in session.receive():
-            if data := response.data:
-                audio_chunks.append(data)
-        
-        if audio_chunks:
-            total_bytes = sum(len(c) for c in audio_chunks)
-            self.log(f"✅ Nhận {len(audio_chunks)} chunks ({total_bytes} bytes)", "SUCCESS")
-            return b''.join(audio_chunks)
-        
-        self.log(f"⚠️ Không nhận được audio data", "WARNING")
-        return b''
+    async def _send_requests(self, session, receiver: asyncio.Task):
+        """
+        Send queued texts as they arrive. generate_audio holds a window slot per
+        request, so at most `window` turns are queued or in flight. Returns when
+        the session is shut down; raises if the receiver failed (socket closed).
+        """
+        while self._running:
+            getter = asyncio.ensure_future(self._request_queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, timeout=60.0,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                if receiver in done:
+                    receiver.result()  # Raises the receive error
+                    return
+                continue  # No requests - just continue waiting
+            request = getter.result()
+            if request is None:  # Shutdown signal
+                self.log(f"🔌 Nhận tín hiệu đóng session{self.name}", "INFO")
+                return
+            if receiver.done():
+                await self._request_queue.put(request)  # Sent again on the next connection
+                receiver.result()
+                return
+            
+            text, response_future, write = request
+            if response_future.done():  # Caller gave up while it was queued
+                continue
+            input_text = text
+            if self.config.keep_voice_beta:
+                input_text = "{" + text + "}"
+            preview = input_text[:50] + "..." if len(input_text) > 50 else input_text
+            self.log(f"📝 Gửi{self.name}: {preview}", "INFO")
+            
+            self._in_flight.append((response_future, write))
+            self._turn_sent.set()
+            # Sử dụng session.send() giống như WorkerEngine gốc - KHÔNG dùng send_client_content
+            await session.send(input=input_text, end_of_turn=True)
+    
+    async def _receive_turns(self, session):
+        """
+        Demultiplex the audio stream: session.receive() ends at turn_complete, and
+        turns are answered in the order they were sent, so each turn belongs to
+        the oldest request in flight. Its audio goes to that request's write()
+        as it arrives, or is collected and returned when the turn completes.
+        """
+        while True:
+            await self._turn_sent.wait()
+            response_future, write = self._in_flight[0] if self._in_flight else (None, None)
+            audio_chunks = []
+            chunk_count = total_bytes = 0
+            # Nhận audio - chỉ dùng response.data giống như code gốc
+            async for response in session.receive():
+                if data := response.data:
+                    chunk_count += 1
+                    total_bytes += len(data)
+                    if write is None:
+                        audio_chunks.append(data)
+                    elif not response_future.done():  # Stop writing once the caller gave up
+                        try:
+                            write(data)
+                        except Exception as e:  # e.g. disk full - only this request fails
+                            response_future.set_exception(e)
+            
+            if not self._in_flight:
+                continue
+            self._in_flight.popleft()
+            if not self._in_flight:
+                self._turn_sent.clear()
+            if response_future.done():  # Caller timed out - the turn is dropped
+                continue
+            if chunk_count:
+                self.log(f"✅ Nhận {chunk_count} chunks ({total_bytes} bytes)", "SUCCESS")
+            else:
+                self.log(f"⚠️ Không nhận được audio data", "WARNING")
+            response_future.set_result(b''.join(audio_chunks) if write is None else total_bytes)
     
-    async def generate_audio(self, text: str) -> Optional[bytes]:
-        """Gửi text và nhận audio thông qua persistent session"""
+    def _fail_in_flight(self, error: Exception):
+        """Fail every sent turn (their audio was lost with the connection)"""
+        while self._in_flight:
+            response_future, _ = self._in_flight.popleft()
+            if not response_future.done():
+                response_future.set_exception(error)
+        if self._turn_sent:
+            self._turn_sent.clear()
+    
+    @property
+    def load(self) -> int:
+        """Requests on this session, queued or in flight"""
+        return self.pending
+    
+    async def generate_audio(self, text: str, write: Optional[Callable[[bytes], Any]] = None):
+        """
+        Gửi text và nhận audio thông qua persistent session. Returns the audio,
+        or with write (called with each chunk as it arrives) the number of bytes
+        passed to it; None on failure.
+        """
         if not self._running:
             self.log("❌ Session chưa được khởi động", "ERROR")
             return None
@@ -1663,26 +3577,28 @@ class TruePersistentSession:
             self.log("❌ Session không có kết nối", "ERROR")
             return None
         
-        async with self._request_lock:
-            try:
+        self.pending += 1
+        try:
+            async with self._window_slots:
                 # Create future for response
-                loop = asyncio.get_event_loop()
+                loop = asyncio.get_running_loop()
                 response_future = loop.create_future()
                 
                 # Put request in queue
-                await self._request_queue.put((text, response_future))
+                await self._request_queue.put((text, response_future, write))
                 
                 # Wait for response
                 try:
-                    audio_data = await asyncio.wait_for(response_future, timeout=120.0)
-                    return audio_data
+                    return await asyncio.wait_for(response_future, timeout=120.0)
                 except asyncio.TimeoutError:
                     self.log(f"⏰ Timeout waiting for audio", "ERROR")
                     return None
                     
-            except Exception as e:
-                self.log(f"❌ Lỗi generate_audio: {str(e)}", "ERROR")
-                return None
+        except Exception as e:
+            self.log(f"❌ Lỗi generate_audio: {str(e)}", "ERROR")
+            return None
+        finally:
+            self.pending -= 1
     
     async def disconnect(self):
         """Ngắt kết nối và cleanup"""
@@ -1715,6 +3631,82 @@ class TruePersistentSession:
 PersistentTTSSession = TruePersistentSession
 
 
+class LiveSessionPool:
+    """
+    LIVE_SESSIONS_PER_KEY persistent sessions of one API key, shared by all
+    workers of that key in a job. Each request goes to the least-loaded
+    connected session, so a key serves up to size * window turns at once.
+    
+    Workers share a pool through acquire()/release() (reference counted; the
+    last release disconnects every session).
+    """
+    
+    _shared: Dict[tuple, "LiveSessionPool"] = {}
+    
+    def __init__(self, api_key: str, config: TTSConfig, log_callback=None,
+                 size: int = LIVE_SESSIONS_PER_KEY, window: int = LIVE_SESSION_WINDOW):
+        self.api_key = api_key
+        self.config = config
+        self.log = log_callback or print
+        self.size = max(1, size)
+        self.window = max(1, window)
+        self.sessions: List[TruePersistentSession] = []
+        self.users = 0
+        self._connect_lock = asyncio.Lock()
+    
+    @classmethod
+    async def acquire(cls, api_key: str, config: TTSConfig, log_callback=None) -> "LiveSessionPool":
+        """The pool of api_key for this job (same config and event loop), connected"""
+        key = (api_key, id(config), id(asyncio.get_running_loop()))
+        pool = cls._shared.get(key)
+        if pool is None:
+            pool = cls._shared[key] = cls(api_key, config, log_callback)
+        pool.users += 1
+        await pool.connect()
+        return pool
+    
+    async def release(self):
+        """Drop one user; the last one disconnects the sessions"""
+        self.users -= 1
+        if self.users > 0:
+            return
+        for key, pool in list(self._shared.items()):
+            if pool is self:
+                del self._shared[key]
+        await self.disconnect()
+    
+    @property
+    def is_connected(self) -> bool:
+        return any(session.is_connected for session in self.sessions)
+    
+    async def connect(self) -> bool:
+        """Start the sessions (again, for those whose manager stopped)"""
+        async with self._connect_lock:
+            if not self.sessions:
+                key_preview = f"...{self.api_key[-4:]}" if len(self.api_key) >= 4 else "****"
+                self.sessions = [
+                    TruePersistentSession(self.api_key, self.config, self.log, window=self.window,
+                                          name=f" #{n + 1} ({key_preview})" if self.size > 1 else "")
+                    for n in range(self.size)
+                ]
+            stopped = [session for session in self.sessions
+                       if not (session._session_task and not session._session_task.done())]
+            if stopped:
+                for session in stopped:
+                    session.is_connected = False  # connect() skips sessions that look connected
+                await asyncio.gather(*(session.connect() for session in stopped))
+            return self.is_connected
+    
+    async def generate_audio(self, text: str, write: Optional[Callable[[bytes], Any]] = None):
+        """Send text on the least-loaded session (connected ones first); see TruePersistentSession.generate_audio"""
+        session = min(self.sessions, key=lambda s: (not s.is_connected, s.load))
+        return await session.generate_audio(text, write)
+    
+    async def disconnect(self):
+        await asyncio.gather(*(session.disconnect() for session in self.sessions))
+        self.sessions = []
+
+
 # =============================================================================
 # LIVE SESSION WORKER ENGINE - Sử dụng True Persistent Session
 # =============================================================================
@@ -1722,7 +3714,8 @@ PersistentTTSSession = TruePersistentSession
 class LiveSessionWorkerEngine:
     """
     Worker Engine sử dụng True Persistent Session.
-    Mỗi worker giữ MỘT session mở và gửi nhiều requests qua session đó.
+    Các worker của cùng một API key dùng chung một LiveSessionPool và gửi
+    requests qua các session đang mở của pool đó.
     """
     
     def __init__(self, worker_id: int, api_key: str, config: TTSConfig, log_callback=None):
@@ -1730,36 +3723,74 @@ class LiveSessionWorkerEngine:
         self.api_key = api_key
         self.config = config
         self.log = log_callback or print
-        self.session: Optional[TruePersistentSession] = None
+        self.session: Optional[LiveSessionPool] = None
         self.is_connected = False
         
     async def connect(self) -> bool:
-        """Khởi tạo và kết nối session"""
-        self.session = TruePersistentSession(
-            api_key=self.api_key,
-            config=self.config,
-            log_callback=self.log
-        )
-        success = await self.session.connect()
+        """Lấy pool của API key (kết nối nếu chưa có) hoặc mở lại các session đã dừng"""
+        if self.session is None:
+            self.session = await LiveSessionPool.acquire(self.api_key, self.config, self.log)
+            success = self.session.is_connected
+        else:
+            success = await self.session.connect()
         self.is_connected = success
         return success
     
     async def disconnect(self):
-        """Ngắt kết nối session"""
+        """Trả pool (session đóng khi worker cuối cùng của key trả)"""
         if self.session:
-            await self.session.disconnect()
+            await self.session.release()
+            self.session = None
         self.is_connected = False
     
-    async def generate_audio(self, text: str) -> bytes:
-        """Generate audio sử dụng persistent session"""
+    def cached_audio(self, text: str) -> Optional[bytes]:
+        """Audio of text from the synthesis cache (None on a miss) - needs no API call, so no key permit"""
+        return read_gemini_cache(self.config, text)
+    
+    def stream_cached(self, text: str, sink: WavSink) -> int:
+        """Like cached_audio, but into sink; returns the bytes written (0 on a miss)"""
+        return stream_gemini_cache(self.config, text, sink, self.log)
+    
+    async def generate_audio(self, text: str, lookup: bool = True) -> bytes:
+        """Generate audio sử dụng persistent session (lookup=False: the caller has already checked the cache)"""
+        cache = get_synthesis_cache()
+        if lookup:
+            cached = self.cached_audio(text)
+            if cached:
+                return cached
+        
         if not self.is_connected or not self.session:
             await self.connect()
         
         audio_data = await self.session.generate_audio(text)
         if audio_data is None or len(audio_data) == 0:
             raise ValueError(f"Failed to generate audio: no data for '{text[:50]}...'")
+        check_audio_size(len(audio_data))
+        if cache:
+            cache.put_bytes(gemini_cache_key(cache, self.config, text), ".pcm", audio_data, self.log)
         return audio_data
     
+    async def stream_audio(self, text: str, sink: WavSink, lookup: bool = True) -> int:
+        """Like generate_audio, but the audio goes to sink as it arrives; returns the bytes written"""
+        cache = get_synthesis_cache()
+        if lookup:
+            cached = self.stream_cached(text, sink)
+            if cached:
+                return cached
+        
+        if not self.is_connected or not self.session:
+            await self.connect()
+        
+        written = await self.session.generate_audio(text, sink.write)
+        if not written:
+            raise ValueError(f"Failed to generate audio: no data for '{text[:50]}...'")
+        check_audio_size(sink.data_bytes)
+        if cache:
+            sink.flush()
+            cache.put_file(gemini_cache_key(cache, self.config, text), ".pcm", sink.part_path, offset=WAV_HEADER_SIZE,
+                           log=self.log)
+        return written
+    
     def recreate_session(self):
         """Đánh dấu cần recreate session"""
         self.is_connected = False
@@ -1770,11 +3801,150 @@ class LiveSessionWorkerEngine:
 # WORKER ENGINE
 # =============================================================================
 
+class WarmSessionPool:
+    """
+    Pre-connected Live sockets for the one-turn-per-session requests of
+    WorkerEngine, shared by all workers of one API key. A background task
+    keeps `size` sockets open (TLS + setup with the config already sent) and
+    replaces those older than WARM_SESSION_MAX_AGE_SECONDS, so a request
+    only pays for the connect when the pool ran dry.
+    
+    Each socket serves one request and is closed after it (a fresh context
+    per request, as before). Shared through acquire()/release().
+    """
+    
+    _shared: Dict[tuple, "WarmSessionPool"] = {}
+    
+    def __init__(self, client, live_config, size: int = WARM_SESSIONS_PER_KEY,
+                 max_age: float = WARM_SESSION_MAX_AGE_SECONDS):
+        self.client = client
+        self.live_config = live_config
+        self.size = size
+        self.max_age = max_age
+        self.users = 0
+        self.hits = 0  # Requests served by a warm socket
+        self.misses = 0  # Requests that had to connect
+        self._idle = deque()  # (context manager, session, opened_at), oldest first
+        self._opening: set = set()  # Connect tasks in progress
+        self._failures = 0  # Consecutive failed connects (backoff)
+        self._changed = asyncio.Event()  # Set when a socket is taken or a connect ends
+        self._task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def acquire(cls, api_key: str, config: TTSConfig, client, live_config,
+                size: int = WARM_SESSIONS_PER_KEY) -> "WarmSessionPool":
+        """The pool of api_key for this job (same config and event loop); starts filling it"""
+        key = (api_key, id(config), id(asyncio.get_running_loop()))
+        pool = cls._shared.get(key)
+        if pool is None:
+            pool = cls._shared[key] = cls(client, live_config, size)
+        pool.users += 1
+        if pool._task is None:
+            pool._task = asyncio.create_task(pool._keep_warm())
+        return pool
+    
+    async def release(self):
+        """Drop one user; the last one closes the warm sockets"""
+        self.users -= 1
+        if self.users > 0:
+            return
+        for key, pool in list(self._shared.items()):
+            if pool is self:
+                del self._shared[key]
+        await self.close()
+    
+    async def _open(self) -> tuple:
+        connection = self.client.aio.live.connect(model=MODEL, config=self.live_config)
+        session = await connection.__aenter__()
+        return connection, session, time.monotonic()
+    
+    @staticmethod
+    async def _close(connection):
+        try:
+            await connection.__aexit__(None, None, None)
+        except Exception:
+            pass
+    
+    async def _keep_warm(self):
+        """Refill the pool as sockets are taken or grow old (missing ones connect in parallel)"""
+        while True:
+            now = time.monotonic()
+            while self._idle and now - self._idle[0][2] > self.max_age:
+                await self._close(self._idle.popleft()[0])
+            for _ in range(self.size - len(self._idle) - len(self._opening)):
+                task = asyncio.create_task(self._open_one())
+                self._opening.add(task)
+                task.add_done_callback(self._opening.discard)
+            self._changed.clear()
+            expires_in = self.max_age - (now - self._idle[0][2]) if self._idle else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=expires_in and max(expires_in, 0.1))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _open_one(self):
+        try:
+            self._idle.append(await self._open())
+            self._failures = 0
+        except Exception:
+            # Key or network trouble - requests connect (and report) on their own meanwhile
+            self._failures += 1
+            await asyncio.sleep(min(2 ** self._failures, 30.0))
+        finally:
+            self._changed.set()
+    
+    async def take(self) -> tuple:
+        """(context manager, session, warm) - a warm socket if one is ready, else a new one"""
+        now = time.monotonic()
+        while self._idle:
+            warm = self._idle.popleft()
+            self._changed.set()
+            if now - warm[2] <= self.max_age:
+                self.hits += 1
+                return warm[0], warm[1], True
+            await self._close(warm[0])
+        self.misses += 1
+        connection, session, _ = await self._open()
+        return connection, session, False
+    
+    async def reopen(self, connection) -> tuple:
+        """Replace a taken socket that the server closed while it was idle: (context manager, session)"""
+        await self._close(connection)
+        connection, session, _ = await self._open()
+        return connection, session
+    
+    async def discard(self, connection):
+        """Close a taken socket after its request (each socket serves one)"""
+        await self._close(connection)
+    
+    async def flush(self):
+        """Close the idle sockets (after connection errors they may be stale)"""
+        while self._idle:
+            await self._close(self._idle.popleft()[0])
+        self._changed.set()
+    
+    async def close(self):
+        for task in [self._task, *self._opening]:
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._task = None
+        await self.flush()
+
+
 class WorkerEngine:
-    def __init__(self, worker_id: int, api_key: str, config: TTSConfig):
+    def __init__(self, worker_id: int, api_key: str, config: TTSConfig,
+                 warm_sessions: int = WARM_SESSIONS_PER_KEY, log_callback=None):
         self.worker_id = worker_id
         self.api_key = api_key
         self.config = config
+        self.log = log_callback or print
+        self.warm_sessions = warm_sessions
+        self.pool: Optional[WarmSessionPool] = None
+        self._live_config = None  # Built once per engine
         self._setup_client()
     
     def _setup_client(self):
@@ -1818,9 +3988,49 @@ class WorkerEngine:
         
         return types.LiveConnectConfig(**cfg)
     
-    async def generate_audio(self, text: str) -> bytes:
+    def cached_audio(self, text: str) -> Optional[bytes]:
+        """Audio of text from the synthesis cache (None on a miss) - needs no API call, so no key permit"""
+        return read_gemini_cache(self.config, text)
+    
+    def stream_cached(self, text: str, sink: WavSink) -> int:
+        """Like cached_audio, but into sink; returns the bytes written (0 on a miss)"""
+        return stream_gemini_cache(self.config, text, sink, self.log)
+    
+    async def generate_audio(self, text: str, lookup: bool = True) -> bytes:
+        """Audio of text (lookup=False: the caller has already checked the cache)"""
+        cache = get_synthesis_cache()
+        if lookup:
+            cached = self.cached_audio(text)
+            if cached:
+                return cached
+        
         chunks = []
-        config = self._build_config()
+        await self._receive_audio(text, chunks.append)
+        audio_data = b''.join(chunks)
+        if cache and len(audio_data) >= MIN_AUDIO_FILE_SIZE:  # Short responses are rejected by the caller
+            cache.put_bytes(gemini_cache_key(cache, self.config, text), ".pcm", audio_data, self.log)
+        return audio_data
+    
+    async def stream_audio(self, text: str, sink: WavSink, lookup: bool = True) -> int:
+        """Like generate_audio, but the audio goes to sink as it arrives; returns the bytes written"""
+        cache = get_synthesis_cache()
+        if lookup:
+            cached = self.stream_cached(text, sink)
+            if cached:
+                return cached
+        
+        await self._receive_audio(text, sink.write)
+        if cache and sink.data_bytes >= MIN_AUDIO_FILE_SIZE:  # Short responses are rejected by the caller
+            sink.flush()
+            cache.put_file(gemini_cache_key(cache, self.config, text), ".pcm", sink.part_path, offset=WAV_HEADER_SIZE,
+                           log=self.log)
+        return sink.data_bytes
+    
+    async def _receive_audio(self, text: str, write: Callable[[bytes], Any]):
+        """Send text on a fresh (or warm) Live session and pass each audio chunk to write"""
+        if self._live_config is None:
+            self._live_config = self._build_config()
+        config = self._live_config
         
         # FIXED: Chỉ gửi text thuần, system_instruction đã được đặt trong config
         # (Giống như cách Live_session.py xử lý)
@@ -1832,17 +4042,694 @@ class WorkerEngine:
             
         print(f"DEBUG [Worker {self.worker_id}] Sending: {input_text[:100]}...")
 
-        async with self.client.aio.live.connect(model=MODEL, config=config) as session:
-            await session.send(input=input_text, end_of_turn=True)
-            async for response in session.receive():
-                if data := response.data:
-                    chunks.append(data)
-        
-        return b''.join(chunks)
+        if self.warm_sessions <= 0:
+            async with self.client.aio.live.connect(model=MODEL, config=config) as session:
+                await session.send(input=input_text, end_of_turn=True)
+                async for response in session.receive():
+                    if data := response.data:
+                        write(data)
+        else:
+            if self.pool is None:
+                self.pool = WarmSessionPool.acquire(self.api_key, self.config, self.client, config,
+                                                    self.warm_sessions)
+            connection, session, warm = await self.pool.take()
+            try:
+                try:
+                    await session.send(input=input_text, end_of_turn=True)
+                except Exception:
+                    if not warm:
+                        raise
+                    # The idle socket was closed by the server - connect now instead
+                    connection, session = await self.pool.reopen(connection)
+                    await session.send(input=input_text, end_of_turn=True)
+                async for response in session.receive():
+                    if data := response.data:
+                        write(data)
+            finally:
+                await self.pool.discard(connection)
     
     def recreate_client(self):
         """Recreate client connection - useful after connection errors"""
         self._setup_client()
+        if self.pool is not None:
+            # Warm sockets of the old client may be stale; the pool refills itself
+            self.pool.client = self.client
+            asyncio.ensure_future(self.pool.flush())
+    
+    async def disconnect(self):
+        """Release the warm socket pool of the key (closed with its last worker)"""
+        if self.pool is not None:
+            await self.pool.release()
+            self.pool = None
+
+
+# =============================================================================
+# CHUNK SCHEDULING
+# =============================================================================
+
+def estimate_syllables(text: str) -> int:
+    """Syllable count used for synthesis time estimates (Vietnamese: one per word)"""
+    return len(text.split())
+
+
+def split_text_in_half(text: str) -> tuple:
+    """
+    Split text into two parts of similar length at the break point closest to the
+    middle - punctuation if one is within the middle half, otherwise a space.
+    Returns (first, second); second is empty if the text has no break point.
+    """
+    middle = len(text) // 2
+    best = -1
+    for match in re.finditer(r'[.!?,;:。！？，；：]\s', text):
+        pos = match.end()
+        if abs(pos - middle) <= len(text) // 4 and (best == -1 or abs(pos - middle) < abs(best - middle)):
+            best = pos
+    if best == -1:
+        left = text.rfind(' ', 0, middle + 1)
+        right = text.find(' ', middle)
+        candidates = [p for p in (left, right) if p > 0]
+        if not candidates:
+            return text, ""
+        best = min(candidates, key=lambda p: abs(p - middle))
+    return text[:best].strip(), text[best:].strip()
+
+
+class LongestFirstQueue(asyncio.Queue):
+    """
+    asyncio.Queue that hands out the job with the most syllables first
+    (longest-processing-time-first), so a long chunk never starts last and
+    becomes the straggler that sets the wall-clock time. Items need a `.text`;
+    FIFO order is kept between jobs of equal length.
+    """
+    
+    def __init__(self, maxsize: int = 0):
+        self._seq = itertools.count()
+        super().__init__(maxsize)
+    
+    def _init(self, maxsize):
+        self._queue = []
+    
+    def _put(self, item):
+        heapq.heappush(self._queue, (-estimate_syllables(item.text), next(self._seq), item))
+    
+    def _get(self):
+        return heapq.heappop(self._queue)[2]
+    
+    def pending_syllables(self) -> List[int]:
+        """Syllable counts of the jobs still waiting in the queue"""
+        return [-priority for priority, _, _ in self._queue]
+
+
+class SynthesisTimeModel:
+    """
+    Running estimate of synthesis time per request: overhead + seconds per syllable.
+    The per-syllable rate is tracked per worker (EWMA of observed latencies) with a
+    global rate as fallback for workers without history.
+    """
+    
+    def __init__(self, overhead: float = GEMINI_REQUEST_OVERHEAD_SECONDS,
+                 seconds_per_syllable: float = GEMINI_SECONDS_PER_SYLLABLE):
+        self.overhead = overhead
+        self.global_rate = seconds_per_syllable
+        self.worker_rates: Dict[int, float] = {}
+    
+    def observe(self, worker_id: int, syllables: int, elapsed: float, cached: bool = False):
+        """Record one successful request of `syllables` that took `elapsed` seconds"""
+        if cached:
+            # Served from the synthesis cache - says nothing about API latency
+            return
+        rate = max(elapsed - self.overhead, 0.0) / max(syllables, 1)
+        previous = self.worker_rates.get(worker_id, self.global_rate)
+        self.worker_rates[worker_id] = previous + LATENCY_EWMA_ALPHA * (rate - previous)
+        self.global_rate += LATENCY_EWMA_ALPHA * (rate - self.global_rate)
+    
+    def estimate(self, syllables: int, worker_id: Optional[int] = None) -> float:
+        """Estimated seconds for one request of `syllables` on `worker_id`"""
+        rate = self.worker_rates.get(worker_id, self.global_rate)
+        return self.overhead + syllables * rate
+    
+    def predict_makespan(self, syllable_counts: List[int], worker_ids: List[int]) -> float:
+        """
+        Predicted wall-clock time to run all jobs longest-first on the given
+        workers (each job goes to the worker that becomes free first).
+        """
+        if not worker_ids:
+            return 0.0
+        free_at = [(0.0, worker_id) for worker_id in worker_ids]
+        heapq.heapify(free_at)
+        for syllables in sorted(syllable_counts, reverse=True):
+            start, worker_id = heapq.heappop(free_at)
+            heapq.heappush(free_at, (start + self.estimate(syllables, worker_id), worker_id))
+        return max(t for t, _ in free_at)
+
+
+# =============================================================================
+# CUE BATCHING
+# =============================================================================
+# Short cues (1-3 words) spend most of their time on connect + first byte. With
+# cue batching several adjacent short cues are read in one request, one
+# sentence per cue, and the PCM is cut back into clips at the pauses between
+# them: frame energies (numpy) give the silent runs, and the cuts are the runs
+# closest to where each cue should end, judging by the syllable counts.
+
+@dataclass
+class CueBatch:
+    """Adjacent short cues synthesized by one request"""
+    cues: List[Subtitle]
+    
+    @property
+    def index(self) -> int:
+        return self.cues[0].index
+    
+    @property
+    def text(self) -> str:
+        # A sentence end after every cue makes the voice pause there
+        return "\n".join(sub.text if sub.text.rstrip()[-1:] in ".!?…" else sub.text.rstrip() + "."
+                         for sub in self.cues)
+
+
+def batch_short_cues(subtitles: Iterable[Subtitle], max_words: int = CUE_BATCH_MAX_WORDS,
+                     max_cues: int = CUE_BATCH_MAX_CUES) -> Iterator:
+    """Yield the subtitles in order, runs of short ones grouped into CueBatch items"""
+    def item(group: List[Subtitle]):
+        return group[0] if len(group) == 1 else CueBatch(group)
+    
+    group: List[Subtitle] = []
+    for sub in subtitles:
+        if estimate_syllables(sub.text) <= max_words:
+            group.append(sub)
+            if len(group) == max_cues:
+                yield item(group)
+                group = []
+            continue
+        if group:
+            yield item(group)
+            group = []
+        yield sub
+    if group:
+        yield item(group)
+
+
+def find_pause_cuts(samples, weights: List[int], sample_rate: int = RECEIVE_SAMPLE_RATE) -> Optional[List[int]]:
+    """
+    Sample positions where audio of len(weights) cues read in a row should be
+    cut, or None if there are not enough clear pauses near the expected places.
+    
+    weights: expected relative durations (syllables). Frames more than
+    CUE_BATCH_SILENCE_DB under the loud frames are silent; silent runs of at
+    least CUE_BATCH_MIN_PAUSE_MS inside the speech are candidates. The cuts
+    are chosen in order by dynamic programming over the candidates, trading
+    the distance to the expected boundary against the length of the pause.
+    A pause left unused that is as long as a chosen one makes the split
+    ambiguous (a long gap inside a cue): None, so the cues are read one by one.
+    """
+    import numpy as np
+    cuts_needed = len(weights) - 1
+    if cuts_needed <= 0:
+        return []
+    frame = max(1, sample_rate * CUE_BATCH_FRAME_MS // 1000)
+    frames = len(samples) // frame
+    if frames < 2 * len(weights):
+        return None
+    blocks = np.asarray(samples[:frames * frame], dtype=np.float32).reshape(frames, frame)
+    level = 10 * np.log10((blocks * blocks).mean(axis=1) + 1e-3)
+    voiced = level > np.percentile(level, 95) - CUE_BATCH_SILENCE_DB
+    voiced_frames = np.flatnonzero(voiced)
+    if len(voiced_frames) == 0:
+        return None
+    first, last = voiced_frames[0], voiced_frames[-1] + 1
+    
+    # Silent runs strictly inside the speech
+    edges = np.diff(np.concatenate(([0], (~voiced[first:last]).astype(np.int8), [0])))
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = run_ends - run_starts
+    long_enough = lengths >= max(1, CUE_BATCH_MIN_PAUSE_MS // CUE_BATCH_FRAME_MS)
+    centers = first + (run_starts + run_ends)[long_enough] / 2
+    lengths = lengths[long_enough]
+    if len(centers) < cuts_needed:
+        return None
+    
+    # cost[k, m]: candidate m as cut k (squared deviation in average cue lengths, minus the pause bonus)
+    shares = np.cumsum(np.asarray(weights, dtype=np.float64))
+    expected = first + (last - first) * shares[:-1] / shares[-1]
+    average = (last - first) / len(weights)
+    deviation = np.abs(centers[None, :] - expected[:, None]) / average
+    bonus = np.minimum(lengths * CUE_BATCH_FRAME_MS / CUE_BATCH_LONG_PAUSE_MS, 1.0)
+    cost = deviation ** 2 - bonus[None, :]
+    
+    # best[k, m]: cheapest cuts 0..k with cut k at candidate m (candidates strictly increasing)
+    best = np.full(cost.shape, np.inf)
+    came_from = np.zeros(cost.shape, dtype=np.int64)
+    best[0] = cost[0]
+    for k in range(1, cuts_needed):
+        # Cheapest cut k-1 among candidates before m: prefix minimum shifted by one
+        previous = np.concatenate(([np.inf], best[k - 1][:-1]))
+        prefix_best = np.minimum.accumulate(previous)
+        prefix_arg = np.maximum.accumulate(np.where(previous == prefix_best, np.arange(len(previous)), 0))
+        best[k] = cost[k] + prefix_best
+        came_from[k] = np.maximum(prefix_arg - 1, 0)
+    if not np.isfinite(best[-1]).any():
+        return None
+    chosen = [int(np.argmin(best[-1]))]
+    for k in range(cuts_needed - 1, 0, -1):
+        chosen.append(int(came_from[k][chosen[-1]]))
+    chosen.reverse()
+    if (deviation[np.arange(cuts_needed), chosen] > CUE_BATCH_MAX_DEVIATION).any():
+        return None
+    unused = np.delete(lengths, chosen)
+    if len(unused) and unused.max() >= lengths[chosen].min():
+        return None
+    return [int(centers[m]) * frame for m in chosen]
+
+
+def split_batch_audio(pcm: bytes, cues: List[Subtitle], sample_rate: int = RECEIVE_SAMPLE_RATE) -> Optional[List[bytes]]:
+    """The PCM of a CueBatch request cut into one piece per cue (None if it cannot be split reliably)"""
+    import numpy as np
+    samples = np.frombuffer(pcm[:len(pcm) // AUDIO_SAMPLE_WIDTH * AUDIO_SAMPLE_WIDTH], dtype='<i2')
+    cuts = find_pause_cuts(samples, [max(1, estimate_syllables(sub.text)) for sub in cues], sample_rate)
+    if cuts is None:
+        return None
+    bounds = [0] + [cut * AUDIO_SAMPLE_WIDTH for cut in cuts] + [len(samples) * AUDIO_SAMPLE_WIDTH]
+    pieces = [pcm[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+    if any(len(piece) < MIN_AUDIO_FILE_SIZE for piece in pieces):
+        return None
+    return pieces
+
+
+# =============================================================================
+# ADAPTIVE KEY RATE CONTROL
+# =============================================================================
+# Workers take a permit from their key's controller for every request. The
+# controller is a token bucket (requests per second) plus a concurrency limit,
+# both adapted AIMD-style: they grow additively while requests succeed in their
+# expected time, are halved on a rate-limit error and the key cools down.
+# It also keeps the key's health (success rate, latency, daily quota): a dead
+# key is quarantined until a probe request succeeds again.
+# =============================================================================
+
+class KeyRateController:
+    """Token bucket + AIMD concurrency limit + health of one API key"""
+    
+    _usage: Dict[str, list] = {}  # api_key -> [quota day, requests sent, daily quota used up] (kept across jobs)
+    
+    def __init__(self, api_key: str, concurrency: int, max_concurrency: int,
+                 rps: float = KEY_INITIAL_RPS, log=None):
+        self.api_key = api_key
+        self.log = log or (lambda message, level="INFO": None)
+        self.limit = float(max(1, concurrency))
+        self.max_limit = max(1, max_concurrency)
+        self.rps = rps
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.throttled = 0  # Rate-limit errors seen
+        self.error_streak = 0
+        self.cooldown_until = 0.0
+        self._cooldown = KEY_COOLDOWN_SECONDS
+        self._decreased_at = 0.0  # Requests started before the last cut don't cut again
+        self._refilled_at = time.monotonic()
+        self._finished = deque()  # End times of successful requests within KEY_RPS_WINDOW_SECONDS
+        self._changed = asyncio.Event()  # Replaced on every change; waiters hold the old one
+        self._outcomes = deque(maxlen=KEY_HEALTH_WINDOW)  # (succeeded, seconds) of the latest requests
+        self.quarantined = ""  # Why the key is out of the rotation ("" = in use)
+        self.quarantined_event = asyncio.Event()  # Set while quarantined (replaced on revival)
+        self.probe_at = 0.0
+        self.probing = False  # A probe item is on its way
+        self._quarantined_at = 0.0
+        self._probe_backoff = KEY_PROBE_SECONDS
+        if self._usage_today()[2]:
+            self.quarantine("hết quota ngày")
+    
+    @property
+    def label(self) -> str:
+        return f"...{self.api_key[-4:]}" if len(self.api_key) >= 4 else "****"
+    
+    def _wait_time(self, now: float) -> Optional[float]:
+        """Seconds until a permit can be granted (0 = now, None = until a request ends)"""
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        # Burst is bounded by the concurrency limit
+        self.tokens = min(max(1.0, self.limit), self.tokens + (now - self._refilled_at) * self.rps)
+        self._refilled_at = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rps
+    
+    def ready(self, now: Optional[float] = None) -> bool:
+        """Whether a permit would be granted right now"""
+        return self._wait_time(time.monotonic() if now is None else now) == 0.0
+    
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+    
+    async def acquire(self) -> float:
+        """Wait for a permit; returns the start time to pass to release()"""
+        while True:
+            now = time.monotonic()
+            wait = self._wait_time(now)
+            if wait == 0.0:
+                self.tokens -= 1.0
+                self.in_flight += 1
+                self._usage_today()[1] += 1
+                return now
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+    
+    def release(self, started: float, error: Optional[str] = None, expected: Optional[float] = None,
+                counted: bool = True):
+        """
+        End a request: grow the limits if it was healthy, cut them if the key is
+        throttled, quarantine the key if it is dead. counted=False: the request
+        was cancelled and says nothing about the key.
+        """
+        now = time.monotonic()
+        self.in_flight -= 1
+        # Requests sent before the key was quarantined are not its probe
+        probe = bool(self.quarantined) and started >= self._quarantined_at
+        if probe:
+            self.probing = False
+        if not counted:
+            self._signal()
+            return
+        self._outcomes.append((error is None, now - started))
+        if error is None:
+            self.error_streak = 0
+            self._cooldown = KEY_COOLDOWN_SECONDS
+            self._finished.append(now)
+            if expected is None or now - started <= expected * KEY_SLOW_FACTOR:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.rps = min(KEY_MAX_RPS, self.rps + KEY_RPS_INCREASE)
+            if probe:
+                self._revive()
+        elif is_dead_key_error(error):
+            if is_daily_quota_error(error):
+                self._usage_today()[2] = True
+            if started >= self._quarantined_at:  # Not a request sent before the key was quarantined
+                self.quarantine(error[:80])
+        else:
+            if is_rate_limit_error(error):
+                self.throttled += 1
+                self._throttle(started, now)
+            else:
+                self.error_streak += 1
+                if self.error_streak >= KEY_ERROR_STREAK:
+                    self.error_streak = 0
+                    self._throttle(started, now)
+            if probe:
+                self.quarantine(f"probe lỗi: {error[:60]}")
+            elif not self.quarantined and len(self._outcomes) >= KEY_HEALTH_MIN_SAMPLES \
+                    and self.success_rate() < KEY_MIN_SUCCESS_RATE:
+                self.quarantine(f"chỉ {self.success_rate():.0%} request thành công")
+        self._signal()
+    
+    def _signal(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    def quarantine(self, reason: str):
+        """Take the key out of the rotation until a probe after the (doubling) backoff succeeds"""
+        now = time.monotonic()
+        self.quarantined = reason or "lỗi"
+        self._quarantined_at = now
+        self.probe_at = now + self._probe_backoff
+        self.log(f"🚫 Key {self.label} tạm ngưng: {self.quarantined} - thử lại sau {self._probe_backoff:.0f}s", "WARNING")
+        self._probe_backoff = min(self._probe_backoff * 2, KEY_PROBE_MAX_SECONDS)
+        self.quarantined_event.set()
+    
+    def _revive(self):
+        self.quarantined = ""
+        self.quarantined_event = asyncio.Event()
+        self._probe_backoff = KEY_PROBE_SECONDS
+        self._outcomes.clear()  # The failures before the quarantine would quarantine it again
+        self.log(f"✅ Key {self.label} hoạt động lại", "SUCCESS")
+    
+    def _usage_today(self) -> list:
+        day = quota_day()
+        usage = KeyRateController._usage.get(self.api_key)
+        if usage is None or usage[0] != day:
+            usage = KeyRateController._usage[self.api_key] = [day, 0, False]
+        return usage
+    
+    def remaining_quota(self) -> Optional[int]:
+        """Requests left of today's quota (None = unknown)"""
+        _, used, exhausted = self._usage_today()
+        if exhausted:
+            return 0
+        if not KEY_DAILY_QUOTA:
+            return None
+        return max(0, KEY_DAILY_QUOTA - used)
+    
+    def success_rate(self) -> float:
+        """Share of the latest requests that succeeded (1.0 before any)"""
+        if not self._outcomes:
+            return 1.0
+        return sum(1 for succeeded, _ in self._outcomes if succeeded) / len(self._outcomes)
+    
+    def latency(self) -> tuple:
+        """(p50, p95) seconds of the latest successful requests ((None, None) before any)"""
+        times = sorted(seconds for succeeded, seconds in self._outcomes if succeeded)
+        if not times:
+            return None, None
+        return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.95))]
+    
+    def score(self) -> float:
+        """
+        Expected good requests per second: concurrency limit × success rate /
+        latency (p50 plus half the tail to p95), scaled down while less than
+        KEY_QUOTA_LOW requests are left today. 0 while quarantined.
+        """
+        if self.quarantined:
+            return 0.0
+        p50, p95 = self.latency()
+        latency = p50 + (p95 - p50) / 2 if p50 is not None else 1.0  # Untried keys are tried first
+        score = self.limit * self.success_rate() / max(latency, 0.001)
+        remaining = self.remaining_quota()
+        if remaining is not None:
+            score *= min(1.0, remaining / KEY_QUOTA_LOW)
+        return score
+    
+    def health(self) -> str:
+        p50, p95 = self.latency()
+        text = f"{self.success_rate():.0%} OK"
+        if p50 is not None:
+            text += f", p50 {p50:.1f}s / p95 {p95:.1f}s"
+        remaining = self.remaining_quota()
+        if remaining is not None:
+            text += f", còn {remaining} request hôm nay"
+        return text
+    
+    def _throttle(self, started: float, now: float):
+        """Multiplicative decrease (once per window of requests) and a cool-down"""
+        if started >= self._decreased_at:
+            self.limit = max(1.0, self.limit * KEY_DECREASE_FACTOR)
+            self.rps = max(KEY_MIN_RPS, self.rps * KEY_DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+            self._decreased_at = now
+        self.cooldown_until = max(self.cooldown_until, now + self._cooldown)
+        self._cooldown = min(self._cooldown * 2, MAX_RETRY_DELAY)
+    
+    def measured_rps(self) -> float:
+        """Successful requests per second over the last KEY_RPS_WINDOW_SECONDS"""
+        horizon = time.monotonic() - KEY_RPS_WINDOW_SECONDS
+        while self._finished and self._finished[0] < horizon:
+            self._finished.popleft()
+        return len(self._finished) / KEY_RPS_WINDOW_SECONDS
+    
+    def permit(self, expected: Optional[float] = None) -> "KeyPermit":
+        """async with controller.permit(): one request (an exception = failed request)"""
+        return KeyPermit(self, expected)
+    
+    def status(self) -> str:
+        text = f"{self.label}: {self.measured_rps():.1f} req/s, {self.in_flight}/{int(self.limit)} đang gửi"
+        if self.quarantined:
+            text += " (tạm ngưng)"
+        elif self.cooldown_until > time.monotonic():
+            text += " (tạm nghỉ)"
+        return text
+
+
+class KeyPermit:
+    """One request on a key: acquired on enter, released with its outcome on exit"""
+    
+    def __init__(self, controller: KeyRateController, expected: Optional[float] = None):
+        self.controller = controller
+        self.expected = expected
+        self._started = None
+    
+    async def __aenter__(self):
+        self._started = await self.controller.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, (KeyStolen, asyncio.CancelledError)):
+            self.controller.release(self._started, counted=False)
+            return False
+        error = None if exc_type is None else str(exc) or exc_type.__name__
+        self.controller.release(self._started, error, self.expected)
+        return False
+
+
+class KeyRateLimiter:
+    """The KeyRateControllers of a job's API keys"""
+    
+    def __init__(self, api_keys: List[str], concurrency: int, max_concurrency: int, log=None):
+        self.controllers = {api_key: KeyRateController(api_key, concurrency, max_concurrency, log=log)
+                            for api_key in api_keys}
+    
+    def __getitem__(self, api_key: str) -> KeyRateController:
+        return self.controllers[api_key]
+    
+    def total_limit(self) -> int:
+        """Requests that may be in flight over all keys right now"""
+        return sum(int(controller.limit) for controller in self.controllers.values())
+    
+    def summary(self) -> str:
+        return " | ".join(controller.status() for controller in self.controllers.values())
+    
+    async def report(self, log, interval: float = KEY_STATS_LOG_SECONDS):
+        """Log req/s and concurrency of every key periodically (cancel to stop)"""
+        while True:
+            await asyncio.sleep(interval)
+            log(f"📶 {self.summary()}", "INFO")
+
+
+class KeyStolen(Exception):
+    """A request cancelled because its key was quarantined - the item goes to another key"""
+
+
+class KeyScheduler:
+    """
+    Central dispatch of a job's items over its keys. Workers stay on one key
+    (its engine and sessions) and ask for their turn before taking an item:
+    the turn goes to the best-scored key that can send now. A failing key's
+    items are handed back (rerouted) for the other keys' workers; a
+    quarantined key only gets a probe item now and then.
+    
+    When no other key is usable, a failing key keeps its items and retries
+    them as before, so a job whose keys are all down still ends.
+    """
+    
+    def __init__(self, limiter: KeyRateLimiter):
+        self.limiter = limiter
+        self.workers = {api_key: 0 for api_key in limiter.controllers}  # Running workers per key
+        self.busy = {api_key: 0 for api_key in limiter.controllers}  # Workers holding an item
+        self.rerouted = deque()  # (item, moves) handed back by a failing key
+        self.stolen = 0
+        self._changed = asyncio.Event()
+    
+    def _signal(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    def join(self, api_key: str):
+        self.workers[api_key] += 1
+    
+    def leave(self, api_key: str):
+        self.workers[api_key] -= 1
+        self._signal()
+    
+    def start(self, controller: KeyRateController) -> bool:
+        """A worker of the key took an item; returns whether it is the probe of a quarantined key"""
+        self.busy[controller.api_key] += 1
+        if controller.quarantined and not controller.probing:
+            controller.probing = True
+            return True
+        return False
+    
+    def finish(self, controller: KeyRateController):
+        self.busy[controller.api_key] -= 1
+        self._signal()
+    
+    def served_from_cache(self, controller: KeyRateController, probe: bool):
+        """The item needed no request (synthesis cache hit): if it was the key's probe, the probe is still due"""
+        if probe:
+            controller.probing = False
+            self._signal()
+    
+    def _others_usable(self, controller: KeyRateController) -> bool:
+        """Whether another key with running workers is neither quarantined nor cooling down"""
+        return any(other is not controller and self.workers[api_key] > 0
+                   and not other.quarantined and not other.cooling_down()
+                   for api_key, other in self.limiter.controllers.items())
+    
+    def is_turn(self, controller: KeyRateController) -> bool:
+        """Whether a worker of the key should take the next item now"""
+        now = time.monotonic()
+        if controller.quarantined and self._others_usable(controller):
+            # Out of the rotation: one item at a time as a probe once it is due
+            return not controller.probing and now >= controller.probe_at and controller.ready(now)
+        if not controller.ready(now):
+            return False
+        score = controller.score()
+        for api_key, other in self.limiter.controllers.items():
+            if (other is not controller and self.workers[api_key] > self.busy[api_key]
+                    and other.score() > score and other.ready(now)):
+                return False  # A better key has an idle worker
+        return True
+    
+    async def wait_turn(self, controller: KeyRateController, timeout: float = 1.0) -> bool:
+        """Wait for the key's turn (False after timeout - check whether work is left and ask again)"""
+        deadline = time.monotonic() + timeout
+        while not self.is_turn(controller):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                # Polled too: token refills and cool-downs end without an event
+                await asyncio.wait_for(self._changed.wait(), timeout=min(remaining, 0.25))
+            except asyncio.TimeoutError:
+                pass
+        return True
+    
+    def take_rerouted(self) -> tuple:
+        """(item, moves) handed back by another key, or (None, 0)"""
+        return self.rerouted.popleft() if self.rerouted else (None, 0)
+    
+    def can_steal(self, controller: KeyRateController, moves: int = 0) -> bool:
+        """Whether an item that just failed on the key should go to another key"""
+        if not (controller.quarantined or controller.cooling_down()):
+            return False  # A single failure of a healthy key is retried on it
+        return moves < len(self.workers) and self._others_usable(controller)
+    
+    def reroute(self, item, moves: int):
+        self.rerouted.append((item, moves + 1))
+        self.stolen += 1
+        self._signal()
+    
+    async def send(self, controller: KeyRateController, request: Awaitable, moves: int = 0,
+                   probe: bool = False):
+        """
+        Await a request on the key. If the key is quarantined (before or while
+        it is sent) and another key can take over, the request is cancelled
+        (KeyStolen) - except the key's probe.
+        """
+        if controller.quarantined:
+            if not probe and self.can_steal(controller, moves):
+                request.close()  # Taken before the key was quarantined - not sent
+                raise KeyStolen(f"Key {controller.label} tạm ngưng: {controller.quarantined}")
+            return await request
+        task = asyncio.ensure_future(request)
+        watcher = asyncio.ensure_future(controller.quarantined_event.wait())
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and self.can_steal(controller, moves):
+                task.cancel()
+                raise KeyStolen(f"Key {controller.label} tạm ngưng: {controller.quarantined}")
+            return await task
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+
+
+def worker_limits(config: TTSConfig) -> tuple:
+    """(initial, maximum) concurrency per key: workers_per_key growing up to KEY_MAX_CONCURRENCY"""
+    if not config.multi_worker_enabled:
+        return 1, 1
+    return config.workers_per_key, max(config.workers_per_key, KEY_MAX_CONCURRENCY)
 
 
 # =============================================================================
@@ -1860,76 +4747,316 @@ class MultiThreadProcessor:
         self.on_audio_generated = audio_callback
         
         self.task_queue: asyncio.Queue = None
-        self.results: Dict[int, bool] = {}
+        self.table = ChunkTable()  # per-subtitle status (done/failed)
         self.is_running = False
+        self._producer_done = True  # False while a subtitle file is still being parsed
+        self._native_rate = False  # Dubbing: save clips at the model rate, speed is applied by the renderer
+        self._cues_complete = False  # Every cue of the input is in the table (orphan clips can be pruned)
+        self.manifest: Optional[ClipManifest] = None
+        self.reused = 0  # Cues whose clip from an earlier run is still current
+        self._unbatched: deque = deque()  # Cues of CueBatch items that could not be split, synthesized one by one
+        self.requests = 0  # generate_audio calls (cue batching: requests per cue)
+        self.failed_batches = 0
+        self._active_workers = 0
+        self._started_at = 0.0
+        self.limiter: Optional[KeyRateLimiter] = None
+        self.scheduler: Optional[KeyScheduler] = None
         
         self.total_tasks = 0
         self.completed_tasks = 0
         self.lock = asyncio.Lock()
+        self.time_model = SynthesisTimeModel()
     
     def _get_total_workers(self) -> int:
         """Calculate total number of workers based on config"""
-        if self.config.multi_worker_enabled:
-            return len(self.api_keys) * self.config.workers_per_key
-        return len(self.api_keys)
+        return len(self.api_keys) * worker_limits(self.config)[1]
+    
+    def _log_key_limits(self):
+        """Final concurrency / rate / health of every key and how often it was rate-limited"""
+        for controller in self.limiter.controllers.values():
+            self.log(f"📶 Key {controller.label}: {int(controller.limit)} luồng, {controller.rps:.1f} req/s cho phép, "
+                     f"{controller.throttled} lần bị giới hạn (429), {controller.health()}", "INFO")
+        if self.scheduler.stolen:
+            self.log(f"🔀 {self.scheduler.stolen} lần chuyển việc từ key lỗi sang key khác", "INFO")
     
     def _get_worker_assignments(self) -> List[tuple]:
         """
-        Get list of (worker_id, api_key) tuples.
-        If multi-worker is enabled, same key is assigned to multiple workers.
+        Get list of (worker_id, api_key) tuples, keys taken in turn.
+        Each key gets as many workers as its KeyRateController may ever allow
+        (see worker_limits); they take a permit from it for every request.
         """
         assignments = []
         worker_id = 0
-        
-        if self.config.multi_worker_enabled:
-            for api_key in self.api_keys:
-                for _ in range(self.config.workers_per_key):
-                    assignments.append((worker_id, api_key))
-                    worker_id += 1
-        else:
+        _, per_key = worker_limits(self.config)
+        for _ in range(per_key):
             for api_key in self.api_keys:
                 assignments.append((worker_id, api_key))
                 worker_id += 1
         
         return assignments
     
-    async def process_all(self, subtitles: List[Subtitle], output_dir: Path, prefix: str):
+    async def process_all(self, subtitles: Iterable[Subtitle], output_dir: Path, prefix: str,
+                          dub_output: Optional[str] = None):
+        """
+        Synthesize subtitles into <index>_<prefix>.wav files in output_dir.
+        
+        A list is queued at once (longest-first over all cues). Any other iterable,
+        e.g. iter_subtitle_file(), is streamed: cues are parsed in batches off the
+        event loop into a bounded queue, so synthesis starts with the first cues
+        and the queue stays small however many cues the file has.
+        
+        dub_output: also render all clips on their cue times into this one WAV
+        (clips are then saved at the native rate and speed is applied pitch-preserving).
+        
+        Re-running an edited SRT into the same folder is incremental: the clip
+        manifest (_<prefix>_manifest.json) skips cues whose text and voice
+        settings are unchanged, deletes clips of removed cues and lets the dub
+        track be re-rendered only where clips changed.
+        """
         if not self.api_keys:
             self.log("❌ No API keys!", "ERROR")
             return
         
         self.is_running = True
-        self.total_tasks = len(subtitles)
+        self._native_rate = dub_output is not None
         self.completed_tasks = 0
-        self.results = {}
-        
-        self.task_queue = asyncio.Queue()
-        for sub in subtitles:
-            await self.task_queue.put(sub)
+        path_for = lambda index: str(output_dir / f"{index:04d}_{prefix}.wav")
+        self.manifest = ClipManifest(str(output_dir / f"_{prefix}_manifest.json"), self._clip_voice_key())
+        self.reused = 0
+        self._cues_complete = False
+        self._unbatched.clear()
+        self.requests = self.failed_batches = 0
         
         # Get worker assignments
         worker_assignments = self._get_worker_assignments()
         total_workers = len(worker_assignments)
+        self._active_workers = total_workers
+        self.limiter = KeyRateLimiter(self.api_keys, *worker_limits(self.config), log=self.log)
+        self.scheduler = KeyScheduler(self.limiter)
+        self._started_at = time.perf_counter()
+        
+        producer = None
+        predicted = None
+        if isinstance(subtitles, list):
+            self.total_tasks = len(subtitles)
+            self.table = ChunkTable.from_subtitles(subtitles, path_for)
+            
+            # Longest-first dispatch; output files are named by index so order is kept
+            self.task_queue = LongestFirstQueue()
+            for item in self._batched([sub for sub in subtitles if not self._reuse_clip(sub)]):
+                await self.task_queue.put(item)
+            self._producer_done = True
+            self._cues_complete = True
+            if self.reused:
+                self.log(f"♻️ {self.reused}/{self.total_tasks} cue không đổi - dùng lại clip cũ", "INFO")
+                self.update_progress(self.completed_tasks / self.total_tasks * 100)
+            
+            predicted = self.time_model.predict_makespan(
+                self.task_queue.pending_syllables(), list(range(self.limiter.total_limit()))
+            )
+        else:
+            self.total_tasks = 0
+            self.table = ChunkTable(path_for, with_times=True)
+            # Bounded queue - the parser only stays a few cues ahead of the workers
+            self.task_queue = LongestFirstQueue(maxsize=total_workers * CHUNK_QUEUE_AHEAD_PER_WORKER)
+            self._producer_done = False
+            producer = asyncio.create_task(self._produce_subtitles(iter(subtitles)))
+        
+        cache = get_synthesis_cache()
+        cache_since = cache.snapshot() if cache else None
         
         # Log startup info
         if self.config.multi_worker_enabled:
-            self.log(f"🚀 Multi-Worker Mode: {len(self.api_keys)} API key(s) × {self.config.workers_per_key} worker(s) = {total_workers} total workers", "INFO")
-        else:
+            initial, maximum = worker_limits(self.config)
+            self.log(f"🚀 Multi-Worker Mode: {len(self.api_keys)} API key(s) × {initial}→{maximum} worker(s) "
+                     f"(tự điều chỉnh theo rate limit của từng key)", "INFO")
+        elif producer is None:
             self.log(f"🚀 Starting {total_workers} workers for {self.total_tasks} subtitles", "INFO")
+        else:
+            self.log(f"🚀 Starting {total_workers} workers (streaming subtitles)", "INFO")
         
         # Create workers
         workers = [
             asyncio.create_task(self._worker(worker_id, api_key, output_dir, prefix))
             for worker_id, api_key in worker_assignments
         ]
+        reporter = asyncio.create_task(self.limiter.report(self.log))
+        
+        if predicted is not None:
+            self.log(f"⏱️ Predicted makespan: ~{predicted:.0f}s (longest-first)", "INFO")
         
         await asyncio.gather(*workers)
+        reporter.cancel()
         
-        successful = sum(1 for v in self.results.values() if v)
+        if producer is not None:
+            # Workers only exit early on stop/crash - don't leave the producer blocked on the queue
+            if not producer.done():
+                producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                self.log(f"❌ Lỗi đọc file phụ đề: {e}", "ERROR")
+        
+        successful = self.table.count(ChunkTable.DONE)
+        finished = successful + self.table.count(ChunkTable.FAILED)
+        makespan = f"⏱️ Makespan: {time.perf_counter() - self._started_at:.1f}s"
+        if predicted is not None:
+            makespan += f" (predicted ~{predicted:.0f}s)"
         self.log(f"\n{'='*50}", "INFO")
-        self.log(f"✅ Done! Success: {successful}/{len(self.results)}", "SUCCESS")
+        self.log(f"✅ Done! Success: {successful}/{finished}", "SUCCESS")
+        self.log(makespan, "INFO")
+        self._log_key_limits()
+        if cache:
+            self.log(cache.summary(since=cache_since), "INFO")
+        if self.config.cue_batching:
+            synthesized = max(1, finished - self.reused)
+            self.log(f"📦 Gộp cue: {self.requests} request cho {synthesized} cue ({self.requests / synthesized:.2f} request/cue), "
+                     f"{self.failed_batches} nhóm không tách được -> đọc từng cue", "INFO")
+        
+        if self._cues_complete and self.is_running:
+            removed = self.manifest.prune(self.table.index)
+            if removed:
+                self.log(f"🗑️ Đã xóa {removed} clip của cue không còn trong phụ đề", "INFO")
+        
+        if dub_output and self.is_running and successful:
+            await self._render_dub(dub_output)
+        self.manifest.save(self.log)
+    
+    def _clip_voice_key(self) -> list:
+        """Settings that change a clip - speed too, unless the dub renderer applies it"""
+        return [MODEL, self.config.voice, self.config.system_instruction, self.config.keep_voice_beta,
+                self.config.thinking_mode, self.config.thinking_budget if self.config.thinking_mode else 0,
+                self.config.affective_dialog, self.config.proactive_audio,
+                "native" if self._native_rate else self.config.speed]
+    
+    def _batched(self, subtitles: List[Subtitle]) -> Iterable:
+        """Queue items: the subtitles, with runs of short ones packed into CueBatch items if enabled"""
+        return batch_short_cues(subtitles) if self.config.cue_batching else subtitles
+    
+    def _clip_rate(self) -> int:
+        """Sample rate written in clip headers (speed is applied through it unless the dub renderer does)"""
+        # --- SPEED PROCESSING ---
+        if self._native_rate:
+            return RECEIVE_SAMPLE_RATE
+        return int(RECEIVE_SAMPLE_RATE * self.config.speed)
+    
+    def _save_clip(self, worker_id: int, subtitle: Subtitle, audio_data: bytes, attempt: int,
+                   output_dir: Path, prefix: str):
+        """Write one cue clip and mark it done"""
+        final_rate = self._clip_rate()
+        output_file = output_dir / f"{subtitle.index:04d}_{prefix}.wav"
+        save_wave_file(str(output_file), audio_data, rate=final_rate)
+        duration_ms = len(audio_data) / (final_rate * AUDIO_SAMPLE_WIDTH) * 1000
+        self._clip_saved(worker_id, subtitle, str(output_file), duration_ms, attempt)
+    
+    def _clip_saved(self, worker_id: int, subtitle: Subtitle, output_file: str, duration_ms: float,
+                    attempt: int):
+        """Record a written cue clip and mark it done"""
+        self.manifest.record(subtitle.index, subtitle.text, output_file)
+        
+        status_msg = f"✅ W{worker_id} [{subtitle.index:04d}] ({duration_ms:.0f}ms)"
+        if self.config.speed != 1.0:
+             status_msg += f" [x{self.config.speed:.1f}]"
+        if attempt > 1:
+            status_msg += f" [Retry {attempt-1}]"
+            
+        self.log(status_msg, "SUCCESS")
+        
+        self.table.mark_done(subtitle.index, attempts=attempt)
+        
+        self.on_audio_generated(GeneratedAudio(
+            index=subtitle.index,
+            file_path=output_file,
+            text=subtitle.text,
+            duration_ms=duration_ms
+        ))
+    
+    def _unbatch(self, worker_id: int, batch: CueBatch, reason: str):
+        """Hand the cues of a batch back to the workers one by one"""
+        self.failed_batches += 1
+        self._unbatched.extend(batch.cues)
+        self.log(f"✂️ W{worker_id} [{batch.index:04d}+{len(batch.cues) - 1}] {reason} - đọc lại từng cue", "WARNING")
+    
+    def _reuse_clip(self, sub: Subtitle) -> bool:
+        """Mark a cue done without synthesis if its clip from an earlier run is still current"""
+        if not self.manifest.is_current(sub.index, sub.text, self.table.path_for(sub.index)):
+            return False
+        self.table.mark_done(sub.index, attempts=0)
+        self.reused += 1
+        self.completed_tasks += 1
+        return True
+    
+    async def _render_dub(self, dub_output: str):
+        """Render the finished clips on the cue timeline into dub_output"""
+        self.log("🎬 Đang ghép timeline lồng tiếng...", "INFO")
+        previous = self.manifest.extra.get("dub") or {}
+        previous_layout = previous.get("layout") if previous.get("output") == dub_output else None
+        try:
+            cues = [(cue_time_to_ms(start), cue_time_to_ms(end), path)
+                    for start, end, path in self.table.timed_rows()]
+            report = await asyncio.to_thread(render_dub_track, cues, dub_output, self.config.speed,
+                                             previous_layout=previous_layout)
+        except Exception as e:
+            self.manifest.extra.pop("dub", None)  # The track may be half written - render it all next time
+            self.log(f"❌ Lỗi ghép timeline: {e}", "ERROR")
+            return
+        self.manifest.extra["dub"] = {"output": dub_output, "layout": report.layout}
+        self.log(f"🎬 Timeline: {report.cues} cues, {report.stretched} tăng tốc cho vừa, "
+                 f"{report.overflowed} tràn sang cue sau, {report.missing} thiếu audio", "INFO")
+        if report.rerendered_ms < report.duration_ms:
+            self.log(f"♻️ Chỉ render lại {report.rerendered_ms / 1000:.1f}s đã thay đổi", "INFO")
+        self.log(f"✅ Đã tạo track lồng tiếng ({report.duration_ms / 1000:.1f}s): {dub_output}", "SUCCESS")
+        if DUB_TIMING_EXPORT and report.layout:
+            timing_file = os.path.splitext(dub_output)[0] + f".{DUB_TIMING_EXPORT}"
+            texts = {os.path.abspath(path): text for text, path, _ in self.table.done_rows()}
+            try:
+                count = await asyncio.to_thread(write_dub_timings, report.layout, texts,
+                                                timing_file, DUB_TIMING_EXPORT)
+                self.log(f"⏱️ Timing lồng tiếng: {count} cues -> {timing_file}", "INFO")
+            except Exception as e:
+                self.log(f"⚠️ Không ghi được timing lồng tiếng: {e}", "WARNING")
+    
+    async def _produce_subtitles(self, subtitles: Iterator[Subtitle]):
+        """Parse cues in batches (blocking file I/O off the event loop) and feed the task queue"""
+        try:
+            while self.is_running:
+                batch = await asyncio.to_thread(list, itertools.islice(subtitles, SUBTITLE_READ_BATCH))
+                if not batch:
+                    break
+                pending = []
+                for sub in batch:
+                    self.total_tasks += 1
+                    self.table.append(sub.index, sub.text, start_time=sub.start_time, end_time=sub.end_time)
+                    if not self._reuse_clip(sub):
+                        pending.append(sub)
+                for item in self._batched(pending):
+                    # Bounded queue: waits here while workers are busy (flat memory)
+                    await self.task_queue.put(item)
+            
+            if self.is_running:
+                self._cues_complete = True
+                if self.reused:
+                    self.log(f"♻️ {self.reused}/{self.total_tasks} cue không đổi - dùng lại clip cũ", "INFO")
+                # All cues are known now - predict when the remaining queue will be done
+                elapsed = time.perf_counter() - self._started_at
+                remaining = self.time_model.predict_makespan(
+                    self.task_queue.pending_syllables(),
+                    list(range(min(self._active_workers, self.limiter.total_limit())))
+                )
+                self.log(f"📄 Đã đọc hết {self.total_tasks} phụ đề", "INFO")
+                self.log(f"⏱️ Predicted makespan: ~{elapsed + remaining:.0f}s (longest-first)", "INFO")
+        finally:
+            self._producer_done = True
+    
+    def _no_more_work(self) -> bool:
+        return (self.task_queue.empty() and self._producer_done and not self._unbatched
+                and not self.scheduler.rerouted)
     
     async def _worker(self, worker_id: int, api_key: str, output_dir: Path, prefix: str):
+        engine = None
+        self.scheduler.join(api_key)
         try:
             key_preview = f"...{api_key[-4:]}" if len(api_key) >= 4 else "****"
             
@@ -1939,23 +5066,39 @@ class MultiThreadProcessor:
                 await engine.connect()
                 self.log(f"📞 Worker {worker_id} (Key: {key_preview}) started", "INFO")
             else:
-                engine = WorkerEngine(worker_id, api_key, self.config)
+                engine = WorkerEngine(worker_id, api_key, self.config, log_callback=self.log)
                 self.log(f"🔧 Worker {worker_id} (Key: {key_preview}) started", "INFO")
             
+            controller = self.limiter[api_key]
             consecutive_errors = 0
             max_consecutive_errors = 3
             
             while self.is_running:
-                try:
-                    subtitle = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    if self.task_queue.empty():
+                # Items go to the best key that can send now (see KeyScheduler)
+                if not await self.scheduler.wait_turn(controller):
+                    if self._no_more_work():
                         break
                     continue
+                subtitle, moves = self.scheduler.take_rerouted()
+                from_queue = False
+                if subtitle is None and self._unbatched:
+                    subtitle = self._unbatched.popleft()
+                elif subtitle is None:
+                    from_queue = True
+                    try:
+                        subtitle = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        if self._no_more_work():
+                            break
+                        continue
+                # Cues finished by this item (0 if a batch is handed back cue by cue)
+                finished_cues = len(subtitle.cues) if isinstance(subtitle, CueBatch) else 1
                 
                 if not self.is_running:
-                    await self.task_queue.put(subtitle)
+                    # Don't put it back: in streaming mode the queue is bounded and
+                    # the producer may hold the free slot
                     break
+                probe = self.scheduler.start(controller)
                 
                 # --- ENHANCED RETRY LOGIC ---
                 success = False
@@ -1963,52 +5106,72 @@ class MultiThreadProcessor:
                 
                 for attempt in range(1, MAX_RETRIES + 1):
                     try:
-                        audio_data = await engine.generate_audio(subtitle.text)
-                        
-                        if not audio_data:
-                            raise ValueError("Received 0 bytes (No Audio) - Connection issue likely")
-                        
-                        if len(audio_data) < MIN_AUDIO_FILE_SIZE:
-                            raise ValueError(f"Audio too short ({len(audio_data)} bytes) - May be incomplete")
-                        
-                        # --- SPEED PROCESSING ---
-                        final_rate = int(RECEIVE_SAMPLE_RATE * self.config.speed)
-                        
-                        output_file = output_dir / f"{subtitle.index:04d}_{prefix}.wav"
-                        
-                        save_wave_file(str(output_file), audio_data, rate=final_rate)
-                        
-                        duration_ms = len(audio_data) / (final_rate * AUDIO_SAMPLE_WIDTH) * 1000
+                        syllables = estimate_syllables(subtitle.text)
+                        request_started = time.perf_counter()
+                        # Cache hits are served before taking a permit: they use no token, quota or key health
+                        if isinstance(subtitle, CueBatch):
+                            # Split at the pauses between cues - needs the whole audio
+                            audio_data = engine.cached_audio(subtitle.text)
+                            cached = audio_data is not None
+                            if not cached:
+                                async with controller.permit(self.time_model.estimate(syllables, worker_id)):
+                                    request_started = time.perf_counter()
+                                    self.requests += 1
+                                    audio_data = await self.scheduler.send(
+                                        controller, engine.generate_audio(subtitle.text, lookup=False), moves, probe)
+                            check_audio_size(len(audio_data) if audio_data else 0)
+                        else:
+                            # Written to the clip file as it arrives
+                            with WavSink(str(output_dir / f"{subtitle.index:04d}_{prefix}.wav"), rate=self._clip_rate()) as sink:
+                                cached = engine.stream_cached(subtitle.text, sink) > 0
+                                if not cached:
+                                    async with controller.permit(self.time_model.estimate(syllables, worker_id)):
+                                        request_started = time.perf_counter()
+                                        self.requests += 1
+                                        await self.scheduler.send(
+                                            controller, engine.stream_audio(subtitle.text, sink, lookup=False), moves, probe)
+                                check_audio_size(sink.data_bytes)
+                        if cached:
+                            self.scheduler.served_from_cache(controller, probe)
                         
-                        status_msg = f"✅ W{worker_id} [{subtitle.index:04d}] ({duration_ms:.0f}ms)"
-                        if self.config.speed != 1.0:
-                             status_msg += f" [x{self.config.speed:.1f}]"
-                        if attempt > 1:
-                            status_msg += f" [Retry {attempt-1}]"
-                            
-                        self.log(status_msg, "SUCCESS")
+                        self.time_model.observe(worker_id, syllables, time.perf_counter() - request_started, cached)
                         
-                        self.results[subtitle.index] = True
+                        if isinstance(subtitle, CueBatch):
+                            pieces = split_batch_audio(audio_data, subtitle.cues)
+                            if pieces is None:
+                                self._unbatch(worker_id, subtitle, "không tách được audio theo khoảng lặng")
+                                finished_cues = 0
+                            else:
+                                for cue, piece in zip(subtitle.cues, pieces):
+                                    self._save_clip(worker_id, cue, piece, attempt, output_dir, prefix)
+                        else:
+                            self._clip_saved(worker_id, subtitle, sink.path, sink.duration_ms, attempt)
                         success = True
                         consecutive_errors = 0  # Reset error counter on success
-                        
-                        self.on_audio_generated(GeneratedAudio(
-                            index=subtitle.index,
-                            file_path=str(output_file),
-                            text=subtitle.text,
-                            duration_ms=duration_ms
-                        ))
                         break 
                         
                     except Exception as e:
                         last_error = str(e)
                         is_conn_error = is_connection_error(last_error)
                         
+                        if self.scheduler.can_steal(controller, moves):
+                            # The key is failing - another key's worker takes the item now
+                            self.log(f"🔀 W{worker_id} [{subtitle.index:04d}] Key {controller.label} lỗi ({last_error[:60]}) - chuyển sang key khác", "WARNING")
+                            self.scheduler.reroute(subtitle, moves)
+                            finished_cues = 0
+                            break
+                        
                         if attempt < MAX_RETRIES:
                             delay = calculate_retry_delay(attempt, is_conn_error)
                             
                             # Log retry with appropriate detail
-                            if is_conn_error:
+                            if is_rate_limit_error(last_error):
+                                delay = 0.0  # The key's controller holds requests back (cool-down, lower rate)
+                                self.log(
+                                    f"🚦 W{worker_id} [{subtitle.index:04d}] Key {controller.label} bị giới hạn (attempt {attempt}/{MAX_RETRIES}) - giảm tốc key: {controller.status()}", 
+                                    "WARNING"
+                                )
+                            elif is_conn_error:
                                 self.log(
                                     f"⚠️ W{worker_id} [{subtitle.index:04d}] Connection issue (attempt {attempt}/{MAX_RETRIES}): {last_error[:50]}... Retry in {delay:.1f}s", 
                                     "WARNING"
@@ -2027,15 +5190,20 @@ class MultiThreadProcessor:
                                 )
                             
                             await asyncio.sleep(delay)
+                        elif isinstance(subtitle, CueBatch):
+                            self._unbatch(worker_id, subtitle, f"FAILED after {MAX_RETRIES} attempts: {last_error[:80]}")
+                            finished_cues = 0
+                            consecutive_errors += 1
                         else:
                             self.log(f"❌ W{worker_id} [{subtitle.index:04d}] FAILED after {MAX_RETRIES} attempts: {last_error}", "ERROR")
-                            self.results[subtitle.index] = False
+                            self.table.mark_failed(subtitle.index, attempts=attempt)
+                            self.manifest.discard(subtitle.index)  # Its clip, if any, has the old text
                             consecutive_errors += 1
                 
                 # Check for too many consecutive errors (might indicate API key issue)
                 if consecutive_errors >= max_consecutive_errors:
-                    self.log(f"⚠️ W{worker_id} Too many consecutive errors - pausing for 30s...", "WARNING")
-                    await asyncio.sleep(30)
+                    # The key's controller has already cooled it down (KEY_ERROR_STREAK) for all its workers
+                    self.log(f"⚠️ W{worker_id} Too many consecutive errors - {controller.status()}", "WARNING")
                     consecutive_errors = 0
                     # Recreate client/session dựa trên engine type
                     if self.config.live_session_enabled and hasattr(engine, 'recreate_session'):
@@ -2043,18 +5211,26 @@ class MultiThreadProcessor:
                     elif hasattr(engine, 'recreate_client'):
                         engine.recreate_client()
                 
+                self.scheduler.finish(controller)
                 async with self.lock:
-                    self.completed_tasks += 1
+                    self.completed_tasks += finished_cues
                     progress = (self.completed_tasks / self.total_tasks) * 100
                     self.update_progress(progress)
-                    self.update_status(f"Processing: {self.completed_tasks}/{self.total_tasks}")
+                    total_label = f"{self.total_tasks}" if self._producer_done else f"{self.total_tasks}+"
+                    self.update_status(f"Processing: {self.completed_tasks}/{total_label}")
                 
-                self.task_queue.task_done()
+                if from_queue:
+                    self.task_queue.task_done()
             
             self.log(f"🏁 Worker {worker_id} finished", "INFO")
             
         except Exception as e:
             self.log(f"❌ Worker {worker_id} crashed: {e}", "ERROR")
+        finally:
+            self._active_workers -= 1
+            self.scheduler.leave(api_key)
+            if engine is not None:
+                await engine.disconnect()  # The key's sessions close with its last worker
     
     def stop(self):
         self.is_running = False
@@ -2077,58 +5253,203 @@ class LongTextProcessor:
         
         self.is_running = False
         self.task_queue: asyncio.Queue = None
-        self.results: Dict[int, str] = {}  # index -> file_path
-        self.failed_chunks: Dict[int, str] = {}  # index -> text (for retry)
-        self.chunks_data: Dict[int, str] = {}  # index -> text (original chunks)
+        self.table = ChunkTable()  # status and output path of every chunk (text stays in the chunk map)
         self.total_tasks = 0
         self.completed_tasks = 0
         self.lock = asyncio.Lock()
+        
+        # Streaming state: chunks are produced while workers are running
+        self._producer_done = True
+        self._chunk_map_file = None
+        self._chunk_map_path = ""
+        self._chunk_map_size = 0  # Bytes written to the chunk map so far
+        self._chunk_map_reader = None
+        self._map_offsets = array('Q')  # Per table row: where its entry starts in the chunk map
+        self._map_lengths = array('I')  # ... and how many bytes it has
+        
+        # Scheduling: latency history, running workers and tail-split chunks
+        self.time_model = SynthesisTimeModel()
+        self._active_workers = 0
+        self._tail_parts: Dict[int, Dict[str, Any]] = {}  # index -> {"files", "done", "failed"}
+        self._started_at = 0.0
+        self.limiter: Optional[KeyRateLimiter] = None
+        self.scheduler: Optional[KeyScheduler] = None
+    
+    def _log_key_limits(self):
+        """Final concurrency / rate / health of every key and how often it was rate-limited"""
+        for controller in self.limiter.controllers.values():
+            self.log(f"📶 Key {controller.label}: {int(controller.limit)} luồng, {controller.rps:.1f} req/s cho phép, "
+                     f"{controller.throttled} lần bị giới hạn (429), {controller.health()}", "INFO")
+        if self.scheduler.stolen:
+            self.log(f"🔀 {self.scheduler.stolen} lần chuyển việc từ key lỗi sang key khác", "INFO")
     
     def _get_worker_assignments(self) -> List[tuple]:
         """
-        Get list of (worker_id, api_key) tuples.
-        If multi-worker is enabled, same key is assigned to multiple workers.
+        Get list of (worker_id, api_key) tuples, keys taken in turn.
+        Each key gets as many workers as its KeyRateController may ever allow
+        (see worker_limits); they take a permit from it for every request.
         """
         assignments = []
         worker_id = 0
-        
-        if self.config.multi_worker_enabled:
-            for api_key in self.api_keys:
-                for _ in range(self.config.workers_per_key):
-                    assignments.append((worker_id, api_key))
-                    worker_id += 1
-        else:
+        _, per_key = worker_limits(self.config)
+        for _ in range(per_key):
             for api_key in self.api_keys:
                 assignments.append((worker_id, api_key))
                 worker_id += 1
         
         return assignments
     
-    def _save_chunk_map(self, temp_dir: str, chunks: List[TextChunk]):
-        """Save chunk map to JSON file for tracking and recovery"""
-        chunk_map = {
-            "total_chunks": len(chunks),
-            "chunks": {c.index: {"text": c.text, "length": c.original_length} for c in chunks}
-        }
+    def _begin_chunk_map(self, temp_dir: str, chunk_size: int, chunk_mode: str) -> str:
+        """
+        Start writing the chunk map JSON file for tracking and recovery.
+        Chunks are appended one by one as they are produced (see _record_chunk)
+        so the full chunk list never has to be held in memory: the chunk table
+        only keeps where each entry is, and reads the text back (_chunk_text).
+        The chunking settings and audio key let a later run reuse the chunk WAVs.
+        """
         map_file = os.path.join(temp_dir, "_chunk_map.json")
-        with open(map_file, "w", encoding="utf-8") as f:
-            json.dump(chunk_map, f, ensure_ascii=False, indent=2)
+        self._chunk_map_file = open(map_file, "wb")
+        self._chunk_map_path = map_file
+        self._chunk_map_size = 0
+        self._map_offsets = array('Q')
+        self._map_lengths = array('I')
+        header = json.dumps({"chunk_size": chunk_size, "mode": chunk_mode, "audio_key": self._audio_key()})
+        self._write_chunk_map(header[:-1] + ',\n  "chunks": {')
         return map_file
     
+    def _write_chunk_map(self, text: str) -> int:
+        """Append text to the chunk map; returns how many bytes were written"""
+        data = text.encode("utf-8")
+        self._chunk_map_file.write(data)
+        self._chunk_map_size += len(data)
+        return len(data)
+    
+    def _record_chunk(self, chunk: TextChunk):
+        """Append one chunk entry to the chunk map being written (after its table row)"""
+        separator = "," if self.total_tasks > 1 else ""
+        self._write_chunk_map(f'{separator}\n    "{chunk.index}": ')
+        self._map_offsets.append(self._chunk_map_size)
+        entry = json.dumps({"text": chunk.text, "length": chunk.original_length}, ensure_ascii=False)
+        self._map_lengths.append(self._write_chunk_map(entry))
+    
+    def _finish_chunk_map(self):
+        """Close the chunk map JSON file with the final chunk count"""
+        if self._chunk_map_file is None:
+            return
+        self._write_chunk_map(f'\n  }},\n  "total_chunks": {self.total_tasks}\n}}\n')
+        self._chunk_map_file.close()
+        self._chunk_map_file = None
+    
+    def _chunk_text(self, index: int) -> str:
+        """Text of a chunk, read back from its entry in the chunk map"""
+        if self._chunk_map_file is not None:
+            self._chunk_map_file.flush()  # Still being written: the entry may sit in the buffer
+        if self._chunk_map_reader is None:
+            self._chunk_map_reader = open(self._chunk_map_path, "rb")
+        row = self.table.row_of(index)
+        self._chunk_map_reader.seek(self._map_offsets[row])
+        return json.loads(self._chunk_map_reader.read(self._map_lengths[row]))["text"]
+    
+    def _close_chunk_map_reader(self):
+        if self._chunk_map_reader is not None:
+            self._chunk_map_reader.close()
+            self._chunk_map_reader = None
+    
     def _load_chunk_map(self, temp_dir: str) -> Optional[Dict]:
-        """Load chunk map from JSON file"""
+        """Load chunk map from JSON file (None if missing or left incomplete by a crash)"""
         map_file = os.path.join(temp_dir, "_chunk_map.json")
         if os.path.exists(map_file):
-            with open(map_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            try:
+                with open(map_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return None
         return None
     
-    def _get_missing_chunks(self, total_chunks: int) -> List[int]:
+    def _audio_key(self) -> str:
+        """Settings that change the audio of a chunk - WAVs are only reused when they match"""
+        settings = [MODEL, self.config.voice, self.config.speed, self.config.system_instruction,
+                    self.config.keep_voice_beta]
+        return hashlib.sha256(json.dumps(settings, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _find_unchanged(cleaned_text: str, chunk_text: str, start: int, trailing: str) -> int:
+        """Position of chunk_text in cleaned_text at or after start, on word boundaries (-1 if absent)"""
+        pos = cleaned_text.find(chunk_text, start)
+        while pos >= 0:
+            end = pos + len(chunk_text)
+            if ((pos == 0 or cleaned_text[pos - 1] == ' ')
+                    and (end == len(cleaned_text) or cleaned_text[end] == ' ' or cleaned_text[end] in trailing)):
+                return pos
+            pos = cleaned_text.find(chunk_text, pos + 1)
+        return -1
+    
+    def _plan_incremental(self, text: str, temp_dir: str, chunk_size: int, chunk_mode: str):
+        """
+        Diff text against the chunk map of an earlier run in temp_dir.
+        
+        Old chunks found unchanged (in order) keep their boundaries; only the
+        text between them is chunked again, so an edit does not shift every
+        later chunk. Returns (chunks, reuse) with reuse = {new index: old index}
+        for chunks whose WAV can be reused, or None without a compatible map.
+        """
+        old_map = self._load_chunk_map(temp_dir)
+        if not old_map or (old_map.get("chunk_size"), old_map.get("mode"), old_map.get("audio_key")) != \
+                (chunk_size, chunk_mode, self._audio_key()):
+            return None
+        
+        cleaned_text = clean_text_for_tts(text)
+        # v2 mode drops trailing punctuation from the chunk text - it stays with the chunk
+        trailing = ''.join(PUNCTUATION_TO_REMOVE) if chunk_mode == "v2" else ''
+        planned = []  # (text, old index or None)
+        pos = 0
+        
+        def add_changed(end: int):
+            changed = cleaned_text[pos:end]
+            if changed.strip():
+                planned.extend((c.text, None) for c in
+                               iter_text_chunks([changed], chunk_size, mode=chunk_mode, remove_punct=True))
+        
+        for key, entry in sorted(old_map.get("chunks", {}).items(), key=lambda item: int(item[0])):
+            old_text = entry.get("text", "")
+            found = self._find_unchanged(cleaned_text, old_text, pos, trailing) if old_text else -1
+            if found < 0:
+                continue
+            add_changed(found)
+            end = found + len(old_text)
+            while end < len(cleaned_text) and (cleaned_text[end] == ' ' or cleaned_text[end] in trailing):
+                end += 1
+            planned.append((old_text, int(key)))
+            pos = end
+        add_changed(len(cleaned_text))
+        
+        chunks = []
+        reuse = {}
+        for index, (chunk_text, old_index) in enumerate(planned, 1):
+            chunks.append(TextChunk(index=index, text=chunk_text, original_length=len(chunk_text)))
+            if old_index is not None:
+                old_file = os.path.join(temp_dir, f"chunk_{old_index:04d}.wav")
+                if os.path.exists(old_file) and os.path.getsize(old_file) > MIN_AUDIO_FILE_SIZE:
+                    reuse[index] = old_index
+        return chunks, reuse
+    
+    def _adopt_chunk_files(self, temp_dir: str, reuse: Dict[int, int]):
+        """Renumber reused chunk WAVs to their new index and delete the stale ones"""
+        for new_index, old_index in reuse.items():
+            os.replace(os.path.join(temp_dir, f"chunk_{old_index:04d}.wav"),
+                       os.path.join(temp_dir, f"_reuse_{new_index:04d}.wav"))
+        for stale in glob.glob(os.path.join(glob.escape(temp_dir), "chunk_*.wav")):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        for new_index in reuse:
+            os.replace(os.path.join(temp_dir, f"_reuse_{new_index:04d}.wav"),
+                       os.path.join(temp_dir, f"chunk_{new_index:04d}.wav"))
+    
+    def _get_missing_chunks(self) -> List[int]:
         """Get list of missing chunk indices"""
-        expected = set(range(1, total_chunks + 1))
-        generated = set(self.results.keys())
-        missing = expected - generated
-        return sorted(list(missing))
+        return self.table.missing()
     
     async def _retry_missing_chunks(self, missing_indices: List[int], temp_dir: str) -> int:
         """
@@ -2140,14 +5461,21 @@ class LongTextProcessor:
         
         self.log(f"🔄 Đang retry {len(missing_indices)} chunks bị thiếu: {missing_indices}", "INFO")
         
-        # Create new task queue with missing chunks
+        # Create new task queue with missing chunks (text is read back from the chunk map)
         retry_queue = asyncio.Queue()
-        for idx in missing_indices:
-            if idx in self.chunks_data:
-                chunk = TextChunk(index=idx, text=self.chunks_data[idx], original_length=len(self.chunks_data[idx]))
-                await retry_queue.put(chunk)
-            else:
-                self.log(f"❌ Không tìm thấy text cho chunk {idx}", "ERROR")
+        try:
+            for idx in missing_indices:
+                try:
+                    chunk = self.table.chunk(idx)
+                except (OSError, ValueError, KeyError) as e:
+                    self.log(f"❌ Không đọc được text cho chunk {idx}: {e}", "ERROR")
+                    continue
+                if chunk.text:
+                    await retry_queue.put(chunk)
+                else:
+                    self.log(f"❌ Không tìm thấy text cho chunk {idx}", "ERROR")
+        finally:
+            self._close_chunk_map_reader()
         
         if retry_queue.empty():
             return 0
@@ -2162,9 +5490,10 @@ class LongTextProcessor:
         
         async def retry_worker(worker_id: int, api_key: str):
             nonlocal retry_success
+            engine = None
             try:
                 # Sử dụng WorkerEngine cho retry (more stable)
-                engine = WorkerEngine(worker_id, api_key, self.config)
+                engine = WorkerEngine(worker_id, api_key, self.config, log_callback=self.log)
                 
                 while True:
                     try:
@@ -2178,18 +5507,18 @@ class LongTextProcessor:
                     recovery_max_retries = MAX_RETRIES + RECOVERY_EXTRA_RETRIES
                     for attempt in range(1, recovery_max_retries + 1):
                         try:
-                            audio_data = await engine.generate_audio(chunk.text)
-                            
-                            if not audio_data or len(audio_data) < MIN_AUDIO_FILE_SIZE:
-                                raise ValueError("Audio too short or empty")
-                            
                             final_rate = int(RECEIVE_SAMPLE_RATE * self.config.speed)
                             output_file = os.path.join(temp_dir, f"chunk_{chunk.index:04d}.wav")
                             
-                            save_wave_file(output_file, audio_data, rate=final_rate)
+                            with WavSink(output_file, rate=final_rate) as sink:
+                                if not engine.stream_cached(chunk.text, sink):  # A cache hit needs no permit
+                                    async with self.limiter[api_key].permit():
+                                        await engine.stream_audio(chunk.text, sink, lookup=False)
+                                check_audio_size(sink.data_bytes)
                             
                             async with retry_lock:
-                                self.results[chunk.index] = output_file
+                                self.table.mark_done(chunk.index, attempts=attempt, path=output_file,
+                                                     samples=sink.data_bytes // AUDIO_SAMPLE_WIDTH)
                                 retry_success += 1
                             
                             self.log(f"✅ RETRY OK: Chunk [{chunk.index:04d}]", "SUCCESS")
@@ -2208,6 +5537,9 @@ class LongTextProcessor:
                     
             except Exception as e:
                 self.log(f"❌ Retry worker {worker_id} crashed: {e}", "ERROR")
+            finally:
+                if engine is not None:
+                    await engine.disconnect()
         
         # Start retry workers
         retry_tasks = [
@@ -2221,11 +5553,16 @@ class LongTextProcessor:
     
     async def process_text(self, text: str, output_file: str, chunk_size: int = 1000,
                           temp_dir: str = None, ffmpeg_path: str = "ffmpeg.exe",
-                          delete_chunks: bool = True, chunk_v2_mode: bool = False) -> bool:
+                          delete_chunks: bool = True, chunk_v2_mode: bool = False,
+                          subtitle_file: Optional[str] = None) -> bool:
         """
         Process long text into a single audio file.
         Returns True if successful.
         
+        If temp_dir still holds the chunks of an earlier run (delete_chunks=False or
+        a failed merge), the text is diffed against its chunk map and only chunks
+        whose text changed are synthesized again; the merge is always redone.
+        
         Args:
             text: Input text to process
             output_file: Output file path
@@ -2234,70 +5571,252 @@ class LongTextProcessor:
             ffmpeg_path: Path to ffmpeg executable
             delete_chunks: Whether to delete temp chunks after merging
             chunk_v2_mode: If True, use punctuation-based chunking (Ngắt dòng v2)
+            subtitle_file: If set, an SRT/VTT timed from the chunk lengths is written there
         """
-        if not self.api_keys:
-            self.log("❌ No API keys!", "ERROR")
-            return False
+        temp_dir = self._resolve_temp_dir(output_file, temp_dir)
+        chunk_mode = "v2" if chunk_v2_mode else "sentence"
+        plan = self._plan_incremental(text, temp_dir, chunk_size, chunk_mode)
+        if plan is None:
+            return await self.process_pieces(
+                [text], output_file, chunk_size, temp_dir=temp_dir, ffmpeg_path=ffmpeg_path,
+                delete_chunks=delete_chunks, chunk_v2_mode=chunk_v2_mode, subtitle_file=subtitle_file
+            )
         
-        # Create chunks - use v2 mode if enabled
-        if chunk_v2_mode:
-            chunks = split_text_by_punctuation_v2(text, target_chunk_size=chunk_size, remove_punct=True)
-            self.log(f"📝 Ngắt dòng v2: Text split into {len(chunks)} chunks (target {chunk_size} chars)", "INFO")
-        else:
-            chunks = split_text_into_chunks(text, chunk_size)
-            self.log(f"📝 Text split into {len(chunks)} chunks (max {chunk_size} chars each)", "INFO")
+        chunks, reuse = plan
+        self._adopt_chunk_files(temp_dir, reuse)
+        self.log(f"♻️ Tái sử dụng {len(reuse)}/{len(chunks)} chunks từ lần chạy trước - "
+                 f"chỉ tạo lại {len(chunks) - len(reuse)} chunks", "INFO")
+        return await self._process_chunks(
+            iter(chunks), output_file, chunk_size, temp_dir, ffmpeg_path,
+            delete_chunks, chunk_v2_mode, reused=set(reuse), subtitle_file=subtitle_file
+        )
+    
+    async def process_file(self, file_path: str, output_file: str, chunk_size: int = 1000,
+                          temp_dir: str = None, ffmpeg_path: str = "ffmpeg.exe",
+                          delete_chunks: bool = True, chunk_v2_mode: bool = False,
+                          subtitle_file: Optional[str] = None) -> bool:
+        """
+        Process a txt/docx file into a single audio file.
+        The file is read incrementally, so workers start synthesizing the first
+        chunks while the rest of the document is still being read.
+        """
+        if self._load_chunk_map(self._resolve_temp_dir(output_file, temp_dir)) is not None:
+            # An earlier run left its chunks - diffing needs the whole text
+            return await self.process_text(
+                read_document_file(file_path), output_file, chunk_size, temp_dir=temp_dir,
+                ffmpeg_path=ffmpeg_path, delete_chunks=delete_chunks, chunk_v2_mode=chunk_v2_mode,
+                subtitle_file=subtitle_file
+            )
         
-        if not chunks:
-            self.log("❌ No text to process!", "ERROR")
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in ['.doc', '.docx']:
+            pieces = iter_document_file(file_path)
+        else:
+            # Any other file is read line by line as UTF-8 text
+            def _iter_lines():
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    yield from f
+            pieces = _iter_lines()
+        
+        return await self.process_pieces(
+            pieces, output_file, chunk_size, temp_dir=temp_dir,
+            ffmpeg_path=ffmpeg_path, delete_chunks=delete_chunks, chunk_v2_mode=chunk_v2_mode,
+            subtitle_file=subtitle_file
+        )
+    
+    async def _produce_chunks(self, chunks: Iterator[TextChunk], reused: set):
+        """Pull chunks from the (blocking) chunk generator and feed the task queue"""
+        try:
+            while self.is_running:
+                # Reading/splitting may block on file I/O - keep it off the event loop
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                self.total_tasks += 1
+                self.table.append(chunk.index, chunk.text, chunk.original_length)
+                self._record_chunk(chunk)
+                if chunk.index in reused:
+                    # WAV of an earlier run is already in place
+                    self.table.mark_done(chunk.index, attempts=0)
+                    self.completed_tasks += 1
+                    continue
+                # Bounded queue: waits here while workers are busy (flat memory)
+                await self.task_queue.put(chunk)
+            
+            if self.is_running:
+                # All chunks are known now - predict when the remaining queue will be done
+                elapsed = time.perf_counter() - self._started_at
+                remaining = self.time_model.predict_makespan(
+                    self.task_queue.pending_syllables(),
+                    list(range(min(self._active_workers, self.limiter.total_limit())))
+                )
+                self.log(f"⏱️ Predicted makespan: ~{elapsed + remaining:.0f}s (longest-first)", "INFO")
+        finally:
+            self._producer_done = True
+            self._finish_chunk_map()
+    
+    def _maybe_split_tail(self, chunk: TextChunk) -> TextChunk:
+        """
+        Tail phase: once every chunk has been produced and fewer are queued than
+        there are other workers, split a long chunk in two so an idle worker
+        can take the second half instead of waiting for this one to finish.
+        """
+        if not self._producer_done or chunk.parts > 1:
+            return chunk
+        if self.task_queue.qsize() >= min(self._active_workers, self.limiter.total_limit()) - 1:
+            return chunk
+        if estimate_syllables(chunk.text) < 2 * TAIL_SPLIT_MIN_SYLLABLES:
+            return chunk
+        
+        first, second = split_text_in_half(chunk.text)
+        if (estimate_syllables(first) < TAIL_SPLIT_MIN_SYLLABLES
+                or estimate_syllables(second) < TAIL_SPLIT_MIN_SYLLABLES):
+            return chunk
+        
+        self._tail_parts[chunk.index] = {"files": {}, "done": 0, "failed": False}
+        self.task_queue.put_nowait(TextChunk(index=chunk.index, text=second, original_length=len(second),
+                                             part=2, parts=2))
+        self.log(f"✂️ Tail: Chunk [{chunk.index:04d}] split in 2 for idle workers", "INFO")
+        return TextChunk(index=chunk.index, text=first, original_length=len(first), part=1, parts=2)
+    
+    def _record_part(self, chunk: TextChunk, output_file: Optional[str], temp_dir: str) -> bool:
+        """
+        Record the result of one tail part (output_file None = failed). When all
+        parts are in, joins them into the chunk's WAV - or leaves the chunk
+        missing so it is retried whole. Returns True once the chunk is resolved.
+        """
+        state = self._tail_parts[chunk.index]
+        state["done"] += 1
+        if output_file:
+            state["files"][chunk.part] = output_file
+        else:
+            state["failed"] = True
+        if state["done"] < chunk.parts:
             return False
         
-        # Setup temp directory - use absolute path
-        output_file_abs = os.path.abspath(output_file)
-        if temp_dir is None:
-            temp_dir = os.path.join(os.path.dirname(output_file_abs), "_temp_chunks")
+        part_files = [state["files"][part] for part in sorted(state["files"])]
+        if not state["failed"]:
+            output = os.path.join(temp_dir, f"chunk_{chunk.index:04d}.wav")
+            concat_wav_files(part_files, output)
+            self.table.mark_done(chunk.index, path=output)
         else:
-            temp_dir = os.path.abspath(temp_dir)
+            self.table.mark_failed(chunk.index)
+        for f in part_files:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+        del self._tail_parts[chunk.index]
+        return True
+    
+    @staticmethod
+    def _resolve_temp_dir(output_file: str, temp_dir: Optional[str]) -> str:
+        """Absolute temp directory for the chunks (default: _temp_chunks next to the output)"""
+        if temp_dir is None:
+            return os.path.join(os.path.dirname(os.path.abspath(output_file)), "_temp_chunks")
+        return os.path.abspath(temp_dir)
+    
+    async def process_pieces(self, pieces: Iterable[str], output_file: str, chunk_size: int = 1000,
+                            temp_dir: str = None, ffmpeg_path: str = "ffmpeg.exe",
+                            delete_chunks: bool = True, chunk_v2_mode: bool = False,
+                            subtitle_file: Optional[str] = None) -> bool:
+        """
+        Process a stream of raw text pieces (lines, paragraphs) into a single audio file.
+        Chunks are generated lazily and pushed to the workers as they are produced.
+        """
+        # Create chunks lazily - use v2 mode if enabled
+        chunk_mode = "v2" if chunk_v2_mode else "sentence"
+        chunks = iter_text_chunks(pieces, chunk_size, mode=chunk_mode, remove_punct=True)
+        return await self._process_chunks(
+            chunks, output_file, chunk_size, self._resolve_temp_dir(output_file, temp_dir),
+            ffmpeg_path, delete_chunks, chunk_v2_mode, subtitle_file=subtitle_file
+        )
+    
+    async def _process_chunks(self, chunks: Iterator[TextChunk], output_file: str, chunk_size: int,
+                              temp_dir: str, ffmpeg_path: str, delete_chunks: bool,
+                              chunk_v2_mode: bool, reused: Optional[set] = None,
+                              subtitle_file: Optional[str] = None) -> bool:
+        """Synthesize chunks (except `reused` indices, whose WAV exists) and merge them"""
+        if not self.api_keys:
+            self.log("❌ No API keys!", "ERROR")
+            return False
+        
         os.makedirs(temp_dir, exist_ok=True)
         
         self.log(f"📂 Temp directory: {temp_dir}", "INFO")
         
-        # Save chunk map to JSON for tracking
-        self._save_chunk_map(temp_dir, chunks)
-        
-        # Store chunks data for potential retry
-        self.chunks_data = {c.index: c.text for c in chunks}
-        
         self.is_running = True
-        self.total_tasks = len(chunks)
+        self.total_tasks = 0
         self.completed_tasks = 0
-        self.results = {}
-        self.failed_chunks = {}
-        
-        # Create task queue
-        self.task_queue = asyncio.Queue()
-        for chunk in chunks:
-            await self.task_queue.put(chunk)
+        self.table = ChunkTable(lambda index: os.path.join(temp_dir, f"chunk_{index:04d}.wav"),
+                                text_for=self._chunk_text)
+        self._close_chunk_map_reader()
         
         # Get worker assignments
         worker_assignments = self._get_worker_assignments()
         total_workers = len(worker_assignments)
+        self.limiter = KeyRateLimiter(self.api_keys, *worker_limits(self.config), log=self.log)
+        self.scheduler = KeyScheduler(self.limiter)
+        
+        # Create bounded longest-first task queue - producer only stays a few chunks
+        # ahead of workers; output order is kept by chunk index at merge time
+        self.task_queue = LongestFirstQueue(maxsize=total_workers * CHUNK_QUEUE_AHEAD_PER_WORKER)
+        self._active_workers = total_workers
+        self._tail_parts = {}
+        self._started_at = time.perf_counter()
+        cache = get_synthesis_cache()
+        cache_since = cache.snapshot() if cache else None
+        
+        # Save chunk map to JSON for tracking (written incrementally by the producer)
+        self._begin_chunk_map(temp_dir, chunk_size, "v2" if chunk_v2_mode else "sentence")
+        self._producer_done = False
+        producer = asyncio.create_task(self._produce_chunks(chunks, reused or set()))
         
         # Log startup info
         if self.config.multi_worker_enabled:
-            self.log(f"🚀 Multi-Worker Mode: {len(self.api_keys)} API key(s) × {self.config.workers_per_key} worker(s) = {total_workers} total workers", "INFO")
+            initial, maximum = worker_limits(self.config)
+            self.log(f"🚀 Multi-Worker Mode: {len(self.api_keys)} API key(s) × {initial}→{maximum} worker(s) "
+                     f"(tự điều chỉnh theo rate limit của từng key)", "INFO")
         else:
-            self.log(f"🚀 Starting {total_workers} workers for {self.total_tasks} chunks", "INFO")
+            self.log(f"🚀 Starting {total_workers} workers (streaming chunks)", "INFO")
         
         # Start workers
         workers = [
             asyncio.create_task(self._worker(worker_id, api_key, temp_dir))
             for worker_id, api_key in worker_assignments
         ]
+        reporter = asyncio.create_task(self.limiter.report(self.log))
         
         await asyncio.gather(*workers)
+        reporter.cancel()
+        
+        # Workers only exit early on stop/crash - don't leave the producer blocked on the queue
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.log(f"❌ Lỗi đọc/chia text: {e}", "ERROR")
+            return False
+        
+        if self.total_tasks == 0:
+            self.log("❌ No text to process!", "ERROR")
+            return False
+        
+        self.log(f"⏱️ Makespan: {time.perf_counter() - self._started_at:.1f}s", "INFO")
+        self._log_key_limits()
+        if cache:
+            self.log(cache.summary(since=cache_since), "INFO")
+        
+        if chunk_v2_mode:
+            self.log(f"📝 Ngắt dòng v2: Text split into {self.total_tasks} chunks (target {chunk_size} chars)", "INFO")
+        else:
+            self.log(f"📝 Text split into {self.total_tasks} chunks (max {chunk_size} chars each)", "INFO")
         
         # Check for missing chunks and retry if needed
-        missing_chunks = self._get_missing_chunks(self.total_tasks)
+        missing_chunks = self._get_missing_chunks()
         
         if missing_chunks:
             self.log(f"⚠️ Phát hiện {len(missing_chunks)} chunks thiếu sau xử lý lần đầu", "WARNING")
@@ -2306,7 +5825,7 @@ class LongTextProcessor:
             retry_success = await self._retry_missing_chunks(missing_chunks, temp_dir)
             
             # Check again after retry
-            still_missing = self._get_missing_chunks(self.total_tasks)
+            still_missing = self._get_missing_chunks()
             
             if still_missing:
                 self.log(f"❌ Sau khi retry, vẫn còn {len(still_missing)} chunks thiếu: {still_missing}", "ERROR")
@@ -2316,7 +5835,8 @@ class LongTextProcessor:
                 self.log(f"✅ Đã retry thành công tất cả chunks thiếu!", "SUCCESS")
         
         # Final check - verify all files exist
-        successful = len([v for v in self.results.values() if v and os.path.exists(v)])
+        chunk_files = self.table.done_paths()
+        successful = sum(1 for f in chunk_files if os.path.exists(f))
         if successful < self.total_tasks:
             self.log(f"⚠️ Only {successful}/{self.total_tasks} chunks generated. Cannot merge.", "WARNING")
             return False
@@ -2325,11 +5845,12 @@ class LongTextProcessor:
         self.log("🔧 Merging audio chunks with FFmpeg...", "INFO")
         self.update_status("Merging audio files...")
         
-        chunk_files = [self.results[i] for i in sorted(self.results.keys())]
         success = merge_wav_files_ffmpeg(chunk_files, output_file, ffmpeg_path)
         
         if success:
             self.log(f"✅ Merged successfully: {output_file}", "SUCCESS")
+            if subtitle_file:
+                self._write_subtitles(subtitle_file)
             
             # Clean up temp files
             if delete_chunks:
@@ -2355,7 +5876,32 @@ class LongTextProcessor:
         
         return success
     
+    def _subtitle_segments(self) -> Iterator[tuple]:
+        """(text, samples, sample_rate) of the merged chunks, in playback order"""
+        final_rate = int(RECEIVE_SAMPLE_RATE * self.config.speed)
+        for text, path, samples in self.table.done_rows():
+            if samples:
+                yield text, samples, final_rate
+            else:
+                # Reused from an earlier run or joined from tail parts - the WAV header knows
+                yield (text, *audio_sample_count(path))
+    
+    def _write_subtitles(self, subtitle_file: str):
+        """Forced-timing subtitles for the merged audio (no extra synthesis)"""
+        try:
+            cues = write_forced_subtitles(self._subtitle_segments(), subtitle_file)
+            self.log(f"💬 Phụ đề: {cues} cues -> {subtitle_file}", "SUCCESS")
+        except Exception as e:
+            self.log(f"⚠️ Không tạo được phụ đề: {e}", "WARNING")
+        finally:
+            self._close_chunk_map_reader()  # The map may be deleted next
+    
+    def _no_more_work(self) -> bool:
+        return self.task_queue.empty() and self._producer_done and not self.scheduler.rerouted
+    
     async def _worker(self, worker_id: int, api_key: str, temp_dir: str):
+        engine = None
+        self.scheduler.join(api_key)
         try:
             key_preview = f"...{api_key[-4:]}" if len(api_key) >= 4 else "****"
             
@@ -2365,23 +5911,38 @@ class LongTextProcessor:
                 await engine.connect()
                 self.log(f"📞 Worker {worker_id} (Key: {key_preview}) started", "INFO")
             else:
-                engine = WorkerEngine(worker_id, api_key, self.config)
+                engine = WorkerEngine(worker_id, api_key, self.config, log_callback=self.log)
                 self.log(f"🔧 Worker {worker_id} (Key: {key_preview}) started", "INFO")
             
+            controller = self.limiter[api_key]
             consecutive_errors = 0
             max_consecutive_errors = 3
             
             while self.is_running:
-                try:
-                    chunk = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    if self.task_queue.empty():
+                # Chunks go to the best key that can send now (see KeyScheduler)
+                if not await self.scheduler.wait_turn(controller):
+                    if self._no_more_work():
                         break
                     continue
+                chunk, moves = self.scheduler.take_rerouted()
+                from_queue = chunk is None
+                if from_queue:
+                    try:
+                        chunk = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        if self._no_more_work():
+                            break
+                        continue
                 
                 if not self.is_running:
-                    await self.task_queue.put(chunk)
+                    # Don't put it back: the queue is bounded and the producer may hold
+                    # the free slot. The chunk text is still in the chunk map.
                     break
+                probe = self.scheduler.start(controller)
+                
+                chunk = self._maybe_split_tail(chunk)
+                label = f"{chunk.index:04d}" if chunk.parts == 1 else f"{chunk.index:04d}.{chunk.part}"
+                resolved = True
                 
                 # Enhanced retry logic
                 success = False
@@ -2389,28 +5950,42 @@ class LongTextProcessor:
                 
                 for attempt in range(1, MAX_RETRIES + 1):
                     try:
-                        audio_data = await engine.generate_audio(chunk.text)
-                        
-                        if not audio_data:
-                            raise ValueError("Received 0 bytes (No Audio) - Connection issue likely")
-                        
-                        if len(audio_data) < MIN_AUDIO_FILE_SIZE:
-                            raise ValueError(f"Audio too short ({len(audio_data)} bytes)")
-                        
                         final_rate = int(RECEIVE_SAMPLE_RATE * self.config.speed)
-                        output_file = os.path.join(temp_dir, f"chunk_{chunk.index:04d}.wav")
+                        if chunk.parts > 1:
+                            output_file = os.path.join(temp_dir, f"chunk_{chunk.index:04d}_p{chunk.part}.wav")
+                        else:
+                            output_file = os.path.join(temp_dir, f"chunk_{chunk.index:04d}.wav")
+                        
+                        syllables = estimate_syllables(chunk.text)
+                        request_started = time.perf_counter()
+                        # Written to the chunk file as it arrives
+                        with WavSink(output_file, rate=final_rate) as sink:
+                            # Cache hits are served before taking a permit: they use no token, quota or key health
+                            cached = engine.stream_cached(chunk.text, sink) > 0
+                            if not cached:
+                                async with controller.permit(self.time_model.estimate(syllables, worker_id)):
+                                    request_started = time.perf_counter()
+                                    await self.scheduler.send(
+                                        controller, engine.stream_audio(chunk.text, sink, lookup=False), moves, probe)
+                            check_audio_size(sink.data_bytes)
+                        if cached:
+                            self.scheduler.served_from_cache(controller, probe)
                         
-                        save_wave_file(output_file, audio_data, rate=final_rate)
+                        self.time_model.observe(worker_id, syllables, time.perf_counter() - request_started, cached)
                         
-                        duration_ms = len(audio_data) / (final_rate * AUDIO_SAMPLE_WIDTH) * 1000
+                        duration_ms = sink.duration_ms
                         
-                        status_msg = f"✅ W{worker_id} Chunk [{chunk.index:04d}] ({duration_ms:.0f}ms)"
+                        status_msg = f"✅ W{worker_id} Chunk [{label}] ({duration_ms:.0f}ms)"
                         if attempt > 1:
                             status_msg += f" [Retry {attempt-1}]"
                         self.log(status_msg, "SUCCESS")
                         
                         async with self.lock:
-                            self.results[chunk.index] = output_file
+                            if chunk.parts > 1:
+                                resolved = self._record_part(chunk, output_file, temp_dir)
+                            else:
+                                self.table.mark_done(chunk.index, attempts=attempt, path=output_file,
+                                                     samples=sink.data_bytes // AUDIO_SAMPLE_WIDTH)
                         
                         success = True
                         consecutive_errors = 0
@@ -2420,10 +5995,23 @@ class LongTextProcessor:
                         last_error = str(e)
                         is_conn_error = is_connection_error(last_error)
                         
+                        if self.scheduler.can_steal(controller, moves):
+                            # The key is failing - another key's worker takes the chunk now
+                            self.log(f"🔀 W{worker_id} Chunk [{label}] Key {controller.label} lỗi ({last_error[:60]}) - chuyển sang key khác", "WARNING")
+                            self.scheduler.reroute(chunk, moves)
+                            resolved = False
+                            break
+                        
                         if attempt < MAX_RETRIES:
                             delay = calculate_retry_delay(attempt, is_conn_error)
                             
-                            if is_conn_error:
+                            if is_rate_limit_error(last_error):
+                                delay = 0.0  # The key's controller holds requests back (cool-down, lower rate)
+                                self.log(
+                                    f"🚦 W{worker_id} Chunk [{chunk.index:04d}] Key {controller.label} bị giới hạn (attempt {attempt}/{MAX_RETRIES}) - giảm tốc key: {controller.status()}", 
+                                    "WARNING"
+                                )
+                            elif is_conn_error:
                                 self.log(
                                     f"⚠️ W{worker_id} Chunk [{chunk.index:04d}] Connection issue (attempt {attempt}/{MAX_RETRIES}): {last_error[:50]}... Retry in {delay:.1f}s", 
                                     "WARNING"
@@ -2442,13 +6030,19 @@ class LongTextProcessor:
                             
                             await asyncio.sleep(delay)
                         else:
-                            self.log(f"❌ W{worker_id} Chunk [{chunk.index:04d}] FAILED: {last_error}", "ERROR")
+                            self.log(f"❌ W{worker_id} Chunk [{label}] FAILED: {last_error}", "ERROR")
+                            if chunk.parts > 1:
+                                # Whole chunk is retried later from the chunk map
+                                async with self.lock:
+                                    resolved = self._record_part(chunk, None, temp_dir)
+                            else:
+                                self.table.mark_failed(chunk.index, attempts=attempt)
                             consecutive_errors += 1
                 
                 # Check for too many consecutive errors
                 if consecutive_errors >= max_consecutive_errors:
-                    self.log(f"⚠️ W{worker_id} Too many consecutive errors - pausing for 30s...", "WARNING")
-                    await asyncio.sleep(30)
+                    # The key's controller has already cooled it down (KEY_ERROR_STREAK) for all its workers
+                    self.log(f"⚠️ W{worker_id} Too many consecutive errors - {controller.status()}", "WARNING")
                     consecutive_errors = 0
                     # Recreate client/session dựa trên engine type
                     if self.config.live_session_enabled and hasattr(engine, 'recreate_session'):
@@ -2456,18 +6050,27 @@ class LongTextProcessor:
                     elif hasattr(engine, 'recreate_client'):
                         engine.recreate_client()
                 
-                async with self.lock:
-                    self.completed_tasks += 1
-                    progress = (self.completed_tasks / self.total_tasks) * 100
-                    self.update_progress(progress)
-                    self.update_status(f"Chunks: {self.completed_tasks}/{self.total_tasks}")
+                self.scheduler.finish(controller)
+                if resolved:
+                    async with self.lock:
+                        self.completed_tasks += 1
+                        progress = (self.completed_tasks / self.total_tasks) * 100
+                        self.update_progress(progress)
+                        total_label = f"{self.total_tasks}" if self._producer_done else f"{self.total_tasks}+"
+                        self.update_status(f"Chunks: {self.completed_tasks}/{total_label}")
                 
-                self.task_queue.task_done()
+                if from_queue:
+                    self.task_queue.task_done()
             
             self.log(f"🏁 Worker {worker_id} finished", "INFO")
             
         except Exception as e:
             self.log(f"❌ Worker {worker_id} crashed: {e}", "ERROR")
+        finally:
+            self._active_workers -= 1
+            self.scheduler.leave(api_key)
+            if engine is not None:
+                await engine.disconnect()  # The key's sessions close with its last worker
     
     def stop(self):
         self.is_running = False
@@ -2509,6 +6112,7 @@ class StudioGUI(ctk.CTk):
 
         # Data & Logic Init
         self.subtitles: List[Subtitle] = []
+        self.subtitle_file: Optional[str] = None  # SRT/VTT streamed into the workers instead of self.subtitles
         self.generated_audios: List[GeneratedAudio] = []
         self.processor: Optional[MultiThreadProcessor] = None
         self.long_text_processor: Optional[LongTextProcessor] = None
@@ -2921,6 +6525,19 @@ class StudioGUI(ctk.CTk):
         self.tts_sw_keep_voice_beta = ctk.CTkSwitch(left_col, text="Giữ giọng beta")
         self.tts_sw_keep_voice_beta.pack(anchor="w", padx=15, pady=(5, 5))
         
+        # Timeline dubbing - SRT/VTT: ghép tất cả clip theo thời gian cue thành 1 file WAV
+        self.tts_sw_dub_timeline = ctk.CTkSwitch(left_col, text="Lồng tiếng theo timeline (SRT)")
+        self.tts_sw_dub_timeline.pack(anchor="w", padx=15, pady=(5, 5))
+        
+        # Gộp cue ngắn (1-3 từ) vào 1 request rồi tách audio theo khoảng lặng - ít request hơn
+        self.tts_sw_cue_batching = ctk.CTkSwitch(left_col, text="Gộp cue ngắn (ít request hơn)")
+        self.tts_sw_cue_batching.pack(anchor="w", padx=15, pady=(5, 5))
+        
+        # Kiểm tra timing SRT/VTT trước khi gọi API: tự sửa / chỉ cảnh báo / dừng nếu lỗi
+        self.tts_combo_timing_check = ctk.CTkComboBox(left_col, values=list(SUBTITLE_TIMING_MODES), state="readonly")
+        self.tts_combo_timing_check.set(next(iter(SUBTITLE_TIMING_MODES)))
+        self.tts_combo_timing_check.pack(fill="x", padx=15, pady=5)
+        
         # Chunk settings for file processing (txt, docs, etc.)
         ctk.CTkLabel(left_col, text="CHUNK CONFIG (File dịch)", font=("Roboto", 12, "bold"), text_color="#3B8ED0").pack(anchor="w", padx=15, pady=(15, 5))
         
@@ -3098,6 +6715,10 @@ class StudioGUI(ctk.CTk):
         # Keep Voice Beta Mode - giữ giọng ổn định bằng cách wrap text trong {content}
         self.lt_sw_keep_voice_beta = ctk.CTkSwitch(cfg_box, text="Giữ giọng beta")
         self.lt_sw_keep_voice_beta.pack(anchor="w", padx=5, pady=5)
+        
+        # Subtitles timed from the chunk audio lengths - no extra API calls
+        self.lt_sw_subtitles = ctk.CTkSwitch(cfg_box, text="Xuất phụ đề SRT")
+        self.lt_sw_subtitles.pack(anchor="w", padx=5, pady=5)
 
         self.btn_lt_process_files = ctk.CTkButton(cfg_box, text="PROCESS SELECTED FILES", fg_color="#E09F3E", text_color="black", command=self._lt_process_files)
         self.btn_lt_process_files.pack(fill="x", padx=5, pady=10)
@@ -3402,6 +7023,11 @@ class StudioGUI(ctk.CTk):
         ctk.CTkCheckBox(opt_row, text="Hợp nhất voice sau khi xong (Merge all)", 
                        variable=self.capcut_merge_var, 
                        font=("Roboto", 11)).pack(side="left", padx=5)
+        
+        self.capcut_subtitle_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(opt_row, text="Xuất phụ đề SRT (file txt/docx)", 
+                       variable=self.capcut_subtitle_var, 
+                       font=("Roboto", 11)).pack(side="left", padx=15)
 
         # Process buttons
         proc_btn_row = ctk.CTkFrame(srt_frame, fg_color="transparent")
@@ -3607,6 +7233,11 @@ class StudioGUI(ctk.CTk):
         ctk.CTkCheckBox(opt_row, text="Hợp nhất voice sau khi xong", 
                        variable=self.edge_merge_var, 
                        font=("Roboto", 11)).pack(side="left", padx=15)
+        
+        self.edge_subtitle_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(opt_row, text="Xuất phụ đề SRT (file txt/docx)", 
+                       variable=self.edge_subtitle_var, 
+                       font=("Roboto", 11)).pack(side="left", padx=5)
 
         # Process buttons
         proc_btn_row = ctk.CTkFrame(srt_frame, fg_color="transparent")
@@ -4123,16 +7754,72 @@ class StudioGUI(ctk.CTk):
             )
             return self.vieneu_standard_fallback
 
+    def _vieneu_cache_key(self, cache: SynthesisCache, text: str, ref_codes, ref_text: str) -> str:
+        """Cache key of one inference - the voice is identified by its reference codes + text."""
+        import numpy as np
+        codes = ref_codes.cpu().numpy() if hasattr(ref_codes, 'cpu') else np.asarray(ref_codes)
+        voice = hashlib.sha256(codes.astype(np.int64).tobytes() + ref_text.encode('utf-8')).hexdigest()
+        return cache.make_key("vieneu", voice, text,
+                              backbone=self.vieneu_backbone_repo, codec=self.vieneu_codec_repo)
+
     def _vieneu_safe_infer(self, text: str, ref_codes, ref_text: str):
-        """Run inference with fallback when LMDeploy returns invalid tokens."""
+        """Run inference (through the synthesis cache) with fallback when LMDeploy returns invalid tokens."""
+        import numpy as np
+        cache = get_synthesis_cache()
+        cache_key = self._vieneu_cache_key(cache, text, ref_codes, ref_text) if cache else None
+        if cache:
+            cached = cache.get_bytes(cache_key, ".npy")
+            if cached:
+                return np.load(io.BytesIO(cached))
+        
         try:
-            return self.vieneu_tts_instance.infer(text, ref_codes, ref_text)
+            wav = self.vieneu_tts_instance.infer(text, ref_codes, ref_text)
         except ValueError as ve:
             if VIENEU_NO_TOKEN_ERR in str(ve) and self.vieneu_using_fast:
                 self.after(0, lambda: self._vieneu_log("⚠️ LMDeploy không sinh token hợp lệ, chuyển sang backend chuẩn..."))
                 fallback = self._vieneu_get_fallback_tts()
-                return fallback.infer(text, ref_codes, ref_text)
-            raise
+                wav = fallback.infer(text, ref_codes, ref_text)
+            else:
+                raise
+        
+        if cache and wav is not None and len(wav) > 0:
+            buf = io.BytesIO()
+            np.save(buf, np.asarray(wav, dtype=np.float32))
+            cache.put_bytes(cache_key, ".npy", buf.getvalue())
+        return wav
+
+    def _vieneu_token_counter(self):
+        """Token counter of the loaded backbone, or None to estimate from phoneme length."""
+        tts = self.vieneu_tts_instance
+        tokenizer = getattr(tts, 'tokenizer', None)
+        if tokenizer is not None:
+            return lambda s: len(tokenizer.encode(s, add_special_tokens=False))
+        backbone = getattr(tts, 'backbone', None)
+        if backbone is not None and hasattr(backbone, 'tokenize'):
+            # llama-cpp (GGUF) backbone
+            return lambda s: len(backbone.tokenize(s.encode('utf-8'), add_bos=False))
+        return None
+
+    def _vieneu_split_text(self, text: str, ref_codes, ref_text: str) -> List[TextChunk]:
+        """Split text into chunks packed to the backbone token budget of the reference voice."""
+        try:
+            from utils.phonemize_text import phonemize_with_dict
+            budget = VieNeuTokenBudget(
+                ref_codes, ref_text,
+                phonemize=phonemize_with_dict,
+                count_tokens=self._vieneu_token_counter()
+            )
+            if budget.budget <= 0:
+                self.after(0, lambda n=budget.ref_code_tokens: self._vieneu_log(
+                    f"⚠️ Giọng tham chiếu quá dài ({n} mã) - gần hết context, mỗi câu sẽ là một đoạn"))
+            chunks = split_text_by_token_budget(text, budget)
+            self.after(0, lambda b=budget.budget, r=budget.speech_tokens_per_syllable:
+                       self._vieneu_log(f"🧮 Token budget mỗi đoạn: {b} ({r:.1f} speech tokens/âm tiết)"))
+            return chunks
+        except Exception as e:
+            self.after(0, lambda err=str(e): self._vieneu_log(
+                f"⚠️ Không ước lượng được token, chia theo {VIENEU_MAX_CHARS_PER_CHUNK} ký tự: {err}"))
+            return split_text_into_chunks(text, chunk_size=VIENEU_MAX_CHARS_PER_CHUNK)
 
     def _vieneu_apply_fallback_stream(self, message: str, chunk_text: str, ref_codes, ref_text: str, target_list: list):
         """Log message and append fallback audio into target_list."""
@@ -4148,6 +7835,33 @@ class StudioGUI(ctk.CTk):
         clean = " ".join(clean.split())
         return clean or cls.SANITIZED_ERROR_FALLBACK
 
+    def _cache_snapshot(self):
+        """Synthesis cache counters at the start of a job (None when caching is off)."""
+        cache = get_synthesis_cache()
+        return cache.snapshot() if cache else None
+
+    def _log_cache_summary(self, log_fn, since):
+        """Log cache hit/miss statistics of the job started at `since`."""
+        cache = get_synthesis_cache()
+        if cache and since is not None:
+            msg = cache.summary(since=since)
+            self.after(0, lambda: log_fn(msg))
+
+    def _write_chunk_subtitles(self, log_fn, segments, output_file: str):
+        """Write subtitles next to output_file from (text, samples, sample_rate) of its merged chunks."""
+        subtitle_file = os.path.splitext(output_file)[0] + f".{FORCED_SUBTITLE_FORMAT}"
+        try:
+            cues = write_forced_subtitles(segments, subtitle_file)
+            self.after(0, lambda f=os.path.basename(subtitle_file), n=cues: log_fn(f"  💬 Phụ đề: {f} ({n} cues)"))
+        except Exception as e:
+            self.after(0, lambda err=str(e): log_fn(f"  ⚠️ Không tạo được phụ đề: {err}"))
+
+    def _log_preprocess_workers(self, log_fn, file_count: int):
+        """Log how many processes read/chunk the files of a folder job."""
+        workers = preprocess_worker_count(file_count)
+        if workers > 1:
+            self.after(0, lambda n=workers: log_fn(f"⚙️ Đọc & chia file song song với {n} tiến trình"))
+
     def _vieneu_on_backbone_change(self, value):
         """Handle backbone model selection change"""
         config = VIENEU_BACKBONE_CONFIGS.get(value, {})
@@ -4746,7 +8460,7 @@ class StudioGUI(ctk.CTk):
                     
                     # For streaming, we process text as a whole or in larger chunks
                     # Split into chunks if text is very long
-                    chunks = split_text_into_chunks(text, chunk_size=VIENEU_MAX_CHARS_PER_CHUNK)
+                    chunks = self._vieneu_split_text(text, ref_codes, ref_text)
                     total_chunks = len(chunks)
                     
                     silence_pad = np.zeros(int(sr * 0.15), dtype=np.float32)
@@ -4801,7 +8515,7 @@ class StudioGUI(ctk.CTk):
                                 all_audio.append(silence_pad)
                 else:
                     # Split long text into chunks using local function
-                    chunks = split_text_into_chunks(text, chunk_size=VIENEU_MAX_CHARS_PER_CHUNK)
+                    chunks = self._vieneu_split_text(text, ref_codes, ref_text)
                     total_chunks = len(chunks)
                     
                     self.after(0, lambda: self._vieneu_log(f"📝 Chia thành {total_chunks} đoạn"))
@@ -4919,6 +8633,7 @@ class StudioGUI(ctk.CTk):
 
     def _vieneu_file_worker(self, input_path, output_dir, voice_mode, merge_after, delete_chunks):
         """Worker thread for file processing"""
+        cache_since = self._cache_snapshot()
         try:
             import torch
             import numpy as np
@@ -4973,8 +8688,11 @@ class StudioGUI(ctk.CTk):
             sr = VIENEU_SAMPLE_RATE
             silence_pad = np.zeros(int(sr * 0.15), dtype=np.float32)
             ffmpeg_path = getattr(self, 'ffmpeg_path', get_default_ffmpeg_path())
+            self._log_preprocess_workers(self._vieneu_log, total_files)
             
-            for file_idx, file_path in enumerate(all_files):
+            # Files are read, parsed (SRT) and cleaned in worker processes, ahead of synthesis
+            prepared = iter_prepared_files(all_files, prepare_vieneu_file)
+            for file_idx, (file_path, prepared_file, prepare_error) in enumerate(prepared):
                 if not self.vieneu_processing:
                     self.after(0, lambda: self._vieneu_log("⏹ Đã dừng bởi người dùng"))
                     break
@@ -4986,21 +8704,17 @@ class StudioGUI(ctk.CTk):
                           self._vieneu_log(f"\n📄 [{i}/{t}] Xử lý: {f}"))
                 
                 try:
-                    # Read file content
-                    ext = os.path.splitext(file_path)[1].lower()
-                    if ext == '.srt':
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        subs = parse_srt(content)
+                    if prepare_error is not None:
+                        raise RuntimeError(prepare_error)
+                    
+                    kind, content = prepared_file
+                    if kind == "srt":
                         # SRT subtitles are strings, create list of strings
-                        text_items = [sub.text for sub in subs]
+                        text_items = content
                         is_text_chunk = False
                     else:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        # Clean and split using local function - returns TextChunk objects
-                        cleaned = clean_text_for_tts(content)
-                        text_items = split_text_into_chunks(cleaned, chunk_size=VIENEU_MAX_CHARS_PER_CHUNK)
+                        # Split to the token budget of the voice - returns TextChunk objects
+                        text_items = self._vieneu_split_text(content, ref_codes, ref_text)
                         is_text_chunk = True
                     
                     if not text_items:
@@ -5068,9 +8782,11 @@ class StudioGUI(ctk.CTk):
                 self.after(0, lambda p=progress: self.vieneu_progress.set(p))
                 self.after(0, lambda i=file_idx+1, t=total_files: 
                           self.vieneu_file_status.configure(text=f"File {i}/{t}"))
+            prepared.close()  # Cancel files still queued for pre-processing
             
             self.after(0, lambda: self._vieneu_log(f"\n{'='*40}"))
             self.after(0, lambda: self._vieneu_log(f"✅ Hoàn thành!"))
+            self._log_cache_summary(self._vieneu_log, cache_since)
             self.after(0, lambda: self._vieneu_log(f"📁 Output: {output_dir}"))
             
         except Exception as e:
@@ -5666,6 +9382,7 @@ class StudioGUI(ctk.CTk):
 
     def _script_worker(self, lines, output_dir, engine, voice, merge_after):
         """Worker thread for processing script lines - XỬ LÝ TUẦN TỰ THEO THỨ TỰ"""
+        cache_since = self._cache_snapshot()
         try:
             total = len(lines)
             self.after(0, lambda: self._script_log_msg(f"🚀 Bắt đầu xử lý {total} dòng với engine: {engine}"))
@@ -5744,6 +9461,7 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._script_log_msg(f"\n{'='*40}"))
             self.after(0, lambda s=success_count, t=total, f=failed_count: 
                       self._script_log_msg(f"✅ Hoàn thành! Thành công: {s}/{t}, Thất bại: {f}"))
+            self._log_cache_summary(self._script_log_msg, cache_since)
             self.after(0, lambda: self._script_log_msg(f"📁 Files đã lưu tại: {output_dir}"))
             
             # Log failed lines for user to retry
@@ -5768,14 +9486,18 @@ class StudioGUI(ctk.CTk):
 
     def _script_folder_worker(self, all_files, output_dir, engine, voice, line_mode, merge_after):
         """Worker thread for processing folder of files"""
+        cache_since = self._cache_snapshot()
         try:
             total_files = len(all_files)
             self.after(0, lambda: self._script_log_msg(f"🚀 Bắt đầu xử lý {total_files} file với engine: {engine}"))
             
             all_output_files = []
             ffmpeg_path = self.ffmpeg_path if hasattr(self, 'ffmpeg_path') else get_default_ffmpeg_path()
+            self._log_preprocess_workers(self._script_log_msg, total_files)
             
-            for file_idx, file_path in enumerate(all_files):
+            # Files are read and split into cleaned lines in worker processes, ahead of synthesis
+            prepared = iter_prepared_files(all_files, prepare_script_file, line_mode)
+            for file_idx, (file_path, lines, prepare_error) in enumerate(prepared):
                 if not self.script_processing:
                     self.after(0, lambda: self._script_log_msg("⏹ Đã dừng bởi người dùng"))
                     break
@@ -5787,17 +9509,13 @@ class StudioGUI(ctk.CTk):
                           self._script_log_msg(f"\n📄 [{i}/{t}] Đang xử lý: {f}"))
                 
                 try:
-                    content = read_document_file(file_path)
-                    if not content.strip():
+                    if prepare_error is not None:
+                        raise RuntimeError(prepare_error)
+                    
+                    if not lines:
                         self.after(0, lambda: self._script_log_msg(f"  ⚠️ File trống, bỏ qua"))
                         continue
                     
-                    # Split by lines if line_mode is enabled, and clean each line
-                    if line_mode:
-                        lines = [clean_text_for_tts(l) for l in content.split('\n') if l.strip()]
-                    else:
-                        lines = [clean_text_for_tts(content)]
-                    
                     self.after(0, lambda n=len(lines): self._script_log_msg(f"  📝 Tìm thấy {n} dòng - xử lý TUẦN TỰ"))
                     
                     # Create subfolder for this file
@@ -5867,12 +9585,14 @@ class StudioGUI(ctk.CTk):
                 self.after(0, lambda p=progress: self.script_progress.set(p))
                 self.after(0, lambda i=file_idx+1, t=total_files: 
                           self.script_status.configure(text=f"Đang xử lý file {i}/{t}"))
+            prepared.close()  # Cancel files still queued for pre-processing
             
             self.script_generated_files = all_output_files
             
             self.after(0, lambda: self._script_log_msg(f"\n{'='*40}"))
             self.after(0, lambda n=len(all_output_files), t=total_files: 
                       self._script_log_msg(f"✅ Hoàn thành! Đã tạo {n} file từ {t} file gốc"))
+            self._log_cache_summary(self._script_log_msg, cache_since)
             self.after(0, lambda: self._script_log_msg(f"📁 Files đã lưu tại: {output_dir}"))
             
             # Refresh preview
@@ -5890,14 +9610,12 @@ class StudioGUI(ctk.CTk):
 
     def _script_generate_edge(self, text, voice, output_file, ffmpeg_path):
         """Generate voice using Edge TTS - với retry logic"""
-        from edge.communicate import Communicate
-        
         # RETRY LOGIC - tự động retry khi có lỗi bất kỳ
         for attempt in range(1, MAX_RETRIES + 1):
             try:
                 # Check if text is long - need chunking
-                if len(text) > EDGE_LONG_TEXT_THRESHOLD:
-                    chunks = split_text_smart(text, max_chars=EDGE_MAX_CHUNK_SIZE)
+                chunks = plan_edge_chunks(text)
+                if len(chunks) > 1:
                     temp_dir = os.path.join(os.path.dirname(output_file), "_temp_edge_chunks")
                     os.makedirs(temp_dir, exist_ok=True)
                     
@@ -5909,11 +9627,10 @@ class StudioGUI(ctk.CTk):
                         chunk_success = False
                         for chunk_attempt in range(1, MAX_RETRIES + 1):
                             try:
-                                communicate = Communicate(chunk.text, voice)
                                 loop = asyncio.new_event_loop()
                                 asyncio.set_event_loop(loop)
                                 try:
-                                    loop.run_until_complete(communicate.save(chunk_file))
+                                    loop.run_until_complete(edge_save_cached(chunk.text, voice, chunk_file, planned=True))
                                 finally:
                                     cleanup_event_loop(loop)
                                 
@@ -5947,11 +9664,10 @@ class StudioGUI(ctk.CTk):
                         raise ValueError("Merge failed or output file invalid")
                     raise ValueError("No chunk files generated")
                 else:
-                    communicate = Communicate(text, voice)
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
                     try:
-                        loop.run_until_complete(communicate.save(output_file))
+                        loop.run_until_complete(edge_save_cached(text, voice, output_file))
                     finally:
                         cleanup_event_loop(loop)
                     
@@ -6066,31 +9782,29 @@ class StudioGUI(ctk.CTk):
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 
-                # Sử dụng LiveSessionWorkerEngine nếu live_session_enabled
-                if live_session_enabled:
-                    async def generate_with_live_session():
-                        engine = LiveSessionWorkerEngine(0, api_keys[0], config, log_callback=print)
-                        await engine.connect()
-                        audio_data = await engine.generate_audio(text)
-                        await engine.disconnect()
-                        return audio_data
-                    audio_data = loop.run_until_complete(generate_with_live_session())
-                else:
-                    engine = WorkerEngine(0, api_keys[0], config)
-                    audio_data = loop.run_until_complete(engine.generate_audio(text))
-                
-                # Check for None first to avoid AttributeError on len()
-                if audio_data is None:
-                    raise ValueError("No audio data received (None)")
-                
-                if len(audio_data) > MIN_AUDIO_FILE_SIZE:
-                    final_rate = int(RECEIVE_SAMPLE_RATE * config.speed)
-                    save_wave_file(output_file, audio_data, rate=final_rate)
+                final_rate = int(RECEIVE_SAMPLE_RATE * config.speed)
+                # Audio is written to output_file as it arrives
+                with WavSink(output_file, rate=final_rate) as sink:
+                    # Sử dụng LiveSessionWorkerEngine nếu live_session_enabled
+                    if live_session_enabled:
+                        async def generate_with_live_session():
+                            engine = LiveSessionWorkerEngine(0, api_keys[0], config, log_callback=print)
+                            await engine.connect()
+                            try:
+                                await engine.stream_audio(text, sink)
+                            finally:
+                                await engine.disconnect()
+                        loop.run_until_complete(generate_with_live_session())
+                    else:
+                        engine = WorkerEngine(0, api_keys[0], config, warm_sessions=0)
+                        loop.run_until_complete(engine.stream_audio(text, sink))
                     
-                    if os.path.exists(output_file) and os.path.getsize(output_file) > MIN_AUDIO_FILE_SIZE:
-                        return True
-                    raise ValueError("Output file empty or not created")
-                raise ValueError(f"Received insufficient audio data: {len(audio_data)} bytes")
+                    if sink.data_bytes <= MIN_AUDIO_FILE_SIZE:
+                        raise ValueError(f"Received insufficient audio data: {sink.data_bytes} bytes")
+                
+                if os.path.exists(output_file) and os.path.getsize(output_file) > MIN_AUDIO_FILE_SIZE:
+                    return True
+                raise ValueError("Output file empty or not created")
                 
             except Exception as e:
                 if attempt < MAX_RETRIES:
@@ -6512,6 +10226,7 @@ class StudioGUI(ctk.CTk):
         output_dir = self.capcut_srt_output_entry.get().strip()
         session_id = self.entry_capcut_session.get().strip() if hasattr(self, 'entry_capcut_session') else self.capcut_session_id
         merge_after = self.capcut_merge_var.get() if hasattr(self, 'capcut_merge_var') else False
+        export_subtitles = self.capcut_subtitle_var.get() if hasattr(self, 'capcut_subtitle_var') else False
         
         # Debug log
         self._capcut_log(f"[DEBUG] Processing input...")
@@ -6549,7 +10264,7 @@ class StudioGUI(ctk.CTk):
         if os.path.isdir(input_path):
             threading.Thread(
                 target=self._capcut_folder_worker,
-                args=(input_path, output_dir, voice_id, session_id, ffmpeg_path, merge_after),
+                args=(input_path, output_dir, voice_id, session_id, ffmpeg_path, merge_after, export_subtitles),
                 daemon=True
             ).start()
         else:
@@ -6559,8 +10274,22 @@ class StudioGUI(ctk.CTk):
                 daemon=True
             ).start()
 
+    def _pending_clips(self, manifest: ClipManifest, subtitles: List[Subtitle], output_dir: str, log_fn) -> List[Subtitle]:
+        """Subtitles whose <index>.mp3 is missing or outdated; clips of removed cues are deleted"""
+        pending = [sub for sub in subtitles
+                   if not manifest.is_current(sub.index, sub.text, os.path.join(output_dir, f"{sub.index:04d}.mp3"))]
+        reused = len(subtitles) - len(pending)
+        removed = manifest.prune(sub.index for sub in subtitles)
+        if reused:
+            self.after(0, lambda: log_fn(f"♻️ {reused}/{len(subtitles)} dòng không đổi - dùng lại file cũ"))
+        if removed:
+            self.after(0, lambda: log_fn(f"🗑️ Đã xóa {removed} file của dòng không còn trong phụ đề"))
+        return pending
+    
     def _capcut_srt_worker(self, file_path, output_dir, voice_id, session_id, ffmpeg_path="ffmpeg.exe", merge_after=False):
         """Worker thread for Capcut SRT/text file processing with chunking support"""
+        cache_since = self._cache_snapshot()
+        manifest = None
         try:
             ext = os.path.splitext(file_path)[1].lower()
             base_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -6595,6 +10324,12 @@ class StudioGUI(ctk.CTk):
             failed_count = 0
             results = []
             
+            if is_subtitle:
+                # Edited SRT re-run: only changed / new lines are synthesized again
+                manifest = ClipManifest(os.path.join(output_dir, CLIP_MANIFEST_NAME), ["capcut", voice_id])
+                subtitles = self._pending_clips(manifest, subtitles, output_dir, self._capcut_log)
+                completed = success_count = total - len(subtitles)
+            
             # Process sequentially
             for sub in subtitles:
                 if not self.capcut_srt_processing:
@@ -6632,6 +10367,8 @@ class StudioGUI(ctk.CTk):
                         if merge_success:
                             results.append((sub.index, output_file))
                             success_count += 1
+                            if manifest is not None and len(chunk_files) == len(line_chunks):
+                                manifest.record(sub.index, text, output_file)  # Not if a chunk is missing
                             # Clean up chunk files
                             for cf in chunk_files:
                                 try:
@@ -6640,8 +10377,12 @@ class StudioGUI(ctk.CTk):
                                     pass
                         else:
                             failed_count += 1
+                            if manifest is not None:
+                                manifest.discard(sub.index)
                     else:
                         failed_count += 1
+                        if manifest is not None:
+                            manifest.discard(sub.index)
                 else:
                     output_file = os.path.join(output_dir, f"{sub.index:04d}.mp3")
                     self.after(0, lambda i=sub.index, t=text[:30]: self._capcut_log(f"📝 [{i}] Đang xử lý: {t}..."))
@@ -6661,6 +10402,8 @@ class StudioGUI(ctk.CTk):
                                 success_count += 1
                                 results.append((sub.index, output_file))
                                 item_success = True
+                                if manifest is not None:
+                                    manifest.record(sub.index, text, output_file)
                                 if attempt > 1:
                                     self.after(0, lambda i=sub.index, a=attempt-1: self._capcut_log(f"✅ [{i}] Thành công sau {a} lần thử lại"))
                                 else:
@@ -6680,6 +10423,8 @@ class StudioGUI(ctk.CTk):
                     
                     if not item_success:
                         failed_count += 1
+                        if manifest is not None and self.capcut_srt_processing:
+                            manifest.discard(sub.index)
                         err_msg = last_error.get('error', 'Unknown') if last_error else 'Unknown error'
                         self.after(0, lambda i=sub.index, e=err_msg: self._capcut_log(f"❌ [{i}] Thất bại sau {MAX_RETRIES} lần thử: {e}"))
                     
@@ -6708,6 +10453,7 @@ class StudioGUI(ctk.CTk):
             
             self.after(0, lambda: self._capcut_log(f"\n{'='*40}"))
             self.after(0, lambda s=success_count, t=total, f=failed_count: self._capcut_log(f"✅ Hoàn thành! Thành công: {s}/{t}, Thất bại: {f}"))
+            self._log_cache_summary(self._capcut_log, cache_since)
             
             if results:
                 self.after(0, lambda: self._capcut_log(f"📁 Files đã lưu tại: {output_dir}"))
@@ -6717,13 +10463,17 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._capcut_log(f"❌ Lỗi: {str(e)}"))
             self.after(0, lambda tb=traceback.format_exc(): self._capcut_log(f"[DEBUG] Traceback:\n{tb}"))
         finally:
+            if manifest is not None:
+                manifest.save(lambda message, level: self.after(0, lambda: self._capcut_log(message)))
             self.capcut_srt_processing = False
             self.after(0, lambda: self.btn_capcut_process_srt.configure(state="normal"))
             self.after(0, lambda: self.btn_capcut_stop_srt.configure(state="disabled"))
             self.after(0, lambda: self.capcut_srt_status.configure(text="Hoàn thành!"))
 
-    def _capcut_folder_worker(self, folder_path, output_dir, voice_id, session_id, ffmpeg_path="ffmpeg.exe", merge_after=False):
+    def _capcut_folder_worker(self, folder_path, output_dir, voice_id, session_id, ffmpeg_path="ffmpeg.exe", merge_after=False,
+                              export_subtitles=False):
         """Worker thread for processing folder of txt/docx files"""
+        cache_since = self._cache_snapshot()
         try:
             # Find all supported files
             txt_files = glob.glob(os.path.join(folder_path, "*.txt"))
@@ -6740,8 +10490,11 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._capcut_log(f"🚀 Bắt đầu xử lý {total_files} file từ thư mục..."))
             
             all_output_files = []
+            self._log_preprocess_workers(self._capcut_log, total_files)
             
-            for file_idx, file_path in enumerate(all_files):
+            # Files are read and split into Capcut chunks in worker processes, ahead of synthesis
+            prepared = iter_prepared_files(all_files, prepare_capcut_file)
+            for file_idx, (file_path, chunks, prepare_error) in enumerate(prepared):
                 if not self.capcut_srt_processing:
                     self.after(0, lambda: self._capcut_log("⏹ Đã dừng bởi người dùng"))
                     break
@@ -6753,15 +10506,13 @@ class StudioGUI(ctk.CTk):
                           self._capcut_log(f"\n📄 [{i}/{t}] Đang xử lý: {f}"))
                 
                 try:
-                    # Read file content
-                    content = read_document_file(file_path)
+                    if prepare_error is not None:
+                        raise RuntimeError(prepare_error)
                     
-                    if not content.strip():
+                    if not chunks:
                         self.after(0, lambda: self._capcut_log(f"  ⚠️ File trống, bỏ qua"))
                         continue
                     
-                    # Split into chunks (450 chars for Capcut)
-                    chunks = split_text_smart(content, max_chars=CAPCUT_MAX_CHUNK_SIZE)
                     self.after(0, lambda c=len(chunks): self._capcut_log(f"  📝 Chia thành {c} chunks"))
                     
                     # Create temp directory for this file's chunks
@@ -6769,6 +10520,7 @@ class StudioGUI(ctk.CTk):
                     os.makedirs(file_temp_dir, exist_ok=True)
                     
                     chunk_files = []
+                    segments = []  # (text, samples, sample_rate) of each written chunk, for subtitles
                     
                     for chunk in chunks:
                         if not self.capcut_srt_processing:
@@ -6783,6 +10535,8 @@ class StudioGUI(ctk.CTk):
                             
                             if success and os.path.exists(chunk_file) and os.path.getsize(chunk_file) > 0:
                                 chunk_files.append(chunk_file)
+                                if export_subtitles:
+                                    segments.append((chunk.text, *audio_sample_count(chunk_file)))
                                 chunk_success = True
                                 break
                             elif attempt < MAX_RETRIES:
@@ -6804,6 +10558,8 @@ class StudioGUI(ctk.CTk):
                         if merge_success:
                             self.after(0, lambda f=output_file: self._capcut_log(f"  ✅ Đã tạo: {os.path.basename(f)}"))
                             all_output_files.append(output_file)
+                            if export_subtitles:
+                                self._write_chunk_subtitles(self._capcut_log, segments, output_file)
                             
                             # Clean up chunks
                             for cf in chunk_files:
@@ -6826,6 +10582,7 @@ class StudioGUI(ctk.CTk):
                 self.after(0, lambda p=progress: self.capcut_srt_progress.set(p))
                 self.after(0, lambda i=file_idx+1, t=total_files: 
                           self.capcut_srt_status.configure(text=f"Đang xử lý file {i}/{t}"))
+            prepared.close()  # Cancel files still queued for pre-processing
             
             # Merge all output files if requested
             if merge_after and all_output_files:
@@ -6842,6 +10599,7 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._capcut_log(f"\n{'='*40}"))
             self.after(0, lambda n=len(all_output_files), t=total_files: 
                       self._capcut_log(f"✅ Hoàn thành! Đã tạo {n}/{t} file"))
+            self._log_cache_summary(self._capcut_log, cache_since)
             self.after(0, lambda: self._capcut_log(f"📁 Files đã lưu tại: {output_dir}"))
             
         except Exception as e:
@@ -6961,16 +10719,12 @@ class StudioGUI(ctk.CTk):
         
         def generate_thread():
             try:
-                from edge.communicate import Communicate
-                
                 app_dir = os.path.dirname(os.path.abspath(__file__))
                 
-                # Check if text is long - need chunking
-                if len(text) > EDGE_LONG_TEXT_THRESHOLD:
+                # Check if text is long - need chunking (chunks sized to one SSML request)
+                chunks = plan_edge_chunks(text)
+                if len(chunks) > 1:
                     self.after(0, lambda: self._edge_log(f"📝 Văn bản dài ({len(text)} chars) - Đang chia thành chunks..."))
-                    
-                    # Split into chunks (Edge TTS handles more than Capcut)
-                    chunks = split_text_smart(text, max_chars=EDGE_MAX_CHUNK_SIZE)
                     self.after(0, lambda c=len(chunks): self._edge_log(f"📝 Chia thành {c} chunks"))
                     
                     # Create temp directory
@@ -6988,10 +10742,9 @@ class StudioGUI(ctk.CTk):
                         for attempt in range(1, MAX_RETRIES + 1):
                             loop = None
                             try:
-                                communicate = Communicate(chunk.text, voice, rate=rate, volume=volume, pitch=pitch)
                                 loop = asyncio.new_event_loop()
                                 asyncio.set_event_loop(loop)
-                                loop.run_until_complete(communicate.save(chunk_file))
+                                loop.run_until_complete(edge_save_cached(chunk.text, voice, chunk_file, rate=rate, volume=volume, pitch=pitch, planned=True))
                                 
                                 # Verify file was created
                                 if os.path.exists(chunk_file) and os.path.getsize(chunk_file) > 0:
@@ -7051,11 +10804,10 @@ class StudioGUI(ctk.CTk):
                     for attempt in range(1, MAX_RETRIES + 1):
                         loop = None
                         try:
-                            communicate = Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
                             
                             loop = asyncio.new_event_loop()
                             asyncio.set_event_loop(loop)
-                            loop.run_until_complete(communicate.save(output_file))
+                            loop.run_until_complete(edge_save_cached(text, voice, output_file, rate=rate, volume=volume, pitch=pitch))
                             
                             # Verify file was created
                             if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
@@ -7199,6 +10951,7 @@ class StudioGUI(ctk.CTk):
         input_path = self.edge_srt_file_entry.get().strip()
         output_dir = self.edge_srt_output_entry.get().strip()
         merge_after = self.edge_merge_var.get() if hasattr(self, 'edge_merge_var') else False
+        export_subtitles = self.edge_subtitle_var.get() if hasattr(self, 'edge_subtitle_var') else False
         
         if not input_path or not os.path.exists(input_path):
             messagebox.showerror("Lỗi", "Vui lòng chọn file hoặc thư mục!")
@@ -7230,7 +10983,8 @@ class StudioGUI(ctk.CTk):
         if os.path.isdir(input_path):
             threading.Thread(
                 target=self._edge_folder_worker,
-                args=(input_path, output_dir, voice, rate, volume, pitch, workers, ffmpeg_path, merge_after),
+                args=(input_path, output_dir, voice, rate, volume, pitch, workers, ffmpeg_path, merge_after,
+                      export_subtitles),
                 daemon=True
             ).start()
         else:
@@ -7242,9 +10996,9 @@ class StudioGUI(ctk.CTk):
 
     def _edge_srt_worker(self, file_path, output_dir, voice, rate, volume, pitch, workers, ffmpeg_path="ffmpeg.exe", merge_after=False):
         """Worker thread for Edge TTS SRT/text file processing with parallel workers and chunking support"""
+        cache_since = self._cache_snapshot()
+        manifest = None
         try:
-            from edge.communicate import Communicate
-            
             ext = os.path.splitext(file_path)[1].lower()
             base_name = os.path.splitext(os.path.basename(file_path))[0]
             
@@ -7253,9 +11007,9 @@ class StudioGUI(ctk.CTk):
                 subtitles = parse_subtitle_file(file_path)
                 is_subtitle = True
             else:
-                # Read as text file and create chunks (1000 chars for Edge TTS)
+                # Read as text file and create chunks (one SSML request each)
                 content = read_document_file(file_path)
-                chunks = split_text_smart(content, max_chars=EDGE_MAX_CHUNK_SIZE)
+                chunks = plan_edge_chunks(content)
                 subtitles = [Subtitle(c.index, "", "", c.text) for c in chunks]
                 is_subtitle = False
             
@@ -7274,6 +11028,12 @@ class StudioGUI(ctk.CTk):
             lock = threading.Lock()
             results = []
             
+            if is_subtitle:
+                # Edited SRT re-run: only changed / new lines are synthesized again
+                manifest = ClipManifest(os.path.join(output_dir, CLIP_MANIFEST_NAME), ["edge", voice, rate, volume, pitch])
+                subtitles = self._pending_clips(manifest, subtitles, output_dir, self._edge_log)
+                completed = success_count = total - len(subtitles)
+            
             def process_single(sub):
                 nonlocal completed, success_count, failed_count
                 
@@ -7293,16 +11053,19 @@ class StudioGUI(ctk.CTk):
                     
                     loop = None
                     try:
-                        # For long text in subtitle line, Edge TTS handles it internally
-                        communicate = Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
+                        # For long text in subtitle line, Edge TTS handles it internally;
+                        # text file chunks are already planned to one SSML request each
                         
                         loop = asyncio.new_event_loop()
                         asyncio.set_event_loop(loop)
-                        loop.run_until_complete(communicate.save(output_file))
+                        loop.run_until_complete(edge_save_cached(text, voice, output_file, rate=rate, volume=volume, pitch=pitch,
+                                                                 planned=not is_subtitle))
                         
                         # Verify file was created and has content
                         if not os.path.exists(output_file) or os.path.getsize(output_file) < MIN_AUDIO_FILE_SIZE:
                             raise ValueError("Audio file empty or not created")
+                        if manifest is not None:
+                            manifest.record(sub.index, text, output_file)
                         
                         with lock:
                             completed += 1
@@ -7329,6 +11092,8 @@ class StudioGUI(ctk.CTk):
                         cleanup_event_loop(loop)
                 
                 # All retries failed
+                if manifest is not None:
+                    manifest.discard(sub.index)
                 with lock:
                     completed += 1
                     failed_count += 1
@@ -7364,6 +11129,7 @@ class StudioGUI(ctk.CTk):
             
             self.after(0, lambda: self._edge_log(f"\n{'='*40}"))
             self.after(0, lambda s=success_count, t=total, f=failed_count: self._edge_log(f"✅ Hoàn thành! Thành công: {s}/{t}, Thất bại: {f}"))
+            self._log_cache_summary(self._edge_log, cache_since)
             
             if results:
                 self.after(0, lambda: self._edge_log(f"📁 Files đã lưu tại: {output_dir}"))
@@ -7371,16 +11137,18 @@ class StudioGUI(ctk.CTk):
         except Exception as e:
             self.after(0, lambda: self._edge_log(f"❌ Lỗi: {str(e)}"))
         finally:
+            if manifest is not None:
+                manifest.save(lambda message, level: self.after(0, lambda: self._edge_log(message)))
             self.edge_srt_processing = False
             self.after(0, lambda: self.btn_edge_process_srt.configure(state="normal"))
             self.after(0, lambda: self.btn_edge_stop_srt.configure(state="disabled"))
             self.after(0, lambda: self.edge_srt_status.configure(text="Hoàn thành!"))
 
-    def _edge_folder_worker(self, folder_path, output_dir, voice, rate, volume, pitch, workers, ffmpeg_path="ffmpeg.exe", merge_after=False):
+    def _edge_folder_worker(self, folder_path, output_dir, voice, rate, volume, pitch, workers, ffmpeg_path="ffmpeg.exe", merge_after=False,
+                            export_subtitles=False):
         """Worker thread for processing folder of txt/docx files with Edge TTS"""
+        cache_since = self._cache_snapshot()
         try:
-            from edge.communicate import Communicate
-            
             # Find all supported files
             txt_files = glob.glob(os.path.join(folder_path, "*.txt"))
             docx_files = glob.glob(os.path.join(folder_path, "*.docx"))
@@ -7396,8 +11164,11 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._edge_log(f"🚀 Bắt đầu xử lý {total_files} file với {workers} workers..."))
             
             all_output_files = []
+            self._log_preprocess_workers(self._edge_log, total_files)
             
-            for file_idx, file_path in enumerate(all_files):
+            # Files are read and split into SSML chunks in worker processes, ahead of synthesis
+            prepared = iter_prepared_files(all_files, prepare_edge_file)
+            for file_idx, (file_path, chunks, prepare_error) in enumerate(prepared):
                 if not self.edge_srt_processing:
                     self.after(0, lambda: self._edge_log("⏹ Đã dừng bởi người dùng"))
                     break
@@ -7409,15 +11180,13 @@ class StudioGUI(ctk.CTk):
                           self._edge_log(f"\n📄 [{i}/{t}] Đang xử lý: {f}"))
                 
                 try:
-                    # Read file content
-                    content = read_document_file(file_path)
+                    if prepare_error is not None:
+                        raise RuntimeError(prepare_error)
                     
-                    if not content.strip():
+                    if not chunks:
                         self.after(0, lambda: self._edge_log(f"  ⚠️ File trống, bỏ qua"))
                         continue
                     
-                    # Split into chunks (1000 chars for Edge TTS)
-                    chunks = split_text_smart(content, max_chars=EDGE_MAX_CHUNK_SIZE)
                     self.after(0, lambda c=len(chunks): self._edge_log(f"  📝 Chia thành {c} chunks"))
                     
                     # Create temp directory for this file's chunks
@@ -7440,15 +11209,15 @@ class StudioGUI(ctk.CTk):
                             
                             loop = None
                             try:
-                                communicate = Communicate(chunk.text, voice, rate=rate, volume=volume, pitch=pitch)
                                 loop = asyncio.new_event_loop()
                                 asyncio.set_event_loop(loop)
-                                loop.run_until_complete(communicate.save(chunk_file))
+                                loop.run_until_complete(edge_save_cached(chunk.text, voice, chunk_file, rate=rate, volume=volume, pitch=pitch, planned=True))
                                 
                                 # Verify file was created
                                 if os.path.exists(chunk_file) and os.path.getsize(chunk_file) > 0:
+                                    segment = (chunk.text, *audio_sample_count(chunk_file)) if export_subtitles else None
                                     with lock:
-                                        chunk_files.append((chunk.index, chunk_file))
+                                        chunk_files.append((chunk.index, chunk_file, segment))
                                     return chunk_file
                                 else:
                                     raise ValueError("Audio file empty or not created")
@@ -7474,6 +11243,7 @@ class StudioGUI(ctk.CTk):
                     # Sort chunk files by index
                     chunk_files.sort(key=lambda x: x[0])
                     chunk_file_paths = [cf[1] for cf in chunk_files]
+                    segments = [cf[2] for cf in chunk_files]
                     
                     # Merge chunks into single file
                     if chunk_file_paths:
@@ -7483,6 +11253,8 @@ class StudioGUI(ctk.CTk):
                         if merge_success:
                             self.after(0, lambda f=output_file: self._edge_log(f"  ✅ Đã tạo: {os.path.basename(f)}"))
                             all_output_files.append(output_file)
+                            if export_subtitles:
+                                self._write_chunk_subtitles(self._edge_log, segments, output_file)
                             
                             # Clean up chunks
                             for cf in chunk_file_paths:
@@ -7505,6 +11277,7 @@ class StudioGUI(ctk.CTk):
                 self.after(0, lambda p=progress: self.edge_srt_progress.set(p))
                 self.after(0, lambda i=file_idx+1, t=total_files: 
                           self.edge_srt_status.configure(text=f"Đang xử lý file {i}/{t}"))
+            prepared.close()  # Cancel files still queued for pre-processing
             
             # Merge all output files if requested
             if merge_after and all_output_files:
@@ -7521,6 +11294,7 @@ class StudioGUI(ctk.CTk):
             self.after(0, lambda: self._edge_log(f"\n{'='*40}"))
             self.after(0, lambda n=len(all_output_files), t=total_files: 
                       self._edge_log(f"✅ Hoàn thành! Đã tạo {n}/{t} file"))
+            self._log_cache_summary(self._edge_log, cache_since)
             self.after(0, lambda: self._edge_log(f"📁 Files đã lưu tại: {output_dir}"))
             
         except Exception as e:
@@ -7705,7 +11479,7 @@ class StudioGUI(ctk.CTk):
         return [k.strip() for k in content.split('\n') if k.strip()]
 
     def _browse_input(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Subtitle files", "*.srt *.txt"), ("All files", "*.*")])
+        file_path = filedialog.askopenfilename(filetypes=[("Subtitle files", "*.srt *.vtt *.txt"), ("All files", "*.*")])
         if file_path:
             self.entry_file.delete(0, "end")
             self.entry_file.insert(0, file_path)
@@ -7724,45 +11498,54 @@ class StudioGUI(ctk.CTk):
             return
         
         try:
+            self.subtitle_file = None
+            if file_path.lower().endswith(('.srt', '.vtt')):
+                # Cues are parsed while processing (constant memory) - only check the file has one
+                first_cue = next(iter_subtitle_file(file_path), None)
+                self.subtitles = []
+                if first_cue is None:
+                    self.log(f"❌ Không tìm thấy phụ đề nào trong {Path(file_path).name}", "ERROR")
+                    return
+                self.subtitle_file = file_path
+                self.log(f"✅ Loaded {Path(file_path).name} - phụ đề sẽ được đọc dần khi xử lý", "SUCCESS")
+                return
+            
             content = Path(file_path).read_text(encoding='utf-8')
             
-            if file_path.endswith('.srt'):
-                self.subtitles = parse_srt(content)
-            else:
-                # Parse txt file first
-                raw_subtitles = parse_txt(content)
-                
-                # Get chunk settings from UI
-                chunk_size = int(self.gemini_chunk_size_entry.get().strip() or GEMINI_DEFAULT_CHUNK_SIZE) if hasattr(self, 'gemini_chunk_size_entry') else GEMINI_DEFAULT_CHUNK_SIZE
-                chunk_v2_enabled = bool(self.gemini_sw_chunk_v2.get()) if hasattr(self, 'gemini_sw_chunk_v2') else False
-                
-                # Process each subtitle - chunk if needed
-                processed_subtitles = []
-                sub_index = 1
+            # Parse txt file first
+            raw_subtitles = parse_txt(content)
+            
+            # Get chunk settings from UI
+            chunk_size = int(self.gemini_chunk_size_entry.get().strip() or GEMINI_DEFAULT_CHUNK_SIZE) if hasattr(self, 'gemini_chunk_size_entry') else GEMINI_DEFAULT_CHUNK_SIZE
+            chunk_v2_enabled = bool(self.gemini_sw_chunk_v2.get()) if hasattr(self, 'gemini_sw_chunk_v2') else False
+            
+            # Process each subtitle - chunk if needed
+            processed_subtitles = []
+            sub_index = 1
+            
+            for raw_sub in raw_subtitles:
+                # Clean the text first
+                cleaned_text = clean_text_for_tts(raw_sub.text)
                 
-                for raw_sub in raw_subtitles:
-                    # Clean the text first
-                    cleaned_text = clean_text_for_tts(raw_sub.text)
+                if len(cleaned_text) <= chunk_size:
+                    # Short enough, just add it
+                    processed_subtitles.append(Subtitle(index=sub_index, text=cleaned_text))
+                    sub_index += 1
+                else:
+                    # Long text - need to chunk
+                    if chunk_v2_enabled:
+                        chunks = split_text_by_punctuation_v2(cleaned_text, target_chunk_size=chunk_size, remove_punct=True)
+                    else:
+                        chunks = split_text_into_chunks(cleaned_text, chunk_size)
                     
-                    if len(cleaned_text) <= chunk_size:
-                        # Short enough, just add it
-                        processed_subtitles.append(Subtitle(index=sub_index, text=cleaned_text))
+                    for chunk in chunks:
+                        processed_subtitles.append(Subtitle(index=sub_index, text=chunk.text))
                         sub_index += 1
-                    else:
-                        # Long text - need to chunk
-                        if chunk_v2_enabled:
-                            chunks = split_text_by_punctuation_v2(cleaned_text, target_chunk_size=chunk_size, remove_punct=True)
-                        else:
-                            chunks = split_text_into_chunks(cleaned_text, chunk_size)
-                        
-                        for chunk in chunks:
-                            processed_subtitles.append(Subtitle(index=sub_index, text=chunk.text))
-                            sub_index += 1
-                
-                self.subtitles = processed_subtitles
-                
-                if len(self.subtitles) > len(raw_subtitles):
-                    self.log(f"📝 Văn bản dài được chia thành {len(self.subtitles)} phần (chunk size: {chunk_size}, v2: {chunk_v2_enabled})", "INFO")
+            
+            self.subtitles = processed_subtitles
+            
+            if len(self.subtitles) > len(raw_subtitles):
+                self.log(f"📝 Văn bản dài được chia thành {len(self.subtitles)} phần (chunk size: {chunk_size}, v2: {chunk_v2_enabled})", "INFO")
             
             self.log(f"✅ Loaded {len(self.subtitles)} lines from {Path(file_path).name}", "SUCCESS")
         except Exception as e:
@@ -7799,7 +11582,7 @@ class StudioGUI(ctk.CTk):
             self.tabview.set("⚙️ Configuration")
             return
         
-        if not self.subtitles:
+        if not self.subtitles and not self.subtitle_file:
             messagebox.showerror("Error", "Load file đã rồi chạy")
             return
         
@@ -7825,13 +11608,21 @@ class StudioGUI(ctk.CTk):
             multi_worker_enabled=bool(self.sw_multi_worker.get()),
             workers_per_key=int(self.slider_workers.get()),
             live_session_enabled=live_session_enabled,
-            keep_voice_beta=keep_voice_beta
+            keep_voice_beta=keep_voice_beta,
+            cue_batching=bool(self.tts_sw_cue_batching.get())
         )
         
         if live_session_enabled:
             self.log("📞 Live Session Mode enabled - workers sẽ duy trì kết nối liên tục", "INFO")
         if keep_voice_beta:
             self.log("🎤 Giữ giọng beta enabled - text sẽ được wrap trong {nội dung}", "INFO")
+        if config.cue_batching:
+            self.log(f"📦 Gộp cue ngắn - tối đa {CUE_BATCH_MAX_CUES} cue ≤ {CUE_BATCH_MAX_WORDS} từ mỗi request", "INFO")
+        if self.tts_sw_dub_timeline.get():
+            if self.subtitle_file:
+                self.log("🎬 Lồng tiếng theo timeline - các clip sẽ được ghép thành 1 track theo thời gian SRT", "INFO")
+            else:
+                self.log("⚠️ Lồng tiếng theo timeline chỉ áp dụng cho file SRT/VTT", "WARNING")
 
         threading.Thread(target=self._process_thread, args=(api_keys, config), daemon=True).start()
 
@@ -7852,7 +11643,19 @@ class StudioGUI(ctk.CTk):
                 progress_callback=self._update_main_progress,
                 audio_callback=lambda a: self.audio_queue.put(a)
             )
-            await self.processor.process_all(self.subtitles, output_dir, prefix)
+            # SRT/VTT files are streamed cue by cue straight into the worker queue
+            subtitles = iter_subtitle_file(self.subtitle_file) if self.subtitle_file else self.subtitles
+            if self.subtitle_file:
+                subtitles = await self._preflight_subtitles(subtitles, config)
+                if subtitles is None:
+                    return
+            dub_output = None
+            if self.subtitle_file and self.tts_sw_dub_timeline.get():
+                # Clips go to a sub folder, the result is one track in output_dir
+                dub_output = str(output_dir / f"{prefix}_dub.wav")
+                output_dir = output_dir / f"_{prefix}_clips"
+                output_dir.mkdir(exist_ok=True)
+            await self.processor.process_all(subtitles, output_dir, prefix, dub_output=dub_output)
 
         except Exception as e:
             self.log(f"❌ Fatal Error: {e}", "ERROR")
@@ -7861,6 +11664,25 @@ class StudioGUI(ctk.CTk):
             self.btn_start.configure(state="normal")
             self.btn_stop.configure(state="disabled")
 
+    async def _preflight_subtitles(self, subtitles: Iterator[Subtitle], config: TTSConfig) -> Optional[Iterator[Subtitle]]:
+        """Check the cue timing of self.subtitle_file before any request; None = job rejected"""
+        mode = SUBTITLE_TIMING_MODES.get(self.tts_combo_timing_check.get(), "warn")
+        check = await asyncio.to_thread(check_subtitle_timing, iter_subtitle_file(self.subtitle_file), config.speed)
+        problems = check.overlaps + check.reversed + check.too_long + check.gaps
+        self.log(check.summary(), "WARNING" if problems else "INFO")
+        for issue in check.issues:
+            self.log(f"   [{issue.index}] {issue.kind}: {issue.detail}", "WARNING")
+        if problems > len(check.issues):
+            self.log(f"   ... và {problems - len(check.issues)} vấn đề khác", "WARNING")
+        
+        if mode == "reject" and check.has_errors:
+            self.log("⛔ Dừng: phụ đề có cue chồng lấn / ngược thời gian (chưa gọi API nào)", "ERROR")
+            return None
+        if mode == "fix" and check.fixes:
+            self.log(f"🛠️ Tự sửa timing {len(check.fixes)} cue", "INFO")
+            return apply_timing_fixes(subtitles, check.fixes)
+        return subtitles
+    
     def _stop(self):
         if self.processor: self.processor.stop()
         self.log("⏹️ Stopping requested...", "WARNING")
@@ -7891,7 +11713,7 @@ class StudioGUI(ctk.CTk):
     # LONG TEXT LOGIC
     # ==========================================================================
     def _lt_browse_files(self):
-        files = filedialog.askopenfilenames(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        files = filedialog.askopenfilenames(filetypes=[("Text files", "*.txt"), ("Word files", "*.docx"), ("All files", "*.*")])
         if files:
             self.lt_selected_files = list(files)
             self.lbl_lt_files.configure(text=f"{len(files)} files selected")
@@ -7973,6 +11795,7 @@ class StudioGUI(ctk.CTk):
         chunk_size = int(self.lt_chunk_size.get())
         ffmpeg = self.lt_entry_ffmpeg.get()
         delete_chunks = bool(self.lt_sw_del.get())
+        export_subtitles = bool(self.lt_sw_subtitles.get()) if hasattr(self, 'lt_sw_subtitles') else False
         # Get v2 chunking mode
         chunk_v2_enabled = bool(self.lt_sw_chunk_v2.get()) if hasattr(self, 'lt_sw_chunk_v2') else False
         # Get custom filename
@@ -8000,7 +11823,8 @@ class StudioGUI(ctk.CTk):
                 await self.long_text_processor.process_text(
                     cleaned_text, output_path, 
                     chunk_size, ffmpeg_path=ffmpeg, delete_chunks=delete_chunks,
-                    chunk_v2_mode=chunk_v2_enabled
+                    chunk_v2_mode=chunk_v2_enabled,
+                    subtitle_file=os.path.splitext(output_path)[0] + f".{FORCED_SUBTITLE_FORMAT}" if export_subtitles else None
                 )
                 last_output_file = output_path
                 self._lt_log(f"✅ Đã tạo file: {output_filename}", "SUCCESS")
@@ -8008,16 +11832,14 @@ class StudioGUI(ctk.CTk):
                 # Files
                 for f in files:
                     out_name = Path(f).stem + ".wav"
-                    with open(f, "r", encoding="utf-8") as rf:
-                        content = rf.read()
-                    # Clean whitespace
-                    cleaned_content = clean_text_for_tts(content)
                     self._lt_log(f"Processing {out_name}...", "INFO")
                     output_path = os.path.join(out_dir, out_name)
-                    await self.long_text_processor.process_text(
-                        cleaned_content, output_path,
+                    # File is read and chunked incrementally while workers run
+                    await self.long_text_processor.process_file(
+                        f, output_path,
                         chunk_size, ffmpeg_path=ffmpeg, delete_chunks=delete_chunks,
-                        chunk_v2_mode=chunk_v2_enabled
+                        chunk_v2_mode=chunk_v2_enabled,
+                        subtitle_file=os.path.splitext(output_path)[0] + f".{FORCED_SUBTITLE_FORMAT}" if export_subtitles else None
                     )
                     last_output_file = output_path
                     self._lt_log(f"✅ Đã tạo file: {out_name}", "SUCCESS")
@@ -8117,6 +11939,9 @@ def get_auth_manager() -> Optional[AuthManager]:
 
 
 if __name__ == "__main__":
+    # Frozen (PyInstaller) builds: let pre-processing child processes start without re-running the app
+    multiprocessing.freeze_support()
+    
     try:
         from ctypes import windll
         windll.shcore.SetProcessDpiAwareness(1)